@@ -6,9 +6,31 @@ Available backends
 1. NumPy array (pymc3.backends.NDArray)
 2. Text files (pymc3.backends.Text)
 3. SQLite (pymc3.backends.SQLite)
+4. Shared memory NumPy array (pymc3.backends.SharedNDArray)
+5. NumPy binary files (pymc3.backends.NPY)
+6. Memory-mapped NumPy array (pymc3.backends.MemmapNDArray)
 
 The NDArray backend holds the entire trace in memory, whereas the Text
-and SQLite backends store the values while sampling.
+and SQLite backends store the values while sampling. The SharedNDArray
+backend is an NDArray backend whose values live in shared memory, so
+parallel chains (`sample(..., njobs=4, trace='shared')`) can record
+their values directly into buffers owned by the parent process. The NPY
+backend stores the values of each variable in chunks of .npy files, so
+that the values of one variable or a single draw can be read without
+loading the rest of the trace. Its `codecs` argument compresses the
+values of some or all variables (see pymc3.backends.npy.Codec). The
+MemmapNDArray backend is an NDArray backend whose values are memory
+mapped from files, for traces that do not fit into memory.
+
+Writing in the background
+-------------------------
+
+Backends that write to disk (e.g., Text and SQLite) block the sampler
+while they write. Wrapping a backend in a BackgroundTrace moves the
+writes to a separate thread.
+
+    >>> db = pm.backends.BackgroundTrace(pm.backends.Text('test'))
+    >>> trace = pm.sample(..., trace=db)
 
 Selecting a backend
 -------------------
@@ -111,13 +133,23 @@ object that provides a consistent selection interface for all backends.
 If the traces are stored on disk, then a `load` function should also be
 defined that returns a MultiTrace object.
 
-For specific examples, see pymc3.backends.{ndarray,text,sqlite}.py.
+For specific examples, see pymc3.backends.{ndarray,text,sqlite,shared,npy,memmap}.py.
 """
 from ..backends.ndarray import NDArray
 from ..backends.text import Text
 from ..backends.sqlite import SQLite
+from ..backends.shared import SharedNDArray
+from ..backends.npy import NPY, Codec
+from ..backends.memmap import MemmapNDArray
+from ..backends.background import BackgroundTrace
 
 _shortcuts = {'text': {'backend': Text,
                        'name': 'mcmc'},
               'sqlite': {'backend': SQLite,
-                         'name': 'mcmc.sqlite'}}
+                         'name': 'mcmc.sqlite'},
+              'shared': {'backend': SharedNDArray,
+                         'name': None},
+              'npy': {'backend': NPY,
+                      'name': 'mcmc'},
+              'memmap': {'backend': MemmapNDArray,
+                         'name': 'mcmc'}}
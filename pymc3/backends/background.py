@@ -0,0 +1,187 @@
+"""Background writer for trace backends
+
+Record sampling values in a separate thread, so the sampler does not
+wait for the disk.
+
+The values are handed to a bounded queue that a writer thread consumes.
+When the queue is full, `record` blocks until the writer has caught up.
+All calls to the wrapped backend's sampling methods are made by the
+writer thread, so backends whose connections are bound to a thread
+(e.g., SQLite) can be wrapped. Selection methods wait for the queued
+values to be written.
+
+    >>> import pymc3 as pm
+    >>> db = pm.backends.BackgroundTrace(pm.backends.Text('test'))
+    >>> trace = pm.sample(..., trace=db)
+"""
+import sys
+import threading
+
+import numpy as np
+
+from ..backends import base
+
+try:
+    import queue
+except ImportError:  # Python 2
+    import Queue as queue
+
+
+class BackgroundTrace(base.BaseTrace):
+    """Trace object that records the values of another backend in a
+    background thread
+
+    Parameters
+    ----------
+    backend : BaseTrace
+        Backend that stores the values. Its attributes (e.g., `varnames`
+        and `chain`) are available on the BackgroundTrace.
+    maxsize : int
+        Maximum number of draws waiting to be written
+    """
+
+    def __init__(self, backend, maxsize=100):
+        self.backend = backend
+        self.maxsize = maxsize
+        self._queue = None
+        self._thread = None
+        self._error = None
+
+    def __getattr__(self, name):
+        # Only called for attributes that are not set on the wrapper.
+        if name == 'backend':
+            raise AttributeError(name)
+        return getattr(self.backend, name)
+
+    # Sampling methods
+
+    def setup(self, draws, chain):
+        """Perform chain-specific setup.
+
+        Parameters
+        ----------
+        draws : int
+            Expected number of draws
+        chain : int
+            Chain number
+        """
+        if self._thread is None:
+            self._queue = queue.Queue(self.maxsize)
+            self._thread = threading.Thread(target=self._write)
+            self._thread.daemon = True
+            self._thread.start()
+        self._queue.put(('setup', (draws, chain)))
+        self.flush()
+
+    def record(self, point):
+        """Record results of a sampling iteration.
+
+        Parameters
+        ----------
+        point : dict
+            Values mapped to variable names
+        """
+        self._raise_error()
+        # The sampler may reuse the arrays of the point.
+        point = {varname: np.array(value, copy=True)
+                 for varname, value in point.items()}
+        self._queue.put(('record', (point, )))
+
+    def close(self):
+        """Write the queued values and close the wrapped backend."""
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._queue = self._thread = None
+        self._raise_error()
+
+    def flush(self):
+        """Wait until the queued values have been written."""
+        if self._queue is not None:
+            self._queue.join()
+        self._raise_error()
+
+    def _write(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    self.backend.close()
+                elif self._error is None:
+                    method, args = item
+                    getattr(self.backend, method)(*args)
+            except Exception:
+                if self._error is None:
+                    self._error = sys.exc_info()
+            finally:
+                self._queue.task_done()
+            if item is None:
+                return
+
+    def _raise_error(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise base.BackendError(
+                'Writing to {} failed: {!r}'.format(
+                    self.backend.__class__.__name__, error[1]))
+
+    # Sampler statistics are kept in memory by the wrapped backend, so
+    # they are not queued.
+
+    def setup_stats(self, draws, stats_dtypes):
+        self.backend.setup_stats(draws, stats_dtypes)
+
+    def record_stats(self, stats):
+        self.backend.record_stats(stats)
+
+    @property
+    def stat_names(self):
+        return self.backend.stat_names
+
+    def get_sampler_stats(self, statname, burn=0, thin=1):
+        return self.backend.get_sampler_stats(statname, burn=burn,
+                                              thin=thin)
+
+    # Selection methods
+
+    def __len__(self):
+        self.flush()
+        return len(self.backend)
+
+    def get_values(self, varname, burn=0, thin=1):
+        """Get values from trace.
+
+        Parameters
+        ----------
+        varname : str
+        burn : int
+        thin : int
+
+        Returns
+        -------
+        A NumPy array
+        """
+        self.flush()
+        return self.backend.get_values(varname, burn=burn, thin=thin)
+
+    def _slice(self, idx):
+        self.flush()
+        return self.backend._slice(idx)
+
+    def point(self, idx):
+        """Return dictionary of point values at `idx` for current chain
+        with variables names as keys.
+        """
+        self.flush()
+        return self.backend.point(idx)
+
+    # Pickling
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_queue'] = state['_thread'] = state['_error'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
@@ -3,8 +3,13 @@
 See the docstring for pymc3.backends for more information (including
 creating custom backends).
 """
+from collections import OrderedDict
+
 import numpy as np
+import theano
+import theano.tensor as tt
 from ..model import modelcontext, TransformedRV
+from ..theanof import inputvars
 
 
 class BackendError(Exception):
@@ -22,16 +27,29 @@ class BaseTrace(object):
         If None, the model is taken from the `with` context.
     vars : list of variables
         Sampling values will be stored for these variables. If None,
-        `model.unobserved_RVs` is used.
+        `model.unobserved_RVs` is used, or `model.free_RVs` if
+        `deterministics` is False.
+    burn : int
+        Number of initial iterations of a chain that are not recorded
+    thin : int
+        Record only every `thin`-th iteration after `burn`
+    deterministics : bool
+        Whether deterministic variables (including the untransformed
+        values of transformed variables) are recorded. If False, their
+        values are computed from the free variables when they are
+        requested from the MultiTrace.
     """
 
-    def __init__(self, name, model=None, vars=None):
+    def __init__(self, name, model=None, vars=None, burn=0, thin=1,
+                 deterministics=True):
         self.name = name
+        self.burn = burn
+        self.thin = thin
 
         model = modelcontext(model)
         self.model = model
         if vars is None:
-            vars = model.unobserved_RVs
+            vars = model.unobserved_RVs if deterministics else model.free_RVs
         self.vars = vars
         self.varnames = [var.name for var in vars]
         self.fn = model.fastfn(vars)
@@ -44,6 +62,8 @@ class BaseTrace(object):
         self.var_dtypes = {var: value.dtype
                            for var, value in var_values}
         self.chain = None
+        self._stats = []
+        self._stats_idx = 0
 
     # Sampling methods
 
@@ -76,6 +96,90 @@ class BaseTrace(object):
         """
         pass
 
+    def keeps(self, idx):
+        """Whether iteration `idx` of a chain is recorded, given `burn`
+        and `thin`. The sampler does not call `record` for the other
+        iterations."""
+        return idx >= self.burn and (idx - self.burn) % self.thin == 0
+
+    def kept_draws(self, draws):
+        """Return how many of `draws` iterations are recorded."""
+        return len(range(self.burn, draws, self.thin))
+
+    # Sampler statistics
+
+    def setup_stats(self, draws, stats_dtypes):
+        """Allocate arrays for the statistics of the step methods.
+
+        The statistics are kept in memory by all backends. If the same
+        statistics were recorded before, the new draws are appended.
+
+        Parameters
+        ----------
+        draws : int
+            Expected number of draws
+        stats_dtypes : list of dicts
+            Dtypes of the statistics of each step method by name
+        """
+        names = [sorted(dtypes) for dtypes in stats_dtypes]
+        if names != [sorted(stats) for stats in self._stats]:
+            self._stats = [{} for _ in stats_dtypes]
+            self._stats_idx = 0
+        recorded = self._stats_idx
+        for stats, dtypes in zip(self._stats, stats_dtypes):
+            for name, dtype in dtypes.items():
+                values = np.empty(recorded + draws, dtype=dtype)
+                if name in stats:
+                    values[:recorded] = stats[name][:recorded]
+                stats[name] = values
+
+    def record_stats(self, stats):
+        """Record the statistics of the step methods at a draw.
+
+        Parameters
+        ----------
+        stats : list of dicts
+            Values of the statistics of each step method by name
+        """
+        for values, sampler_stats in zip(self._stats, stats):
+            for name, value in sampler_stats.items():
+                values[name][self._stats_idx] = value
+        self._stats_idx += 1
+
+    @property
+    def stat_names(self):
+        return sorted(set(name for stats in self._stats for name in stats))
+
+    def get_sampler_stats(self, statname, burn=0, thin=1):
+        """Get the values of a sampler statistic.
+
+        Parameters
+        ----------
+        statname : str
+        burn : int
+        thin : int
+
+        Returns
+        -------
+        A NumPy array, with a column per step method if several step
+        methods have the statistic
+        """
+        values = [stats[statname][:self._stats_idx] for stats in self._stats
+                  if statname in stats]
+        if not values:
+            raise KeyError('Unknown sampler statistic {}'.format(statname))
+        if len(values) == 1:
+            return values[0][burn::thin]
+        return np.column_stack(values)[burn::thin]
+
+    def _slice_stats(self, sliced, idx):
+        """Set the statistics of the trace `sliced` to the ones of this
+        trace sliced by `idx`."""
+        sliced._stats = [{name: values[:self._stats_idx][idx]
+                          for name, values in stats.items()}
+                         for stats in self._stats]
+        sliced._stats_idx = len(range(self._stats_idx)[idx])
+
     # Selection methods
 
     def __getitem__(self, idx):
@@ -148,9 +252,35 @@ class MultiTrace(object):
     For any methods that require a single trace (e.g., taking the length
     of the MultiTrace instance, which returns the number of draws), the
     trace with the highest chain number is always used.
+
+    If sampling was monitored for convergence (see the `target_n_eff`
+    and `max_rhat` arguments of `sample`), `stop_reason` is 'converged'
+    if the targets were reached before all draws were taken and 'draws'
+    otherwise, and `convergence_stats` holds the diagnostics of the last
+    check. Both are None for unmonitored runs.
+
+    Deterministic variables of the model that were not recorded (see the
+    `deterministics` argument of the backends) can be selected like
+    recorded variables. The first selection computes all of them from
+    the recorded free variables of a chain, with one compiled function
+    looping over the draws, and keeps the values.
+
+    If the values of a variable in all chains are the rows of one
+    (chain, draw, ...) NDArray block (see `ndarray.stack_chains`), the
+    combined values of all chains are a view of the block, like the
+    values of a single NDArray chain. Otherwise the combined values are
+    cached for the last `cache_size` selections, and a copy of the
+    cached array is returned.
     """
 
+    cache_size = 16
+
     def __init__(self, straces):
+        self.stop_reason = None
+        self.convergence_stats = None
+        self._cache = OrderedDict()
+        self._computed = {}
+        self._deterministics_fn = None
         self._straces = {}
         for strace in straces:
             if strace.chain in self._straces:
@@ -191,7 +321,8 @@ class MultiTrace(object):
             burn, thin = 0, 1
         return self.get_values(var, burn=burn, thin=thin)
 
-    _attrs = set(['_straces', 'varnames', 'chains'])
+    _attrs = set(['_straces', 'varnames', 'chains', '_cache',
+                  '_computed', '_deterministics_fn', 'computed_varnames'])
 
     def __getattr__(self, name):
         # Avoid infinite recursion when called before __init__
@@ -199,7 +330,7 @@ class MultiTrace(object):
         if name in self._attrs:
             raise AttributeError
 
-        if name in self.varnames:
+        if name in self.varnames or name in self.computed_varnames:
             return self[name]
         raise AttributeError("'{}' object has no attribute '{}'".format(
             type(self).__name__, name))
@@ -213,6 +344,20 @@ class MultiTrace(object):
         chain = self.chains[-1]
         return self._straces[chain].varnames
 
+    @property
+    def stat_names(self):
+        """Names of the statistics recorded by the step methods."""
+        return self._straces[self.chains[-1]].stat_names
+
+    @property
+    def computed_varnames(self):
+        """Names of the deterministic variables that were not recorded
+        and are computed when selected."""
+        strace = self._straces[self.chains[-1]]
+        varnames = set(self.varnames)
+        return [var.name for var in strace.model.deterministics
+                if var.name not in varnames]
+
     def get_values(self, varname, burn=0, thin=1, combine=True, chains=None,
                    squeeze=True):
         """Get values from traces.
@@ -239,14 +384,130 @@ class MultiTrace(object):
         """
         if chains is None:
             chains = self.chains
+        elif np.ndim(chains) == 0:  # Single chain passed.
+            chains = [chains]
+        chains = [int(chain) for chain in chains]
         varname = str(varname)
-        try:
-            results = [self._straces[chain].get_values(varname, burn, thin)
+        if not combine:
+            results = [self._chain_values(chain, varname, burn, thin)
                        for chain in chains]
-        except TypeError:  # Single chain passed.
-            results = [self._straces[chains].get_values(varname, burn, thin)]
+            return _squeeze_cat(results, combine, squeeze)
+
+        block = None
+        if varname in self.varnames and chains == self.chains:
+            block = self._block(varname)
+        if block is not None:
+            values = block[:, burn::thin]
+            # Reshaping copies unless all draws are selected.
+            results = values.reshape((-1, ) + values.shape[2:])
+            return results if squeeze else [results]
+
+        key = (varname, burn, thin, tuple(chains),
+               tuple(len(self._straces[chain]) for chain in chains))
+        try:
+            results = self._cache.pop(key)
+        except KeyError:
+            results = np.concatenate([
+                self._chain_values(chain, varname, burn, thin)
+                for chain in chains])
+        self._cache[key] = results
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        # The cached array is not handed out, so it cannot be modified.
+        results = results.copy()
+        return results if squeeze else [results]
+
+    def get_sampler_stats(self, statname, burn=0, thin=1, combine=True,
+                          chains=None, squeeze=True):
+        """Get the values of a statistic recorded by the step methods
+        (see `stat_names`), e.g., the tree depths of NUTS.
+
+        Parameters
+        ----------
+        statname : str
+        burn : int
+        thin : int
+        combine : bool
+            If True, results from `chains` will be concatenated.
+        chains : int or list of ints
+            Chains to retrieve. If None, all chains are used. A single
+            chain value can also be given.
+        squeeze : bool
+            Return a single array element if the resulting list of
+            values only has one element. If False, the result will
+            always be a list of arrays, even if `combine` is True.
+
+        Returns
+        -------
+        A list of NumPy arrays or a single NumPy array (depending on
+        `squeeze`). If several step methods have the statistic, the
+        arrays have a column per step method.
+        """
+        if chains is None:
+            chains = self.chains
+        elif np.ndim(chains) == 0:  # Single chain passed.
+            chains = [chains]
+        results = [self._straces[chain].get_sampler_stats(statname, burn,
+                                                          thin)
+                   for chain in chains]
         return _squeeze_cat(results, combine, squeeze)
 
+    def _chain_values(self, chain, varname, burn, thin):
+        strace = self._straces[chain]
+        if varname in strace.varnames:
+            return strace.get_values(varname, burn, thin)
+        if varname not in self.computed_varnames:
+            raise KeyError("Unknown variable {}".format(varname))
+        draws, computed = self._computed.get(chain, (None, None))
+        if draws != len(strace):
+            computed = self._compute_deterministics(strace)
+            self._computed[chain] = len(strace), computed
+        return computed[varname][burn::thin]
+
+    def _compute_deterministics(self, strace):
+        """Return the values of the deterministic variables that were not
+        recorded at all draws of `strace`, by variable name."""
+        varnames = self.computed_varnames
+        if self._deterministics_fn is None:
+            self._deterministics_fn = _deterministics_fn(strace.model,
+                                                         varnames)
+        inputs, fn = self._deterministics_fn
+        missing = [var.name for var in inputs
+                   if var.name not in strace.varnames]
+        if missing:
+            raise BackendError('Deterministic variables cannot be computed '
+                               'without the values of {}.'.format(missing))
+        values = fn(len(strace),
+                    *[strace.get_values(var.name) for var in inputs])
+        return dict(zip(varnames, values))
+
+    def _block(self, varname):
+        """Return the (chain, draw, ...) block whose rows are the values
+        of `varname` in the chains, or None if there is none."""
+        from .ndarray import NDArray
+        straces = [self._straces[chain] for chain in self.chains]
+        if not all(isinstance(strace, NDArray) for strace in straces):
+            return None
+        samples = [strace.samples.get(varname) for strace in straces]
+        block = getattr(samples[0], 'base', None)
+        if not isinstance(block, np.ndarray) or \
+                block.shape[0] != len(samples) or \
+                block.shape[1:] != samples[0].shape:
+            return None
+        for values, row in zip(samples, block):
+            if not (values.base is block and
+                    values.strides == row.strides and
+                    values.__array_interface__['data'] ==
+                    row.__array_interface__['data']):
+                return None
+        return block
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_deterministics_fn'] = None  # Compiled again if needed.
+        state['_cache'] = OrderedDict()  # The straces hold the values.
+        return state
+
     def _slice(self, idx):
         """Return a new MultiTrace object sliced according to `idx`."""
         new_traces = [trace._slice(idx) for trace in self._straces.values()]
@@ -266,6 +527,41 @@ class MultiTrace(object):
         return self._straces[chain].point(idx)
 
 
+def _deterministics_fn(model, varnames):
+    """Compile a function computing the deterministic variables
+    `varnames` of `model` at a sequence of draws.
+
+    Returns
+    -------
+    The free variables the deterministics depend on, and a function
+    that takes the number of draws and the values of the free variables
+    (with the draws along the first axis) in that order, and returns a
+    list with the values of the deterministics
+    """
+    outs = [model.named_vars[varname] for varname in varnames]
+    graph_inputs = inputvars(outs)
+    inputs = [var for var in model.free_RVs if var in graph_inputs]
+    sequences = []
+    for var in inputs:
+        sequence = tt.TensorType(var.dtype, (False, ) + var.broadcastable)(
+            var.name)
+        # Models are built with `compute_test_value` set to 'raise'.
+        sequence.tag.test_value = np.asarray(var.tag.test_value)[None]
+        sequences.append(sequence)
+
+    def step(*values):
+        return theano.clone(outs, dict(zip(inputs, values)), strict=False)
+
+    draws = tt.lscalar('draws')
+    draws.tag.test_value = 1
+    results, _ = theano.scan(fn=step, sequences=sequences, n_steps=draws)
+    if not isinstance(results, list):
+        results = [results]
+    fn = theano.function([draws] + sequences, results,
+                         on_unused_input='ignore')
+    return inputs, fn
+
+
 def merge_traces(mtraces):
     """Merge MultiTrace objects.
 
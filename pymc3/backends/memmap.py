@@ -0,0 +1,182 @@
+"""Memory-mapped NumPy array trace backend
+
+Store sampling values in NumPy arrays that are memory mapped from files,
+so traces can be larger than the available memory.
+
+File format
+-----------
+
+Sampling values for each chain are saved in a separate directory (under
+a directory specified by the `name` argument). Each variable is stored
+as a raw binary file of C-ordered values, with room for at least the
+number of draws of the chain. The number of recorded draws is stored in
+the file 'draws' of the chain directory. For example,
+
+  mcmc/chain-0/draws
+  mcmc/chain-0/x.dat
+  mcmc/chain-0/y.dat
+
+When a chain is extended, the files grow to at least twice their size,
+so that repeated extensions do not resize the files every time. The
+recorded values are never copied.
+"""
+from glob import glob
+import numpy as np
+import os
+
+from ..backends import base, ndarray
+
+
+class MemmapNDArray(ndarray.NDArray):
+    """NDArray trace object with values in memory-mapped files
+
+    Parameters
+    ----------
+    name : str
+        Name of directory to store the files
+    model : Model
+        If None, the model is taken from the `with` context.
+    vars : list of variables
+        Sampling values will be stored for these variables. If None,
+        `model.unobserved_RVs` is used.
+    burn, thin : int
+        Iterations that are not recorded (see `BaseTrace`)
+    deterministics : bool
+        Whether deterministic variables are recorded (see `BaseTrace`)
+    """
+
+    def __init__(self, name, model=None, vars=None, burn=0, thin=1,
+                 deterministics=True):
+        if not os.path.exists(name):
+            os.mkdir(name)
+        super(MemmapNDArray, self).__init__(name, model, vars, burn, thin,
+                                            deterministics)
+        self.directory = None
+        self._capacity = 0
+
+    # Sampling methods
+
+    def setup(self, draws, chain):
+        """Perform chain-specific setup.
+
+        If the chain already has values, either in this trace or in the
+        files of a previous trace, the new draws are appended.
+
+        Parameters
+        ----------
+        draws : int
+            Expected number of draws
+        chain : int
+            Chain number
+        """
+        if not self.samples or chain != self.chain:
+            self.chain = chain
+            self.directory = os.path.join(self.name,
+                                          'chain-{}'.format(chain))
+            if not os.path.exists(self.directory):
+                os.mkdir(self.directory)
+            self.draw_idx = self._read_draws()
+            self._capacity = self._file_capacity()
+
+        self.draws = self.draw_idx + draws
+        if self.draws > self._capacity:
+            self._capacity = max(self.draws, 2 * self._capacity)
+            for varname in self.varnames:
+                with open(self._filename(varname), 'ab') as fh:
+                    fh.truncate(self._nbytes(varname, self._capacity))
+        self._map(self.draws)
+        self._write_draws()
+
+    def close(self):
+        self._write_draws()
+        for values in self.samples.values():
+            values.flush()
+        super(MemmapNDArray, self).close()
+
+    def _filename(self, varname):
+        return os.path.join(self.directory, '{}.dat'.format(varname))
+
+    def _nbytes(self, varname, draws):
+        size = int(np.prod(self.var_shapes[varname], dtype=int))
+        return draws * size * np.dtype(self.var_dtypes[varname]).itemsize
+
+    def _file_capacity(self):
+        """Return the number of draws the files have room for."""
+        capacity = None
+        for varname in self.varnames:
+            filename = self._filename(varname)
+            if not os.path.exists(filename):
+                return 0
+            row = max(self._nbytes(varname, 1), 1)
+            draws = os.path.getsize(filename) // row
+            capacity = draws if capacity is None else min(capacity, draws)
+        return capacity or 0
+
+    def _read_draws(self):
+        try:
+            with open(os.path.join(self.directory, 'draws')) as fh:
+                return int(fh.read())
+        except (IOError, OSError, ValueError):
+            return 0
+
+    def _write_draws(self):
+        with open(os.path.join(self.directory, 'draws'), 'w') as fh:
+            fh.write(str(self.draw_idx))
+
+    def _map(self, draws):
+        """Map the first `draws` draws of the files to `samples`."""
+        self.samples = {}
+        for varname in self.varnames:
+            shape = self.var_shapes[varname]
+            values = np.memmap(self._filename(varname), mode='r+',
+                               dtype=self.var_dtypes[varname],
+                               shape=(self._capacity, ) + shape)
+            self.samples[varname] = values[:draws]
+
+    # Pickling
+
+    def __getstate__(self):
+        # The memory maps would be pickled as copies, so they are
+        # reopened from the files instead.
+        state = self.__dict__.copy()
+        state['samples'] = {}
+        state['_mapped_draws'] = len(self)
+        return state
+
+    def __setstate__(self, state):
+        mapped_draws = state.pop('_mapped_draws')
+        self.__dict__.update(state)
+        if self.directory is not None:
+            self._map(mapped_draws)
+
+
+def load(name, model=None):
+    """Load MemmapNDArray database.
+
+    Parameters
+    ----------
+    name : str
+        Name of directory with chain directories
+    model : Model
+        If None, the model is taken from the `with` context.
+
+    Returns
+    -------
+    A MultiTrace instance
+    """
+    directories = glob(os.path.join(name, 'chain-*'))
+
+    straces = []
+    for directory in directories:
+        strace = MemmapNDArray(name, model=model)
+        strace.chain = int(directory.rsplit('-', 1)[1])
+        strace.directory = directory
+        # Only the variables on disk, e.g., no deterministics if they
+        # were not recorded.
+        strace.varnames = [varname for varname in strace.varnames
+                           if os.path.exists(strace._filename(varname))]
+        strace.draw_idx = strace.draws = strace._read_draws()
+        strace._capacity = strace._file_capacity()
+        strace._map(strace.draws)
+        straces.append(strace)
+    return base.MultiTrace(straces)
@@ -18,10 +18,16 @@ class NDArray(base.BaseTrace):
     vars : list of variables
         Sampling values will be stored for these variables. If None,
         `model.unobserved_RVs` is used.
+    burn, thin : int
+        Iterations that are not recorded (see `BaseTrace`)
+    deterministics : bool
+        Whether deterministic variables are recorded (see `BaseTrace`)
     """
 
-    def __init__(self, name=None, model=None, vars=None):
-        super(NDArray, self).__init__(name, model, vars)
+    def __init__(self, name=None, model=None, vars=None, burn=0, thin=1,
+                 deterministics=True):
+        super(NDArray, self).__init__(name, model, vars, burn, thin,
+                                      deterministics)
         self.draw_idx = 0
         self.draws = None
         self.samples = {}
@@ -107,6 +113,7 @@ class NDArray(base.BaseTrace):
         sliced.chain = self.chain
         sliced.samples = {varname: values[idx]
                           for varname, values in self.samples.items()}
+        self._slice_stats(sliced, idx)
         return sliced
 
     def point(self, idx):
@@ -118,6 +125,30 @@ class NDArray(base.BaseTrace):
                 for varname, values in self.samples.items()}
 
 
+def stack_chains(straces):
+    """Move the values of NDArray traces into one (chain, draw, ...)
+    array per variable, whose rows become the values of the traces.
+
+    `MultiTrace` then combines the chains of these traces without
+    copying. Variables whose values differ in shape between the traces
+    are left alone.
+
+    Parameters
+    ----------
+    straces : list of NDArray traces
+        Traces of different chains, in the order of their chain numbers
+    """
+    if not straces:
+        return
+    for varname in straces[0].varnames:
+        samples = [strace.samples[varname] for strace in straces]
+        if len(set(values.shape for values in samples)) != 1:
+            continue
+        block = np.stack(samples)
+        for strace, values in zip(straces, block):
+            strace.samples[varname] = values
+
+
 def _slice_as_ndarray(strace, idx):
     if idx.start is None:
         burn = 0
@@ -132,4 +163,5 @@ def _slice_as_ndarray(strace, idx):
     sliced.chain = strace.chain
     sliced.samples = {v: strace.get_values(v, burn=burn, thin=thin)
                       for v in strace.varnames}
+    strace._slice_stats(sliced, slice(burn, None, thin))
     return sliced
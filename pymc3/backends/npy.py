@@ -0,0 +1,414 @@
+"""NumPy binary file trace backend
+
+Store sampling values as chunks of NumPy .npy files.
+
+File format
+-----------
+
+Sampling values for each chain are saved in a separate directory (under
+a directory specified by the `name` argument). Within it, each variable
+has a directory of chunk files, each holding the values of up to
+`chunk_size` consecutive draws. For example,
+
+  mcmc/chain-0/x/chunk-0.npy
+  mcmc/chain-0/x/chunk-1.npy
+  mcmc/chain-0/y/chunk-0.npy
+  mcmc/chain-0/y/chunk-1.npy
+
+holds the first chain of variables x and y. The chunks are memory
+mapped when values are selected, so only the values of the selected
+variable and draws are read.
+
+Compression
+-----------
+
+Variables can be compressed by passing a `Codec` for them. Their chunks
+are then stored as 'chunk-0.bin', 'chunk-1.bin', ... files, which hold
+the number of draws as a little-endian 64-bit integer followed by the
+compressed values, and the codec is saved in the file 'codec.json' of
+the variable's directory. Compressed chunks are decompressed one at a
+time when values are selected.
+"""
+from glob import glob
+import bz2
+import json
+import numpy as np
+import os
+import zlib
+
+from ..backends import base, ndarray
+
+_COMPRESSORS = {
+    'zlib': (lambda data, level: zlib.compress(data, 6 if level is None
+                                               else level),
+             zlib.decompress),
+    'bz2': (lambda data, level: bz2.compress(data, 9 if level is None
+                                             else level),
+            bz2.decompress),
+}
+try:
+    import lzma
+    _COMPRESSORS['lzma'] = (
+        lambda data, level: lzma.compress(data, preset=level),
+        lzma.decompress)
+except ImportError:  # Python 2
+    pass
+
+
+class Codec(object):
+    """Compression of the values of a variable
+
+    Parameters
+    ----------
+    compression : str
+        'zlib', 'bz2', 'lzma' (Python 3 only) or None
+    level : int
+        Compression level. Defaults to the default of the compressor.
+    dtype : str or dtype
+        If given, the values are stored as this type (e.g., 'float32'),
+        which loses precision.
+    shuffle : bool
+        Group the bytes of the values by their position within a value
+        before compressing them. This usually compresses floating point
+        values better, because their leading bytes vary less.
+    """
+
+    def __init__(self, compression='zlib', level=None, dtype=None,
+                 shuffle=False):
+        if compression is not None and compression not in _COMPRESSORS:
+            raise ValueError('Unknown compression {!r}; use one of '
+                             '{}.'.format(compression, sorted(_COMPRESSORS)))
+        self.compression = compression
+        self.level = level
+        self.dtype = None if dtype is None else np.dtype(dtype).str
+        self.shuffle = shuffle
+
+    def __eq__(self, other):
+        return isinstance(other, Codec) and vars(self) == vars(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def encode(self, values):
+        """Return the bytes of array `values`."""
+        values = np.ascontiguousarray(values, dtype=self.dtype or
+                                      values.dtype)
+        data = values.tobytes()
+        if self.shuffle and values.itemsize > 1:
+            data = np.frombuffer(data, dtype=np.uint8).reshape(
+                -1, values.itemsize).T.tobytes()
+        if self.compression is not None:
+            data = _COMPRESSORS[self.compression][0](data, self.level)
+        return data
+
+    def decode(self, data, dtype, shape):
+        """Return the array of type `dtype` and shape `shape` encoded in
+        `data`."""
+        if self.compression is not None:
+            data = _COMPRESSORS[self.compression][1](data)
+        stored = np.dtype(self.dtype or dtype)
+        if self.shuffle and stored.itemsize > 1:
+            data = np.frombuffer(data, dtype=np.uint8).reshape(
+                stored.itemsize, -1).T.tobytes()
+        values = np.frombuffer(data, dtype=stored)
+        return values.astype(dtype).reshape(shape)
+
+
+class NPY(base.BaseTrace):
+    """NPY trace object
+
+    Parameters
+    ----------
+    name : str
+        Name of directory to store the chunk files
+    model : Model
+        If None, the model is taken from the `with` context.
+    vars : list of variables
+        Sampling values will be stored for these variables. If None,
+        `model.unobserved_RVs` is used.
+    chunk_size : int
+        Number of draws per chunk file. The values of a chunk are kept in
+        memory until it is full.
+    burn, thin : int
+        Iterations that are not recorded (see `BaseTrace`)
+    deterministics : bool
+        Whether deterministic variables are recorded (see `BaseTrace`)
+    codecs : Codec or dict of variable name -> Codec
+        Compression of all or of some variables. Variables without a
+        codec are stored as .npy files. When a chain is extended, the
+        codecs it was stored with are used.
+    """
+
+    def __init__(self, name, model=None, vars=None, chunk_size=1000, burn=0,
+                 thin=1, codecs=None, deterministics=True):
+        if not os.path.exists(name):
+            os.mkdir(name)
+        super(NPY, self).__init__(name, model, vars, burn, thin,
+                                  deterministics)
+        self.chunk_size = chunk_size
+        if isinstance(codecs, Codec):
+            codecs = {varname: codecs for varname in self.varnames}
+        self.codecs = dict(codecs or {})
+        self._stored_codecs = {}
+
+        self.directory = None
+        self._buffer = {}
+        self._buffer_idx = 0
+        self._chunk_idx = 0
+        self._lengths = None
+
+    # Sampling methods
+
+    def setup(self, draws, chain):
+        """Perform chain-specific setup.
+
+        Parameters
+        ----------
+        draws : int
+            Expected number of draws
+        chain : int
+            Chain number
+        """
+        self.chain = chain
+        self.directory = os.path.join(self.name, 'chain-{}'.format(chain))
+        self._buffer = {}
+        self._lengths = None
+
+        if os.path.exists(self.directory):
+            prev_varnames = sorted(os.listdir(self.directory))
+            if prev_varnames != sorted(self.varnames):
+                raise base.BackendError(
+                    "Previous directory '{}' has different variables names "
+                    "than current model.".format(self.directory))
+        self._stored_codecs = {}
+        for varname in self.varnames:
+            vardir = os.path.join(self.directory, varname)
+            if not os.path.exists(vardir):
+                os.makedirs(vardir)
+            self._setup_codec(varname)
+
+        lengths = self._chunk_lengths()
+        self._buffer = {varname: np.empty((self.chunk_size, ) + shape,
+                                          dtype=self.var_dtypes[varname])
+                        for varname, shape in self.var_shapes.items()}
+        self._buffer_idx = 0
+        self._chunk_idx = len(lengths)
+        if lengths and lengths[-1] < self.chunk_size:
+            # Continue filling the last chunk.
+            self._chunk_idx -= 1
+            self._buffer_idx = lengths[-1]
+            for varname, buf in self._buffer.items():
+                buf[:self._buffer_idx] = self._load_chunk(varname,
+                                                          self._chunk_idx)
+            self._lengths = lengths[:-1]
+
+    def _setup_codec(self, varname):
+        codec = self.codecs.get(varname)
+        stored = self._codec(varname)
+        if stored is None and codec is not None:
+            if glob(os.path.join(self.directory, varname, 'chunk-*')):
+                stored = False  # Chunks were stored without compression.
+            else:
+                filename = os.path.join(self.directory, varname,
+                                        'codec.json')
+                with open(filename, 'w') as fh:
+                    json.dump(vars(codec), fh)
+                self._stored_codecs[varname] = stored = codec
+        if codec is not None and codec != stored:
+            raise base.BackendError(
+                "Previous values of '{}' in '{}' were stored with a "
+                "different codec.".format(varname, self.directory))
+
+    def record(self, point):
+        """Record results of a sampling iteration.
+
+        Parameters
+        ----------
+        point : dict
+            Values mapped to variable names
+        """
+        for varname, value in zip(self.varnames, self.fn(point)):
+            self._buffer[varname][self._buffer_idx] = value
+        self._buffer_idx += 1
+        if self._buffer_idx == self.chunk_size:
+            self._flush()
+            self._chunk_idx += 1
+            self._buffer_idx = 0
+
+    def _flush(self):
+        for varname, buf in self._buffer.items():
+            self._save_chunk(varname, self._chunk_idx,
+                             buf[:self._buffer_idx])
+        if self._lengths is not None:
+            self._lengths.append(self._buffer_idx)
+
+    def close(self):
+        if self._buffer_idx:
+            self._flush()
+        self._buffer = {}  # Avoid serializing the buffers.
+        self._buffer_idx = 0
+        self._lengths = None
+
+    # Selection methods
+
+    def _codec(self, varname):
+        """Return the codec the values of `varname` are stored with, or
+        None if they are not compressed."""
+        if varname not in self._stored_codecs:
+            filename = os.path.join(self.directory, varname, 'codec.json')
+            codec = None
+            if os.path.exists(filename):
+                with open(filename) as fh:
+                    codec = Codec(**json.load(fh))
+            self._stored_codecs[varname] = codec
+        return self._stored_codecs[varname]
+
+    def _chunk_file(self, varname, idx):
+        ext = 'npy' if self._codec(varname) is None else 'bin'
+        return os.path.join(self.directory, varname,
+                            'chunk-{}.{}'.format(idx, ext))
+
+    def _save_chunk(self, varname, idx, values):
+        codec = self._codec(varname)
+        if codec is None:
+            np.save(self._chunk_file(varname, idx), values)
+            return
+        with open(self._chunk_file(varname, idx), 'wb') as fh:
+            fh.write(np.array(len(values), dtype='<u8').tobytes())
+            fh.write(codec.encode(values))
+
+    def _load_chunk(self, varname, idx):
+        """Return the values of chunk `idx` of `varname`, memory mapped
+        if they are not compressed."""
+        codec = self._codec(varname)
+        filename = self._chunk_file(varname, idx)
+        if codec is None:
+            return np.load(filename, mmap_mode='r')
+        with open(filename, 'rb') as fh:
+            length = int(np.frombuffer(fh.read(8), dtype='<u8')[0])
+            return codec.decode(fh.read(), self.var_dtypes[varname],
+                                (length, ) + self.var_shapes[varname])
+
+    def _chunk_length(self, varname, idx):
+        if self._codec(varname) is None:
+            return len(self._load_chunk(varname, idx))
+        with open(self._chunk_file(varname, idx), 'rb') as fh:
+            return int(np.frombuffer(fh.read(8), dtype='<u8')[0])
+
+    def _chunk_lengths(self):
+        """Return the number of draws in each chunk file that is not
+        being filled."""
+        if self._lengths is None:
+            varname = self.varnames[0]
+            nchunks = len(glob(os.path.join(self.directory, varname,
+                                            'chunk-*')))
+            if self._buffer:
+                nchunks = min(nchunks, self._chunk_idx)
+            self._lengths = [self._chunk_length(varname, idx)
+                             for idx in range(nchunks)]
+        return self._lengths
+
+    def __len__(self):
+        if self.directory is None:
+            return 0
+        return sum(self._chunk_lengths()) + self._buffer_idx
+
+    def get_values(self, varname, burn=0, thin=1):
+        """Get values from trace.
+
+        Parameters
+        ----------
+        varname : str
+        burn : int
+        thin : int
+
+        Returns
+        -------
+        A NumPy array
+        """
+        lengths = list(self._chunk_lengths())
+        parts = [lambda idx=idx: self._load_chunk(varname, idx)
+                 for idx in range(len(lengths))]
+        if self._buffer_idx:
+            lengths.append(self._buffer_idx)
+            parts.append(lambda: self._buffer[varname][:self._buffer_idx])
+
+        start, _, step = slice(burn, None, thin).indices(len(self))
+        if step < 0:
+            return np.concatenate([part() for part in parts])[burn::thin]
+
+        # Only the chunks with selected draws are read.
+        selected = []
+        offset = 0
+        for part, length in zip(parts, lengths):
+            if start < offset + length:
+                # Index of the first selected draw within this chunk
+                first = (start - offset) if start >= offset else \
+                    (start - offset) % step
+                if first < length:
+                    selected.append(part()[first::step])
+            offset += length
+        if not selected:
+            return np.empty((0, ) + self.var_shapes[varname],
+                            dtype=self.var_dtypes[varname])
+        return np.concatenate(selected)
+
+    def _slice(self, idx):
+        if idx.stop is not None:
+            raise ValueError('Stop value in slice not supported.')
+        return ndarray._slice_as_ndarray(self, idx)
+
+    def point(self, idx):
+        """Return dictionary of point values at `idx` for current chain
+        with variables names as keys.
+        """
+        idx = int(idx)
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError('Index {} is out of bounds.'.format(idx))
+
+        lengths = self._chunk_lengths()
+        ends = np.cumsum(lengths)
+        chunk = int(np.searchsorted(ends, idx, side='right'))
+        if chunk == len(lengths):
+            # The draw has not been written yet.
+            row = idx - sum(lengths)
+            return {varname: buf[row].copy()
+                    for varname, buf in self._buffer.items()}
+        row = idx - (ends[chunk] - lengths[chunk])
+        pt = {}
+        for varname in self.varnames:
+            values = self._load_chunk(varname, chunk)
+            pt[varname] = np.array(values[row])
+        return pt
+
+
+def load(name, model=None):
+    """Load NPY database.
+
+    Parameters
+    ----------
+    name : str
+        Name of directory with chain directories
+    model : Model
+        If None, the model is taken from the `with` context.
+
+    Returns
+    -------
+    A MultiTrace instance
+    """
+    directories = glob(os.path.join(name, 'chain-*'))
+
+    straces = []
+    for directory in directories:
+        chain = int(directory.rsplit('-', 1)[1])
+        strace = NPY(name, model=model)
+        strace.chain = chain
+        strace.directory = directory
+        # Only the variables on disk, e.g., no deterministics if they
+        # were not recorded.
+        strace.varnames = [varname for varname in strace.varnames
+                           if os.path.isdir(os.path.join(directory, varname))]
+        straces.append(strace)
+    return base.MultiTrace(straces)
@@ -0,0 +1,215 @@
+"""Shared memory trace backend
+
+Store sampling values in NumPy arrays that are backed by
+`multiprocessing` shared memory.
+
+The buffers are allocated by the process that calls `setup`. Processes
+that are started afterwards and inherit the trace (e.g., the workers
+started by `sample(njobs>1, trace='shared')`) record their draws
+directly into these buffers, so the parent process can access the
+values without the traces being pickled and copied back. The sampler
+statistics are kept in shared buffers in the same way.
+
+Shared buffers can only be pickled while starting processes, so
+`close` copies the values into ordinary arrays. A closed trace can be
+pickled like an NDArray trace.
+"""
+import multiprocessing
+
+import numpy as np
+
+from ..backends import base, ndarray
+
+
+class SharedNDArray(ndarray.NDArray):
+    """NDArray trace object with values in shared memory
+
+    Parameters
+    ----------
+    name : str
+        Name of backend. This has no meaning for the SharedNDArray
+        backend.
+    model : Model
+        If None, the model is taken from the `with` context.
+    vars : list of variables
+        Sampling values will be stored for these variables. If None,
+        `model.unobserved_RVs` is used.
+    burn, thin : int
+        Iterations that are not recorded (see `BaseTrace`)
+    deterministics : bool
+        Whether deterministic variables are recorded (see `BaseTrace`)
+    """
+
+    def __init__(self, name=None, model=None, vars=None, burn=0, thin=1,
+                 deterministics=True):
+        # The number of recorded draws has to be visible to the process
+        # that allocated the buffers.
+        self._draw_idx = multiprocessing.RawValue('l', 0)
+        self._raw = {}
+        self._raw_stats_idx = multiprocessing.RawValue('l', 0)
+        self._raw_stats = []
+        self._stats_draws = 0
+        super(SharedNDArray, self).__init__(name, model, vars, burn, thin,
+                                            deterministics)
+
+    @property
+    def draw_idx(self):
+        return self._draw_idx.value
+
+    @draw_idx.setter
+    def draw_idx(self, value):
+        self._draw_idx.value = value
+
+    @property
+    def _stats_idx(self):
+        return self._raw_stats_idx.value
+
+    @_stats_idx.setter
+    def _stats_idx(self, value):
+        self._raw_stats_idx.value = value
+
+    # Sampling methods
+
+    def setup(self, draws, chain):
+        """Perform chain-specific setup.
+
+        If the buffers for `chain` have already been allocated (e.g., by
+        a parent process) and nothing has been recorded yet, they are
+        reused.
+
+        Parameters
+        ----------
+        draws : int
+            Expected number of draws
+        chain : int
+            Chain number
+        """
+        if self._raw and self.chain == chain and self.draw_idx == 0:
+            if draws > self.draws:
+                raise base.BackendError(
+                    'Shared buffers were allocated for {} draws, but {} '
+                    'draws were requested.'.format(self.draws, draws))
+            return
+
+        self.chain = chain
+        old_draws = self.draw_idx
+        self._draw_idx = multiprocessing.RawValue('l', old_draws)
+        self.draws = old_draws + draws
+        old_samples = self.samples
+        self._raw = {}
+        self.samples = {}
+        for varname, shape in self.var_shapes.items():
+            raw, values = _shared_array((self.draws, ) + shape,
+                                        self.var_dtypes[varname])
+            if old_draws:
+                values[:old_draws] = old_samples[varname][:old_draws]
+            self._raw[varname] = raw
+            self.samples[varname] = values
+
+    def setup_stats(self, draws, stats_dtypes):
+        """Allocate shared buffers for the statistics of the step methods.
+
+        If the buffers for the same statistics have already been
+        allocated and nothing has been recorded yet, they are reused.
+
+        Parameters
+        ----------
+        draws : int
+            Expected number of draws
+        stats_dtypes : list of dicts
+            Dtypes of the statistics of each step method by name
+        """
+        names = [sorted(dtypes) for dtypes in stats_dtypes]
+        if (self._raw_stats and self._stats_idx == 0 and
+                names == [sorted(stats) for stats in self._stats]):
+            if draws > self._stats_draws:
+                raise base.BackendError(
+                    'Shared buffers were allocated for {} draws, but {} '
+                    'draws were requested.'.format(self._stats_draws, draws))
+            return
+
+        super(SharedNDArray, self).setup_stats(draws, stats_dtypes)
+        recorded = self._stats_idx
+        self._raw_stats_idx = multiprocessing.RawValue('l', recorded)
+        self._stats_draws = recorded + draws
+        self._raw_stats = []
+        for stats in self._stats:
+            raw_stats = {}
+            for name, values in stats.items():
+                raw, shared_values = _shared_array(values.shape,
+                                                   values.dtype)
+                shared_values[:recorded] = values[:recorded]
+                raw_stats[name] = raw
+                stats[name] = shared_values
+            self._raw_stats.append(raw_stats)
+
+    def close(self):
+        """Copy the recorded values out of the shared buffers."""
+        draws = self.draw_idx
+        self.samples = {varname: np.array(values[:draws])
+                        for varname, values in self.samples.items()}
+        self._raw = {}
+        self._draw_idx = _LocalValue(draws)
+        self.draws = draws
+
+        stats_draws = self._stats_idx
+        self._stats = [{name: np.array(values[:stats_draws])
+                        for name, values in stats.items()}
+                       for stats in self._stats]
+        self._raw_stats = []
+        self._raw_stats_idx = _LocalValue(stats_draws)
+        self._stats_draws = stats_draws
+
+    # Selection methods
+
+    def __len__(self):
+        return self.draw_idx
+
+    # Pickling
+
+    def __getstate__(self):
+        # The NumPy views would be pickled as copies, so they are
+        # rebuilt from the shared buffers instead.
+        state = self.__dict__.copy()
+        if self._raw:
+            state['samples'] = {}
+        if self._raw_stats:
+            state['_stats'] = [{name: values.dtype
+                                for name, values in stats.items()}
+                               for stats in self._stats]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self._raw:
+            self.samples = {}
+            for varname, raw in self._raw.items():
+                shape = (self.draws, ) + self.var_shapes[varname]
+                self.samples[varname] = _array_from_buffer(
+                    raw, shape, self.var_dtypes[varname])
+        if self._raw_stats:
+            self._stats = [{name: _array_from_buffer(raw, self._stats_draws,
+                                                     dtypes[name])
+                            for name, raw in raw_stats.items()}
+                           for raw_stats, dtypes in zip(self._raw_stats,
+                                                        self._stats)]
+
+
+class _LocalValue(object):
+    """Stand-in for the `RawValue` of a number of draws once the trace
+    is closed."""
+
+    def __init__(self, value):
+        self.value = value
+
+
+def _shared_array(shape, dtype):
+    """Allocate a zero-filled shared buffer and a NumPy view of it."""
+    nbytes = int(np.prod(shape)) * np.dtype(dtype).itemsize
+    raw = multiprocessing.RawArray('b', max(nbytes, 1))
+    return raw, _array_from_buffer(raw, shape, dtype)
+
+
+def _array_from_buffer(raw, shape, dtype):
+    return np.frombuffer(raw, dtype=dtype,
+                         count=int(np.prod(shape))).reshape(shape)
@@ -6,30 +6,38 @@ Database format
 ---------------
 For each variable, a table is created with the following format:
 
- recid (INT), draw (INT), chain (INT),  v0 (FLOAT), v1 (FLOAT), v2 (FLOAT) ...
+ recid (INT), draw (INT), chain (INT), value (BLOB)
 
-The variable column names are extended to reflect additional dimensions.
-For example, a variable with the shape (2, 2) would be stored as
-
- key (INT), draw (INT), chain (INT),  v0_0 (FLOAT), v0_1 (FLOAT), v1_0 (FLOAT) ...
+The value column holds the bytes of the variable's values at the draw,
+as a C-ordered array of the variable's dtype. The values of a variable
+with the shape (2, 2) are thus stored in a single BLOB of four numbers.
 
 The key is autoincremented each time a new row is added to the table.
 The chain column denotes the chain index and starts at 0.
+
+While a trace is recorded, the database is in write-ahead log mode
+(`PRAGMA journal_mode=WAL`). This setting is stored in the database
+file, so the previous journal mode is restored when the trace is
+closed, unless other connections still use the database.
+
+Databases written by earlier versions, which stored each element of a
+variable in a separate column (v0_0, v0_1, ...), can still be read.
 """
 import numpy as np
 import sqlite3
 
 from ..backends import base, ndarray
-from . import tracetab as ttab
 
 TEMPLATES = {
     'table':            ('CREATE TABLE IF NOT EXISTS [{table}] '
                          '(recid INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT, '
                          'draw INTEGER, chain INT(5), '
-                         '{value_cols})'),
+                         'value BLOB)'),
+    'index':            ('CREATE INDEX IF NOT EXISTS [{table}_chain_draw] '
+                         'ON [{table}] (chain, draw)'),
     'insert':           ('INSERT INTO [{table}] '
-                         '(recid, draw, chain, {value_cols}) '
-                         'VALUES (NULL, ?, ?, {values})'),
+                         '(recid, draw, chain, value) '
+                         'VALUES (NULL, ?, ?, ?)'),
     'max_draw':         ('SELECT MAX(draw) FROM [{table}] '
                          'WHERE chain = ?'),
     'draw_count':       ('SELECT COUNT(*) FROM [{table}] '
@@ -52,6 +60,8 @@ TEMPLATES = {
                          'ORDER BY draw LIMIT 1)) % :thin = 0'),
     'select_point':     ('SELECT * FROM [{table}] '
                          'WHERE (chain = :chain) AND (draw = :draw)'),
+    'select_new':       ('SELECT * FROM [{table}] '
+                         'WHERE recid > ? ORDER BY recid'),
 }
 
 sqlite3.register_adapter(np.int32, int)
@@ -70,22 +80,30 @@ class SQLite(base.BaseTrace):
     vars : list of variables
         Sampling values will be stored for these variables. If None,
         `model.unobserved_RVs` is used.
+    burn, thin : int
+        Iterations that are not recorded (see `BaseTrace`)
+    deterministics : bool
+        Whether deterministic variables are recorded (see `BaseTrace`)
     """
 
-    def __init__(self, name, model=None, vars=None):
-        super(SQLite, self).__init__(name, model, vars)
-        self._var_cols = {}
+    def __init__(self, name, model=None, vars=None, burn=0, thin=1,
+                 deterministics=True):
+        super(SQLite, self).__init__(name, model, vars, burn, thin,
+                                     deterministics)
         self.var_inserts = {}  # varname -> insert statement
         self.draw_idx = 0
         self._is_setup = False
         self._len = None
 
         self.db = _SQLiteDB(name)
-        # Inserting sampling information is queued to avoid locks
-        # caused by hitting the database with transactions each
-        # iteration.
-        self._queue = {varname: [] for varname in self.varnames}
+        # Values are buffered in arrays and inserted in a single
+        # transaction when the buffers are full, to avoid locks caused
+        # by hitting the database with transactions each iteration.
+        self._buffer = {}
+        self._buffer_idx = 0
+        self._buffer_rows = 0
         self._queue_limit = 5000
+        self._journal_mode = None
 
     # Sampling methods
 
@@ -100,41 +118,52 @@ class SQLite(base.BaseTrace):
             Chain number
         """
         self.db.connect()
+        # Trade durability for speed while sampling. A crash can lose
+        # the draws of the last transaction, but not corrupt the file.
+        if self._journal_mode is None:
+            self.db.cursor.execute('PRAGMA journal_mode')
+            self._journal_mode = self.db.cursor.fetchone()[0]
+        self.db.cursor.execute('PRAGMA journal_mode=WAL')
+        self.db.cursor.execute('PRAGMA synchronous=OFF')
         self.chain = chain
 
         if self._is_setup:
             self.draw_idx = self._get_max_draw(chain) + 1
             self._len = None
         else:  # Table has not been created.
-            self._var_cols = {varname: ttab.create_flat_names('v', shape)
-                              for varname, shape in self.var_shapes.items()}
             self._create_table()
             self._is_setup = True
         self._create_insert_queries(chain)
 
+        # Keep the buffers below about 64 MB.
+        row_bytes = sum(self._row_bytes(varname)
+                        for varname in self.varnames)
+        nrows = max(1, min(self._queue_limit, 2 ** 26 // max(row_bytes, 1)))
+        self._buffer = {varname: np.empty((nrows, ) + shape,
+                                          dtype=self.var_dtypes[varname])
+                        for varname, shape in self.var_shapes.items()}
+        self._buffer_idx = 0
+        self._buffer_rows = nrows
+
+    def _row_bytes(self, varname):
+        size = int(np.prod(self.var_shapes[varname], dtype=int))
+        return size * np.dtype(self.var_dtypes[varname]).itemsize
+
     def _create_table(self):
-        template = TEMPLATES['table']
         with self.db.con:
-            for varname, var_cols in self._var_cols.items():
-                if np.issubdtype(self.var_dtypes[varname], np.int):
-                    dtype = 'INT'
-                else:
-                    dtype = 'FLOAT'
-                colnames = ', '.join([v + ' ' + dtype for v in var_cols])
-                statement = template.format(table=varname,
-                                            value_cols=colnames)
-                self.db.cursor.execute(statement)
+            for varname in self.varnames:
+                columns = _get_column_list(self.db.cursor, varname)
+                if columns and 'value' not in columns:
+                    raise base.BackendError(
+                        "Table '{}' was written by an earlier version and "
+                        "cannot be appended to.".format(varname))
+                for template in (TEMPLATES['table'], TEMPLATES['index']):
+                    self.db.cursor.execute(template.format(table=varname))
 
     def _create_insert_queries(self, chain):
         template = TEMPLATES['insert']
-        for varname, var_cols in self._var_cols.items():
-            # Create insert statement for each variable.
-            var_str = ', '.join(var_cols)
-            placeholders = ', '.join(['?'] * len(var_cols))
-            statement = template.format(table=varname,
-                                        value_cols=var_str,
-                                        values=placeholders)
-            self.var_inserts[varname] = statement
+        for varname in self.varnames:
+            self.var_inserts[varname] = template.format(table=varname)
 
     def record(self, point):
         """Record results of a sampling iteration.
@@ -145,26 +174,47 @@ class SQLite(base.BaseTrace):
             Values mapped to variable names
         """
         for varname, value in zip(self.varnames, self.fn(point)):
-            values = (self.draw_idx, self.chain) + tuple(np.ravel(value))
-            self._queue[varname].append(values)
+            self._buffer[varname][self._buffer_idx] = value
+        self._buffer_idx += 1
+        self.draw_idx += 1
 
-        if len(self._queue[varname]) > self._queue_limit:
+        if self._buffer_idx == self._buffer_rows:
             self._execute_queue()
-        self.draw_idx += 1
 
     def _execute_queue(self):
+        nrows = self._buffer_idx
+        if not nrows:
+            return
+        self._len = None
+        first = self.draw_idx - nrows
         with self.db.con:
             for varname in self.varnames:
-                if not self._queue[varname]:
-                    continue
-                self.db.cursor.executemany(self.var_inserts[varname],
-                                           self._queue[varname])
-                self._queue[varname] = []
+                data = self._buffer[varname][:nrows].tobytes()
+                size = self._row_bytes(varname)
+                rows = ((first + i, self.chain,
+                         sqlite3.Binary(data[i * size:(i + 1) * size]))
+                        for i in range(nrows))
+                self.db.cursor.executemany(self.var_inserts[varname], rows)
+        self._buffer_idx = 0
 
     def close(self):
         self._execute_queue()
+        self._buffer = {}  # Avoid serializing the buffers.
+        self._restore_journal_mode()
         self.db.close()
 
+    def _restore_journal_mode(self):
+        if self._journal_mode is None or not self.db.connected:
+            return
+        try:
+            self.db.cursor.execute(
+                'PRAGMA journal_mode={}'.format(self._journal_mode))
+        except sqlite3.OperationalError:
+            # Another connection, e.g., of a parallel chain, still uses
+            # the write-ahead log.
+            pass
+        self._journal_mode = None
+
     # Selection methods
 
     def __len__(self):
@@ -225,7 +275,7 @@ class SQLite(base.BaseTrace):
         shape = (-1,) + self.var_shapes[varname]
         statement = TEMPLATES[action].format(table=varname)
         self.db.cursor.execute(statement, statement_args)
-        values = _rows_to_ndarray(self.db.cursor)
+        values = self._rows_to_ndarray(varname, self.db.cursor.fetchall())
         return values.reshape(shape)
 
     def _slice(self, idx):
@@ -239,7 +289,7 @@ class SQLite(base.BaseTrace):
         """
         idx = int(idx)
         if idx < 0:
-            idx = self._get_max_draw(self.chain) - idx - 1
+            idx = self._get_max_draw(self.chain) + idx + 1
         statement = TEMPLATES['select_point']
         self.db.connect()
         var_values = {}
@@ -247,10 +297,21 @@ class SQLite(base.BaseTrace):
         for varname in self.varnames:
             self.db.cursor.execute(statement.format(table=varname),
                                    statement_args)
-            values = _rows_to_ndarray(self.db.cursor)
+            values = self._rows_to_ndarray(varname,
+                                           self.db.cursor.fetchall())
             var_values[varname] = values.reshape(self.var_shapes[varname])
         return var_values
 
+    def _rows_to_ndarray(self, varname, rows):
+        """Convert SQL rows of `varname` to NDArray."""
+        if rows and not isinstance(rows[0][3], (int, float)):
+            # The blobs are `buffer` objects on Python 2 and `bytes` on
+            # Python 3. Concatenating also gives a writable array.
+            dtype = self.var_dtypes[varname]
+            return np.concatenate([np.frombuffer(row[3], dtype=dtype)
+                                   for row in rows])
+        return _rows_to_ndarray(rows)
+
 
 class _SQLiteDB(object):
 
@@ -306,6 +367,67 @@ def load(name, model=None):
     return base.MultiTrace(straces)
 
 
+class Tail(object):
+    """Reader of the draws added to an SQLite database since the last
+    read, e.g., while a sampler is writing to it.
+
+    The id of the last row read from each table is remembered, so each
+    read only selects the new rows.
+
+    Parameters
+    ----------
+    name : str
+        Path to SQLite database file
+    model : Model
+        If None, the model is taken from the `with` context.
+    """
+
+    def __init__(self, name, model=None):
+        self.name = name
+        self.model = model
+        self._strace = None
+        self._last_recid = {}
+
+    def read(self):
+        """Return the new draws of each chain.
+
+        Returns
+        -------
+        A dictionary that maps the chains with new draws to
+        dictionaries of the values of each variable
+        """
+        db = _SQLiteDB(self.name)
+        db.connect()
+        try:
+            # Read all tables in one transaction, so they have the same
+            # draws.
+            db.cursor.execute('BEGIN')
+            varnames = _get_table_list(db.cursor)
+            rows = {}
+            for varname in varnames:
+                statement = TEMPLATES['select_new'].format(table=varname)
+                db.cursor.execute(statement,
+                                  (self._last_recid.get(varname, 0), ))
+                rows[varname] = db.cursor.fetchall()
+            db.cursor.execute('COMMIT')
+        finally:
+            db.close()
+        if rows and self._strace is None:
+            self._strace = SQLite(self.name, model=self.model)
+
+        new = {}
+        for varname, var_rows in rows.items():
+            if not var_rows:
+                continue
+            self._last_recid[varname] = var_rows[-1][0]
+            shape = (-1, ) + self._strace.var_shapes[varname]
+            for chain in sorted(set(row[2] for row in var_rows)):
+                values = self._strace._rows_to_ndarray(
+                    varname, [row for row in var_rows if row[2] == chain])
+                new.setdefault(chain, {})[varname] = values.reshape(shape)
+        return new
+
+
 def _get_table_list(cursor):
     """Return a list of table names in the current database."""
     # Modified from Django. Skips the sqlite_sequence system table used
@@ -322,6 +444,13 @@ def _get_var_strs(cursor, varname):
     return [name for name in col_names if name.startswith('v')]
 
 
+def _get_column_list(cursor, varname):
+    """Return a list of the column names of table `varname`, which is
+    empty if the table does not exist."""
+    cursor.execute('PRAGMA table_info([{}])'.format(varname))
+    return [row[1] for row in cursor.fetchall()]
+
+
 def _get_chain_list(cursor, varname):
     """Return a list of sorted chains for `varname`."""
     cursor.execute('SELECT DISTINCT chain FROM [{}]'.format(varname))
@@ -330,6 +459,6 @@ def _get_chain_list(cursor, varname):
     return chains
 
 
-def _rows_to_ndarray(cursor):
-    """Convert SQL row to NDArray."""
-    return np.squeeze(np.array([row[3:] for row in cursor.fetchall()]))
+def _rows_to_ndarray(rows):
+    """Convert SQL rows with a column per element to NDArray."""
+    return np.squeeze(np.array([row[3:] for row in rows]))
@@ -16,9 +16,11 @@ represents two variables, x and y, where x is a scalar and y has a
 shape of (3, 2).
 """
 from glob import glob
+import io
 import numpy as np
 import os
 import pandas as pd
+import zipfile
 
 from ..backends import base, ndarray
 from . import tracetab as ttab
@@ -36,12 +38,18 @@ class Text(base.BaseTrace):
     vars : list of variables
         Sampling values will be stored for these variables. If None,
         `model.unobserved_RVs` is used.
+    burn, thin : int
+        Iterations that are not recorded (see `BaseTrace`)
+    deterministics : bool
+        Whether deterministic variables are recorded (see `BaseTrace`)
     """
 
-    def __init__(self, name, model=None, vars=None):
+    def __init__(self, name, model=None, vars=None, burn=0, thin=1,
+                 deterministics=True):
         if not os.path.exists(name):
             os.mkdir(name)
-        super(Text, self).__init__(name, model, vars)
+        super(Text, self).__init__(name, model, vars, burn, thin,
+                                   deterministics)
 
         self.flat_names = {v: ttab.create_flat_names(v, shape)
                            for v, shape in self.var_shapes.items()}
@@ -64,6 +72,7 @@ class Text(base.BaseTrace):
         """
         self.chain = chain
         self.filename = os.path.join(self.name, 'chain-{}.csv'.format(chain))
+        self.df = None  # Drop values loaded before the chain is extended.
 
         cnames = [fv for v in self.varnames for fv in self.flat_names[v]]
 
@@ -168,11 +177,78 @@ def load(name, model=None):
         strace = Text(name, model=model)
         strace.chain = chain
         strace.filename = f
+        # Only the variables in the file, e.g., no deterministics if
+        # they were not recorded.
+        with open(f) as fh:
+            columns = set(fh.readline().strip().split(','))
+        strace.varnames = [varname for varname in strace.varnames
+                           if set(strace.flat_names[varname]) <= columns]
         straces.append(strace)
     return base.MultiTrace(straces)
 
 
-def dump(name, trace, chains=None):
+class Tail(object):
+    """Reader of the draws added to Text files since the last read, e.g.,
+    while a sampler is writing to them.
+
+    The offset of the last complete line read from each file is
+    remembered, so each read only parses the new lines. The model is
+    not needed, as the shapes of the variables are taken from the
+    column names.
+
+    Parameters
+    ----------
+    name : str
+        Name of directory with files (one per chain)
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._offsets = {}  # chain -> offset of the first unread line
+        self._columns = {}  # chain -> column names
+
+    def read(self):
+        """Return the new draws of each chain.
+
+        Returns
+        -------
+        A dictionary that maps the chains with new draws to
+        dictionaries of the values of each variable
+        """
+        new = {}
+        for filename in glob(os.path.join(self.name, 'chain-*.csv')):
+            chain = int(os.path.splitext(filename)[0].rsplit('-', 1)[1])
+            with open(filename, 'rb') as fh:
+                fh.seek(self._offsets.get(chain, 0))
+                data = fh.read()
+            # The last line may still be written.
+            end = data.rfind(b'\n') + 1
+            if not end:
+                continue
+            data = data[:end]
+            if chain not in self._columns:
+                header, data = data.split(b'\n', 1)
+                self._columns[chain] = header.decode().strip().split(',')
+            self._offsets[chain] = self._offsets.get(chain, 0) + end
+            if data:
+                new[chain] = self._parse(data, self._columns[chain])
+        return new
+
+    @staticmethod
+    def _parse(data, columns):
+        df = pd.read_csv(io.BytesIO(data), header=None, names=columns)
+        flat_names = {}
+        for column in columns:
+            varname, _ = ttab._split_flat_name(column)
+            flat_names.setdefault(varname, []).append(column)
+        values = {}
+        for varname, names in flat_names.items():
+            shape = (df.shape[0], ) + ttab._create_shape(names)
+            values[varname] = df[names].values.reshape(shape)
+        return values
+
+
+def dump(name, trace, chains=None, format='csv'):
     """Store values from NDArray trace as CSV files.
 
     Parameters
@@ -183,7 +259,14 @@ def dump(name, trace, chains=None):
         Result of MCMC run with default NDArray backend
     chains : list
         Chains to dump. If None, all chains are dumped.
+    format : str
+        'csv' stores files that can be loaded with `load`. For export,
+        'npz' stores the arrays of the variables as in `numpy.savez`,
+        and 'parquet' stores a column per element of each variable
+        (this requires pyarrow or fastparquet).
     """
+    if format not in ('csv', 'npz', 'parquet'):
+        raise ValueError("Unknown format '{}'".format(format))
     if not os.path.exists(name):
         os.mkdir(name)
     if chains is None:
@@ -194,7 +277,37 @@ def dump(name, trace, chains=None):
                   for v, shape in var_shapes.items()}
 
     for chain in chains:
-        filename = os.path.join(name, 'chain-{}.csv'.format(chain))
-        df = ttab.trace_to_dataframe(
-            trace, chains=chain, flat_names=flat_names)
-        df.to_csv(filename, index=False)
+        filename = os.path.join(name, 'chain-{}.{}'.format(chain, format))
+        if format == 'csv':
+            _dump_csv(filename, trace, chain, flat_names)
+        elif format == 'npz':
+            _dump_npz(filename, trace, chain)
+        else:
+            df = ttab.trace_to_dataframe(
+                trace, chains=chain, flat_names=flat_names)
+            df.to_parquet(filename)
+
+
+def _dump_csv(filename, trace, chain, flat_names):
+    block, columns = ttab.trace_to_array(trace, chains=chain,
+                                         flat_names=flat_names)
+    var_dtypes = trace._straces[chain].var_dtypes
+    fmt = []
+    for varname in trace.varnames:
+        if np.issubdtype(var_dtypes[varname], np.integer):
+            fmt.extend(['%d'] * len(flat_names[varname]))
+        else:
+            fmt.extend(['%.17g'] * len(flat_names[varname]))
+    np.savetxt(filename, block, fmt=fmt, delimiter=',',
+               header=','.join(columns), comments='')
+
+
+def _dump_npz(filename, trace, chain):
+    # Written like `numpy.savez`, which cannot store a variable named
+    # 'file'.
+    with zipfile.ZipFile(filename, 'w', allowZip64=True) as zf:
+        for varname in trace.varnames:
+            values = trace.get_values(varname, chains=chain)
+            buf = io.BytesIO()
+            np.lib.format.write_array(buf, np.ascontiguousarray(values))
+            zf.writestr(varname + '.npy', buf.getvalue())
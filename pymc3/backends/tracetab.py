@@ -1,10 +1,12 @@
 """Functions for converting traces into a table-like format
 """
 
+import itertools
+
 import numpy as np
 import pandas as pd
 
-__all__ = ['trace_to_dataframe']
+__all__ = ['trace_to_dataframe', 'trace_to_array']
 
 
 def trace_to_dataframe(trace, chains=None, flat_names=None):
@@ -18,18 +20,78 @@ def trace_to_dataframe(trace, chains=None, flat_names=None):
         chain value can also be given.
     flat_names : dict or None
         A dictionary that maps each variable name in `trace` to a list
+        of flat variable names (e.g., ['x__0', 'x__1', ...])
     """
-    var_shapes = trace._straces[0].var_shapes
+    strace = trace._straces[trace.chains[-1]]
     if flat_names is None:
         flat_names = {v: create_flat_names(v, shape)
-                      for v, shape in var_shapes.items()}
+                      for v, shape in strace.var_shapes.items()}
+
+    # Variables of the same dtype share a block, so that integer
+    # variables are not converted to floats.
+    groups = {}
+    for varname in trace.varnames:
+        dtype = np.dtype(strace.var_dtypes[varname])
+        groups.setdefault(dtype, []).append(varname)
+
+    dfs = []
+    for varnames in groups.values():
+        block, names = trace_to_array(trace, chains, varnames, flat_names)
+        dfs.append(pd.DataFrame(block, columns=names, copy=False))
+    if len(dfs) == 1:
+        return dfs[0]
+    df = pd.concat(dfs, axis=1)
+    return df[[name for varname in trace.varnames
+               for name in flat_names[varname]]]
+
 
-    var_dfs = []
-    for varname, shape in var_shapes.items():
+def trace_to_array(trace, chains=None, varnames=None, flat_names=None):
+    """Return the values of `trace` as a 2-D array.
+
+    Parameters
+    ----------
+    trace : MultiTrace
+    chains : int or list of ints
+        Chains to include. If None, all chains are used. A single
+        chain value can also be given.
+    varnames : list of str
+        Variables to include. If None, all variables are used.
+    flat_names : dict or None
+        A dictionary that maps each variable name in `trace` to a list
+        of flat variable names
+
+    Returns
+    -------
+    An array with a row per draw and a column per element of each
+    variable, and a list of the column names
+    """
+    if varnames is None:
+        varnames = trace.varnames
+    if flat_names is None:
+        flat_names = {}
+
+    columns = []
+    values = []
+    for varname in varnames:
         vals = trace.get_values(varname, combine=True, chains=chains)
-        flat_vals = vals.reshape(vals.shape[0], -1)
-        var_dfs.append(pd.DataFrame(flat_vals, columns=flat_names[varname]))
-    return pd.concat(var_dfs, axis=1)
+        values.append(vals.reshape(vals.shape[0], -1))
+        columns.extend(flat_names.get(varname) or
+                       create_flat_names(varname, vals.shape[1:]))
+    if not values:
+        return np.empty((len(trace), 0)), columns
+
+    block = np.empty((values[0].shape[0], len(columns)),
+                     dtype=np.result_type(*values))
+    start = 0
+    for vals in values:
+        block[:, start:start + vals.shape[1]] = vals
+        start += vals.shape[1]
+    return block, columns
+
+
+# Flat names by variable name and shape. They are kept as tuples, so
+# that callers cannot change them.
+_flat_names = {}
 
 
 def create_flat_names(varname, shape):
@@ -43,17 +105,45 @@ def create_flat_names(varname, shape):
     >>> create_flat_names('x', (2, 2))
     ['x__0_0', 'x__0_1', 'x__1_0', 'x__1_1']
     """
+    key = varname, tuple(shape)
+    try:
+        return list(_flat_names[key])
+    except KeyError:
+        pass
     if not shape:
-        return [varname]
-    labels = (np.ravel(xs).tolist() for xs in np.indices(shape))
-    labels = (map(str, xs) for xs in labels)
-    return ['{}__{}'.format(varname, '_'.join(idxs)) for idxs in zip(*labels)]
+        names = (varname, )
+    else:
+        template = varname + '__{}'
+        names = tuple(template.format('_'.join(map(str, idxs)))
+                      for idxs in itertools.product(*map(range, shape)))
+    _flat_names[key] = names
+    return list(names)
 
 
 def _create_shape(flat_names):
     "Determine shape from `create_flat_names` output."
-    try:
-        _, shape_str = flat_names[-1].rsplit('__', 1)
-    except ValueError:
-        return ()
-    return tuple(int(i) + 1 for i in shape_str.split('_'))
+    _, idxs = _split_flat_name(flat_names[-1])
+    return tuple(i + 1 for i in idxs)
+
+
+def _split_flat_name(flat_name):
+    """Return the variable name and the indices of a name returned by
+    `create_flat_names`.
+
+    A name is the name of a scalar variable unless the text after its
+    last '__' is a list of integers joined by '_', so the names of
+    transformed scalars like 'sigma_log__' are kept whole.
+
+    Examples
+    --------
+    >>> _split_flat_name('x__0_1')
+    ('x', (0, 1))
+
+    >>> _split_flat_name('sigma_log__')
+    ('sigma_log__', ())
+    """
+    varname, sep, idx_str = flat_name.rpartition('__')
+    idxs = idx_str.split('_')
+    if not sep or not all(idx.isdigit() for idx in idxs):
+        return flat_name, ()
+    return varname, tuple(int(idx) for idx in idxs)
@@ -0,0 +1,437 @@
+"""
+Benchmarks for the sampling hot paths
+
+The suite times `sample` with the NUTS, HamiltonianMC, Metropolis and
+Slice step methods, each trace backend, `find_MAP`, `advi` and
+`sample_ppc` on the small models below, which are also used by the
+tests, and on linear regressions with growing numbers of observations
+and dimensions.
+
+Each benchmark reports the draws per second, the effective samples per
+second, the time spent compiling (creating the step method) and the peak
+resident set size. It runs in a fresh process, so that the peak RSS is
+the benchmark's own.
+
+Usage
+-----
+
+    python -m pymc3.benchmarks --output before.json
+    python -m pymc3.benchmarks --output after.json --compare before.json
+
+`--size large` adds the regressions with up to 1e6 observations and 10k
+dimensions, and `--filter` selects benchmarks by name.
+"""
+from __future__ import division, print_function
+
+import argparse
+import fnmatch
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import traceback
+from collections import namedtuple
+from time import time
+
+import numpy as np
+import theano.tensor as tt
+
+from . import __version__
+from .diagnostics import ConvergenceMonitor
+from .model import Model
+from .distributions import Normal, MvNormal, Beta, Exponential
+from .sampling import sample, sample_ppc
+from .step_methods import NUTS, HamiltonianMC, Metropolis, Slice
+from .tuning import find_MAP
+from .variational import advi
+
+__all__ = ['Benchmark', 'benchmarks', 'run_benchmark', 'run', 'compare']
+
+RSEED = 20090425
+
+Benchmark = namedtuple('Benchmark', 'name, task, model, options')
+
+STEP_METHODS = {'nuts': NUTS, 'hmc': HamiltonianMC,
+                'metropolis': Metropolis, 'slice': Slice}
+
+SMALL_MODELS = ['simple_model', 'multidimensional_model', 'mv_simple',
+                'non_normal', 'exponential_beta']
+
+SIZES = {'small': {'n_obs': [1000, 10000], 'dims': [10, 100]},
+         'large': {'n_obs': [1000, 10000, 100000, 1000000],
+                   'dims': [10, 100, 1000, 10000]}}
+
+
+def regression_model(n_obs, dims, random_seed=RSEED):
+    """Linear regression with `n_obs` observations of `dims` predictors"""
+    rng = np.random.RandomState(random_seed)
+    X = rng.randn(n_obs, dims)
+    y = X.dot(rng.randn(dims)) + rng.randn(n_obs)
+
+    with Model() as model:
+        beta = Normal('beta', 0, sd=10, shape=dims)
+        Normal('y', tt.dot(X, beta), sd=1, observed=y)
+    return model
+
+
+# The small models return the test point, the model and the moments of
+# the posterior (or None), as the tests use them.
+
+def simple_model():
+    mu = -2.1
+    tau = 1.3
+    with Model() as model:
+        Normal('x', mu, tau, shape=2, testval=[.1] * 2)
+
+    return model.test_point, model, (mu, tau ** -1)
+
+
+def multidimensional_model():
+    mu = -2.1
+    tau = 1.3
+    with Model() as model:
+        Normal('x', mu, tau, shape=(3, 2), testval=.1 * np.ones((3, 2)))
+
+    return model.test_point, model, (mu, tau ** -1)
+
+
+def mv_simple():
+    mu = np.array([-.1, .5, 1.1])
+    p = np.array([
+        [2., 0, 0],
+        [.05, .1, 0],
+        [1., -0.05, 5.5]])
+
+    tau = np.dot(p, p.T)
+
+    with Model() as model:
+        MvNormal('x', tt.constant(mu), tt.constant(tau), shape=3,
+                 testval=np.array([.1, 1., .8]))
+
+    C = np.linalg.inv(tau)
+
+    return model.test_point, model, (mu, C)
+
+
+def non_normal(n=2):
+    with Model() as model:
+        Beta('x', 3, 3, shape=n, transform=None)
+
+    return model.test_point, model, (np.tile([.5], n), None)
+
+
+def exponential_beta(n=2):
+    with Model() as model:
+        Beta('x', 3, 1, shape=n, transform=None)
+        Exponential('y', 1, shape=n, transform=None)
+
+    return model.test_point, model, None
+
+
+def _make_model(spec):
+    name, args = spec
+    if name == 'regression':
+        return regression_model(*args)
+    return globals()[name](*args)[1]
+
+
+def _model_name(spec):
+    name, args = spec
+    return '{}({})'.format(name, ', '.join(str(a) for a in args))
+
+
+def benchmarks(size='small'):
+    """
+    Return the list of benchmarks
+
+    Parameters
+    ----------
+    size : str
+        'small' or 'large'. The largest regressions of 'large' need
+        several GB of memory.
+    """
+    sizes = SIZES[size]
+    regressions = [('regression', (n_obs, 10)) for n_obs in sizes['n_obs']]
+    regressions += [('regression', (1000, dims)) for dims in sizes['dims']
+                    if dims != 10]
+
+    cases = []
+
+    def add(task, model, **options):
+        name = '{}[{}]'.format(task, _model_name(model))
+        if options:
+            name += '[{}]'.format(','.join(
+                '{}={}'.format(k, v) for k, v in sorted(options.items())))
+        cases.append(Benchmark(name, task, model, options))
+
+    for step in sorted(STEP_METHODS):
+        for name in SMALL_MODELS:
+            add('sample', (name, ()), step=step)
+        for model in regressions:
+            add('sample', model, step=step)
+    for backend in ['ndarray', 'shared', 'text', 'sqlite', 'npy',
+                    'memmap']:
+        add('sample', ('simple_model', ()), step='metropolis',
+            backend=backend)
+        add('sample', regressions[-1], step='metropolis', backend=backend)
+    for model in regressions:
+        add('find_MAP', model)
+        add('advi', model)
+        add('sample_ppc', model)
+    return cases
+
+
+def peak_rss():
+    """Return the peak resident set size of the process in bytes, or None
+    if it is not available on this platform."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, OS X bytes.
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+def effective_n(trace, varnames):
+    """
+    Return the smallest effective sample size of the elements of
+    `varnames` in the single chain `trace`
+
+    The chain is split in halves, which are treated as separate chains.
+    """
+    monitor = ConvergenceMonitor()
+    n_eff = np.inf
+    for varname in varnames:
+        values = trace.get_values(varname)
+        half = len(values) // 2
+        if half < 2:
+            return np.nan
+        monitor.update(varname, [values[:half], values[half:2 * half]])
+        n_eff = min(n_eff, np.min(monitor.effective_n(varname)))
+    return float(n_eff)
+
+
+def _trace_backend(backend, directory):
+    if backend == 'ndarray':
+        return None
+    if backend == 'shared':
+        return 'shared'
+    if backend == 'npy':
+        from .backends import NPY
+        return NPY(os.path.join(directory, 'mcmc'))
+    if backend == 'memmap':
+        from .backends import MemmapNDArray
+        return MemmapNDArray(os.path.join(directory, 'mcmc'))
+    if backend == 'text':
+        from .backends import Text
+        return Text(os.path.join(directory, 'mcmc'))
+    from .backends import SQLite
+    return SQLite(os.path.join(directory, 'mcmc.sqlite'))
+
+
+def _bench_sample(model, draws, step='nuts', backend='ndarray'):
+    directory = tempfile.mkdtemp()
+    try:
+        with model:
+            start = time()
+            step_method = STEP_METHODS[step]()
+            compile_time = time() - start
+            trace = _trace_backend(backend, directory)
+
+            start = time()
+            trace = sample(draws, step=step_method, trace=trace,
+                           progressbar=False, random_seed=RSEED)
+            seconds = time() - start
+        # File backends read their values from the directory.
+        n_eff = effective_n(trace, [str(var) for var in model.vars])
+    finally:
+        shutil.rmtree(directory)
+    return {'compile_time': compile_time, 'seconds': seconds,
+            'draws': draws, 'draws_per_sec': draws / seconds,
+            'ess': n_eff, 'ess_per_sec': n_eff / seconds}
+
+
+def _bench_find_MAP(model, draws):
+    start = time()
+    find_MAP(model=model)
+    seconds = time() - start
+    return {'seconds': seconds}
+
+
+def _bench_advi(model, draws):
+    start = time()
+    advi(model=model, n=draws, verbose=0)
+    seconds = time() - start
+    return {'seconds': seconds, 'draws': draws,
+            'draws_per_sec': draws / seconds}
+
+
+def _bench_sample_ppc(model, draws):
+    with model:
+        trace = sample(draws, step=Metropolis(), progressbar=False,
+                       random_seed=RSEED)
+        start = time()
+        sample_ppc(trace, samples=draws)
+        seconds = time() - start
+    return {'seconds': seconds, 'draws': draws,
+            'draws_per_sec': draws / seconds}
+
+
+_TASKS = {'sample': _bench_sample, 'find_MAP': _bench_find_MAP,
+          'advi': _bench_advi, 'sample_ppc': _bench_sample_ppc}
+
+
+def run_benchmark(benchmark, draws=1000):
+    """
+    Run `benchmark` in the current process and return its results
+
+    Parameters
+    ----------
+    benchmark : Benchmark
+    draws : int
+        Number of draws of `sample` and `sample_ppc`, and iterations of
+        `advi`
+
+    Returns
+    -------
+    dict with keys 'name', 'seconds', 'peak_rss' and, depending on the
+    task, 'compile_time', 'draws', 'draws_per_sec', 'ess' and
+    'ess_per_sec'. If the benchmark fails, the traceback is stored under
+    'error'.
+    """
+    result = {'name': benchmark.name, 'task': benchmark.task}
+    try:
+        start = time()
+        model = _make_model(benchmark.model)
+        result['model_time'] = time() - start
+        result.update(_TASKS[benchmark.task](model, draws,
+                                             **benchmark.options))
+    except Exception:
+        result['error'] = traceback.format_exc()
+    result['peak_rss'] = peak_rss()
+    return result
+
+
+def _run_in_process(benchmark, draws):
+    pool = multiprocessing.Pool(1)
+    try:
+        return pool.apply(run_benchmark, (benchmark, draws))
+    finally:
+        pool.terminate()
+
+
+def run(cases=None, draws=1000, isolate=True, verbose=True):
+    """
+    Run benchmarks
+
+    Parameters
+    ----------
+    cases : list of Benchmark
+        Defaults to `benchmarks()`
+    draws : int
+    isolate : bool
+        Run each benchmark in a fresh process (defaults to True)
+    verbose : bool
+        Print the results as they come in
+
+    Returns
+    -------
+    dict with information about the environment under 'info', and the
+    list of results of `run_benchmark` under 'results'
+    """
+    if cases is None:
+        cases = benchmarks()
+    results = []
+    for benchmark in cases:
+        if isolate:
+            result = _run_in_process(benchmark, draws)
+        else:
+            result = run_benchmark(benchmark, draws)
+        if verbose:
+            print(_format_result(result))
+        results.append(result)
+    info = {'pymc3': __version__, 'python': platform.python_version(),
+            'numpy': np.__version__, 'platform': platform.platform(),
+            'draws': draws, 'time': time()}
+    return {'info': info, 'results': results}
+
+
+def _format_result(result):
+    if 'error' in result:
+        return '{:<60} failed: {}'.format(
+            result['name'], result['error'].strip().splitlines()[-1])
+    line = '{:<60} {:9.3f} s'.format(result['name'], result['seconds'])
+    if 'draws_per_sec' in result:
+        line += ' {:10.1f} draws/s'.format(result['draws_per_sec'])
+    if 'ess_per_sec' in result:
+        line += ' {:10.1f} ESS/s'.format(result['ess_per_sec'])
+    if 'compile_time' in result:
+        line += ' {:7.2f} s compile'.format(result['compile_time'])
+    if result.get('peak_rss') is not None:
+        line += ' {:8.1f} MB'.format(result['peak_rss'] / 2 ** 20)
+    return line
+
+
+def compare(old, new, key='seconds'):
+    """
+    Return the ratios of `key` between the results of two runs
+
+    Parameters
+    ----------
+    old, new : dict
+        Return values of `run`, e.g. loaded from their JSON files
+    key : str
+        The result to compare
+
+    Returns
+    -------
+    dict of benchmark name -> new / old, for the benchmarks in both runs
+    """
+    old = {r['name']: r for r in old['results'] if key in r}
+    ratios = {}
+    for result in new['results']:
+        if key in result and result['name'] in old:
+            ratios[result['name']] = result[key] / old[result['name']][key]
+    return ratios
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m pymc3.benchmarks',
+        description='Time the sampling hot paths of PyMC3.')
+    parser.add_argument('--size', choices=sorted(SIZES), default='small',
+                        help='Size of the scaled-up models')
+    parser.add_argument('--draws', type=int, default=1000)
+    parser.add_argument('--filter', default='*',
+                        help='Run the benchmarks whose names match this '
+                             'shell-style pattern')
+    parser.add_argument('--output', help='Save the results to this JSON file')
+    parser.add_argument('--compare',
+                        help='Compare the times to the results in this '
+                             'JSON file')
+    parser.add_argument('--no-isolate', dest='isolate',
+                        action='store_false',
+                        help='Run all benchmarks in this process')
+    args = parser.parse_args(argv)
+
+    cases = [b for b in benchmarks(args.size)
+             if fnmatch.fnmatchcase(b.name, args.filter)]
+    results = run(cases, draws=args.draws, isolate=args.isolate)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as f:
+            old = json.load(f)
+        print()
+        for name, ratio in sorted(compare(old, results).items()):
+            print('{:<60} {:6.2f}x time'.format(name, ratio))
+
+
+if __name__ == '__main__':
+    main()
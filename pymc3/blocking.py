@@ -6,7 +6,8 @@ Classes for working with subsets of parameters.
 import numpy as np
 import collections
 
-__all__ = ['ArrayOrdering', 'DictToArrayBijection', 'DictToVarBijection']
+__all__ = ['ArrayOrdering', 'DictToArrayBijection', 'DictToVarBijection',
+           'FlatPoint']
 
 VarMap = collections.namedtuple('VarMap', 'var, slc, shp, dtyp')
 
@@ -83,6 +84,59 @@ class DictToArrayBijection(object):
         return Compose(f, self.rmap)
 
 
+class FlatPoint(object):
+    """
+    A dict point whose variables are backed by one flat array
+
+    The values of `point` for the variables of `ordering` are views into
+    `array`, so changing `array` changes the point without allocating new
+    arrays. Variables whose dtype differs from the dtype of `array` are
+    kept in buffers of their own dtype, which `sync` updates.
+
+    Parameters
+    ----------
+    ordering : ArrayOrdering
+    dpoint : dict
+        Initial values. Values of other variables are kept as they are.
+    """
+
+    def __init__(self, ordering, dpoint):
+        self.ordering = ordering
+        self.array = DictToArrayBijection(ordering, dpoint).map(dpoint)
+        self.point = dict(dpoint)
+        self._buffers = {}  # var -> view of array for buffered variables
+
+        for var, slc, shp, dtyp in ordering.vmap:
+            view = self.array[slc].reshape(shp)
+            if np.dtype(dtyp) == self.array.dtype:
+                self.point[var] = view
+            else:
+                self.point[var] = np.empty(shp, dtyp)
+                self._buffers[var] = view
+        self.sync()
+
+    def sync(self, varnames=None):
+        """
+        Update the buffers of `varnames` (defaults to all variables) from
+        `array`
+        """
+        if varnames is None:
+            varnames = self._buffers.keys()
+        for var in varnames:
+            if var in self._buffers:
+                np.copyto(self.point[var], self._buffers[var],
+                          casting='unsafe')
+
+    def update(self, dpoint, varnames):
+        """
+        Copy the values of `varnames` from dict `dpoint` into the point
+        """
+        for var in varnames:
+            if var in self._buffers:
+                self._buffers[var][...] = dpoint[var]
+            self.point[var][...] = dpoint[var]
+
+
 class DictToVarBijection(object):
     """
     A mapping between a dict space and the array space for one element within the dict space
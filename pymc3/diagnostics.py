@@ -3,7 +3,7 @@
 import numpy as np
 from .stats import statfunc
 
-__all__ = ['geweke', 'gelman_rubin', 'effective_n']
+__all__ = ['geweke', 'gelman_rubin', 'effective_n', 'ConvergenceMonitor']
 
 
 @statfunc
@@ -273,3 +273,123 @@ def effective_n(mtrace):
             n_eff[var] = [calc_n_eff(y.transpose()) for y in x.transpose()]
 
     return n_eff
+
+
+class ConvergenceMonitor(object):
+    """Track the Gelman-Rubin statistic and the effective sample size of
+    chains while they are being sampled.
+
+    Only the draws added since the previous call of `update` are
+    processed: they are appended to a buffer of the draws, and the chain
+    means and variances needed for :math:`\hat{R}` are updated from them.
+    The autocorrelations needed for :math:`\hat{n}_{eff}` are not
+    incremental; each call of `effective_n` computes them for all draws
+    with FFTs, so callers should space out those calls. Both estimates
+    match `gelman_rubin` and `effective_n`, but are computed for all
+    elements of a variable at once.
+
+    Example
+    -------
+
+    monitor = ConvergenceMonitor()
+    monitor.update('x', [values_chain0, values_chain1])
+    monitor.rhat('x'), monitor.effective_n('x')
+    """
+
+    def __init__(self):
+        # varname -> (number of draws, chain means, chain sums of squared
+        # deviations), each of shape (chains, elements)
+        self._moments = {}
+        # varname -> draws of shape (chains, capacity, elements), of which
+        # the first `number of draws` are filled
+        self._values = {}
+
+    def update(self, varname, values):
+        """Add the draws of `varname`.
+
+        Parameters
+        ----------
+        varname : str
+        values : list of arrays
+            All draws of each chain so far. The chains must have the
+            same number of draws, and earlier draws must not change
+            between calls.
+        """
+        if len(values) < 2 or len(set(len(v) for v in values)) != 1:
+            raise ValueError('Convergence monitoring requires multiple '
+                             'chains of the same length.')
+        n, mean, m2 = self._moments.get(varname, (0, None, None))
+        total = len(values[0])
+        if total <= n:
+            return
+        new = np.array([np.reshape(v[n:], (total - n, -1)) for v in values],
+                       dtype=float)
+        m, n_new, k = new.shape
+        if n == 0:
+            mean = np.zeros((m, k))
+            m2 = np.zeros((m, k))
+
+        x = self._values.get(varname)
+        if x is None or x.shape[1] < total:
+            # Grow the buffer geometrically so that draws are copied
+            # O(1) times on average.
+            grown = np.empty((m, 2 * total, k))
+            if n:
+                grown[:, :n] = x[:, :n]
+            x = self._values[varname] = grown
+        x[:, n:total] = new
+
+        # Combine the moments of the old and new draws (Chan et al.)
+        new_mean = new.mean(axis=1)
+        new_m2 = ((new - new_mean[:, None]) ** 2).sum(axis=1)
+        delta = new_mean - mean
+        mean = mean + delta * n_new / total
+        m2 = m2 + new_m2 + delta ** 2 * n * n_new / total
+
+        self._moments[varname] = total, mean, m2
+
+    def _vhat(self, varname):
+        n, mean, m2 = self._moments[varname]
+        # Between-chain and within-chain variance
+        B = n * np.var(mean, axis=0, ddof=1)
+        W = np.mean(m2 / (n - 1), axis=0)
+        return W * (n - 1) / n + B / n, W
+
+    def rhat(self, varname):
+        """Return :math:`\hat{R}` for each element of `varname`."""
+        Vhat, W = self._vhat(varname)
+        return np.sqrt(Vhat / W)
+
+    def effective_n(self, varname):
+        """Return :math:`\hat{n}_{eff}` for each element of `varname`."""
+        n = self._moments[varname][0]
+        x = self._values[varname][:, :n]
+        m = x.shape[0]
+        Vhat, _ = self._vhat(varname)
+
+        rho = 1. - _variogram(x) / (2. * Vhat)
+        # Sum the autocorrelations up to the first odd lag T for which
+        # rho[T] + rho[T + 1] is negative.
+        pairs = rho[1:-1:2] + rho[2::2]
+        negative = pairs < 0
+        stop = np.where(negative.any(axis=0),
+                        2 * np.argmax(negative, axis=0) + 3, n)
+        lags = np.arange(n)[:, None]
+        rho_sum = np.where((lags >= 1) & (lags < stop), rho, 0).sum(axis=0)
+        return m * n / (1. + 2 * rho_sum)
+
+
+def _variogram(x):
+    """Variogram of (chains, draws, elements) array `x` for all lags."""
+    m, n, _ = x.shape
+    x = x - x.mean(axis=1, keepdims=True)
+    nfft = 2 ** int(np.ceil(np.log2(2 * n)))
+    f = np.fft.rfft(x, n=nfft, axis=1)
+    # Lagged cross products sum(x[i] * x[i - t] for i in range(t, n))
+    acov = np.fft.irfft(f * np.conjugate(f), n=nfft, axis=1)[:, :n]
+    sq = np.cumsum(x ** 2, axis=1)
+    head = sq[:, ::-1]  # sum(x[i] ** 2 for i in range(n - t))
+    tail = sq[:, -1:] - np.concatenate(
+        [np.zeros_like(sq[:, :1]), sq[:, :-1]], axis=1)  # i in range(t, n)
+    total = (head + tail - 2 * acov).sum(axis=0)
+    return total / (m * (n - np.arange(n)))[:, None]
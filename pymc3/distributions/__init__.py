@@ -42,6 +42,7 @@ from .distribution import Discrete
 from .distribution import NoDistribution
 from .distribution import TensorType
 from .distribution import draw_values
+from .distribution import BatchPoint
 
 from .multivariate import MvNormal
 from .multivariate import MvStudentT
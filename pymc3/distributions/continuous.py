@@ -100,6 +100,8 @@ class Uniform(Continuous):
         Upper limit.
     """
 
+    batch_random = True
+
     def __init__(self, lower=0, upper=1, transform='interval',
                  *args, **kwargs):
         super(Uniform, self).__init__(*args, **kwargs)
@@ -178,6 +180,8 @@ class Normal(Continuous):
         Standard deviation (sd > 0).
     """
 
+    batch_random = True
+
     def __init__(self, mu=0.0, tau=None, sd=None, *args, **kwargs):
         super(Normal, self).__init__(*args, **kwargs)
         self.mean = self.median = self.mode = self.mu = mu
@@ -223,6 +227,8 @@ class HalfNormal(PositiveContinuous):
         Standard deviation (sd > 0).
     """
 
+    batch_random = True
+
     def __init__(self, tau=None, sd=None, *args, **kwargs):
         super(HalfNormal, self).__init__(*args, **kwargs)
         self.tau, self.sd = get_tau_sd(tau=tau, sd=sd)
@@ -299,6 +305,8 @@ class Wald(PositiveContinuous):
         The American Statistician, Vol. 30, No. 2, pp. 88-90
     """
 
+    batch_random = True
+
     def __init__(self, mu=None, lam=None, phi=None, alpha=0., *args, **kwargs):
         super(Wald, self).__init__(*args, **kwargs)
         self.mu, self.lam, self.phi = self.get_mu_lam_phi(mu, lam, phi)
@@ -399,6 +407,8 @@ class Beta(UnitContinuous):
     the binomial distribution.
     """
 
+    batch_random = True
+
     def __init__(self, alpha=None, beta=None, mu=None, sd=None,
                  *args, **kwargs):
         super(Beta, self).__init__(*args, **kwargs)
@@ -460,6 +470,8 @@ class Exponential(PositiveContinuous):
         Rate or inverse scale (lam > 0)
     """
 
+    batch_random = True
+
     def __init__(self, lam, *args, **kwargs):
         super(Exponential, self).__init__(*args, **kwargs)
         self.lam = lam
@@ -503,6 +515,8 @@ class Laplace(Continuous):
         Scale parameter (b > 0).
     """
 
+    batch_random = True
+
     def __init__(self, mu, b, *args, **kwargs):
         super(Laplace, self).__init__(*args, **kwargs)
         self.b = b
@@ -552,6 +566,8 @@ class Lognormal(PositiveContinuous):
         Scale parameter (tau > 0).
     """
 
+    batch_random = True
+
     def __init__(self, mu=0, tau=1, *args, **kwargs):
         super(Lognormal, self).__init__(*args, **kwargs)
 
@@ -610,6 +626,8 @@ class StudentT(Continuous):
         Scale parameter (lam > 0).
     """
 
+    batch_random = True
+
     def __init__(self, nu, mu=0, lam=None, sd=None, *args, **kwargs):
         super(StudentT, self).__init__(*args, **kwargs)
         self.nu = nu = tt.as_tensor_variable(nu)
@@ -666,6 +684,8 @@ class Pareto(PositiveContinuous):
         Scale parameter (m > 0).
     """
 
+    batch_random = True
+
     def __init__(self, alpha, m, *args, **kwargs):
         super(Pareto, self).__init__(*args, **kwargs)
         self.alpha = alpha
@@ -723,6 +743,8 @@ class Cauchy(Continuous):
         Scale parameter > 0
     """
 
+    batch_random = True
+
     def __init__(self, alpha, beta, *args, **kwargs):
         super(Cauchy, self).__init__(*args, **kwargs)
         self.median = self.mode = self.alpha = alpha
@@ -768,6 +790,8 @@ class HalfCauchy(PositiveContinuous):
         Scale parameter (beta > 0).
     """
 
+    batch_random = True
+
     def __init__(self, beta, *args, **kwargs):
         super(HalfCauchy, self).__init__(*args, **kwargs)
         self.mode = 0
@@ -830,6 +854,8 @@ class Gamma(PositiveContinuous):
         Alternative scale parameter (sd > 0).
     """
 
+    batch_random = True
+
     def __init__(self, alpha=None, beta=None, mu=None, sd=None,
                  *args, **kwargs):
         super(Gamma, self).__init__(*args, **kwargs)
@@ -897,6 +923,8 @@ class InverseGamma(PositiveContinuous):
         Scale parameter (beta > 0).
     """
 
+    batch_random = True
+
     def __init__(self, alpha, beta=1, *args, **kwargs):
         super(InverseGamma, self).__init__(*args, **kwargs)
         self.alpha = alpha
@@ -972,6 +1000,8 @@ class Weibull(PositiveContinuous):
         Scale parameter (beta > 0).
     """
 
+    batch_random = True
+
     def __init__(self, alpha, beta, *args, **kwargs):
         super(Weibull, self).__init__(*args, **kwargs)
         self.alpha = alpha
@@ -1154,6 +1184,8 @@ class ExGaussian(Continuous):
         Vol. 4, No. 1, pp 35-45.
     """
 
+    batch_random = True
+
     def __init__(self, mu, sigma, nu, *args, **kwargs):
         super(ExGaussian, self).__init__(*args, **kwargs)
         self.mu = mu
@@ -1210,6 +1242,8 @@ class VonMises(Continuous):
         Concentration (\frac{1}{kappa} is analogous to \sigma^2).
     """
 
+    batch_random = True
+
     def __init__(self, mu=0.0, kappa=None, transform='circular',
                  *args, **kwargs):
         super(VonMises, self).__init__(*args, **kwargs)
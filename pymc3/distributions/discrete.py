@@ -38,6 +38,8 @@ class Binomial(Discrete):
         Probability of success in each trial (0 < p < 1).
     """
 
+    batch_random = True
+
     def __init__(self, n, p, *args, **kwargs):
         super(Binomial, self).__init__(*args, **kwargs)
         self.n = n
@@ -145,6 +147,8 @@ class Bernoulli(Discrete):
         Probability of success (0 < p < 1).
     """
 
+    batch_random = True
+
     def __init__(self, p, *args, **kwargs):
         super(Bernoulli, self).__init__(*args, **kwargs)
         self.p = p
@@ -191,6 +195,8 @@ class Poisson(Discrete):
     binomial distribution.
     """
 
+    batch_random = True
+
     def __init__(self, mu, *args, **kwargs):
         super(Poisson, self).__init__(*args, **kwargs)
         self.mu = mu
@@ -238,6 +244,8 @@ class NegativeBinomial(Discrete):
         Gamma distribution parameter (alpha > 0).
     """
 
+    batch_random = True
+
     def __init__(self, mu, alpha, *args, **kwargs):
         super(NegativeBinomial, self).__init__(*args, **kwargs)
         self.mu = mu
@@ -287,6 +295,8 @@ class Geometric(Discrete):
         Probability of success on an individual trial (0 < p <= 1).
     """
 
+    batch_random = True
+
     def __init__(self, p, *args, **kwargs):
         super(Geometric, self).__init__(*args, **kwargs)
         self.p = p
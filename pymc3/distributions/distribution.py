@@ -1,4 +1,5 @@
 import numpy as np
+import theano
 import theano.tensor as tt
 from theano import function
 
@@ -8,11 +9,16 @@ from ..vartypes import string_types
 
 
 __all__ = ['DensityDist', 'Distribution', 'Continuous',
-           'Discrete', 'NoDistribution', 'TensorType', 'draw_values']
+           'Discrete', 'NoDistribution', 'TensorType', 'draw_values',
+           'BatchPoint']
 
 
 class Distribution(object):
     """Statistical distribution"""
+    # Whether `random` can draw for a whole batch of parameter values
+    # (see `BatchPoint`), i.e. its generator broadcasts over parameters.
+    batch_random = False
+
     def __new__(cls, name, *args, **kwargs):
         try:
             model = Model.get_context()
@@ -149,6 +155,9 @@ def draw_values(params, point=None):
             b) are *RVs with a random method
 
     """
+    if isinstance(point, BatchPoint):
+        return _draw_values_batch(params, point)
+
     # Distribution parameters may be nodes which have named node-inputs
     # specified in the point. Need to find the node-inputs to replace them.
     givens = {}
@@ -233,6 +242,134 @@ def draw_value(param, point=None, givens=()):
     return value
 
 
+class BatchPoint(dict):
+    """Point holding the values of several draws (e.g., rows of a
+    trace), stacked along the first axis.
+
+    Passing a BatchPoint to the `random` method of a distribution with
+    `batch_random` set returns one sample for each of the draws, with the
+    draws along the first axis, using a single call of the generator.
+
+    Parameters
+    ----------
+    values : dict
+        Variable names mapped to arrays of shape (size, ...)
+    size : int
+        Number of draws
+    """
+
+    def __init__(self, values, size):
+        super(BatchPoint, self).__init__(values)
+        self.size = size
+
+
+class _BatchArray(np.ndarray):
+    """Parameter values of a batch, along the first axis."""
+    pass
+
+
+def _draw_values_batch(params, point):
+    values = [None for _ in params]
+    tensors = []
+    for i, param in enumerate(params):
+        if not hasattr(param, 'name'):
+            value = np.asarray(param)
+        elif param.name is not None and param.name in point:
+            values[i] = np.asarray(point[param.name]).view(_BatchArray)
+            continue
+        elif isinstance(param, (tt.sharedvar.TensorSharedVariable,
+                                tt.TensorConstant)):
+            value = np.asarray(draw_value(param))
+        else:
+            tensors.append(i)
+            continue
+        # Fixed values are repeated for the batch without copying.
+        values[i] = np.broadcast_to(
+            value, (point.size, ) + value.shape).view(_BatchArray)
+
+    if tensors:
+        outputs = [params[i] for i in tensors]
+        inputs = set()
+        for output in outputs:
+            for name, node in get_named_nodes(output).items():
+                if isinstance(node, (tt.sharedvar.TensorSharedVariable,
+                                     tt.TensorConstant)):
+                    continue
+                if name not in point:
+                    raise ValueError('No values of {} for drawing a batch '
+                                     'of {}.'.format(name, output))
+                inputs.add(node)
+        inputs = sorted(inputs, key=lambda node: node.name)
+        f = _compile_batch_function(tuple(outputs), tuple(inputs))
+        results = f(*[np.asarray(point[node.name], dtype=node.dtype)
+                      for node in inputs])
+        for i, result in zip(tensors, results):
+            values[i] = result.view(_BatchArray)
+
+    if len(values) == 1:
+        return values[0]
+    else:
+        return values
+
+
+@memoize
+def _compile_batch_function(params, vars):
+    """Compile a theano function that evaluates `params` for each row of
+    stacked values of `vars`, with the rows along the first axis."""
+    batch_vars = []
+    for var in vars:
+        batch_var = tt.TensorType(var.dtype, (False, ) + var.broadcastable)()
+        if hasattr(var.tag, 'test_value'):
+            batch_var.tag.test_value = np.asarray(var.tag.test_value)[None]
+        batch_vars.append(batch_var)
+
+    def evaluate(*rows):
+        replace = dict(zip(vars, rows))
+        return [tt.as_tensor_variable(theano.clone(param, replace=replace))
+                for param in params]
+
+    if batch_vars:
+        outputs, _ = theano.map(evaluate, sequences=batch_vars)
+        if not isinstance(outputs, list):
+            outputs = [outputs]
+    else:
+        outputs = evaluate()
+    return function(batch_vars, outputs, on_unused_input='ignore',
+                    allow_input_downcast=True)
+
+
+def _generate_batch(generator, args, kwargs, dist_shape, size, n):
+    """Draw samples for a batch of `n` parameter values with one call of
+    `generator`. Batched parameters are aligned with the first axis of
+    the samples, which have shape (n, ) + size + the shape of a sample."""
+    try:
+        repeat_shape = tuple(size or ())
+    except TypeError:  # If size is an int
+        repeat_shape = (size, )
+    # As in `generate_samples`, a single sample has the shape of the
+    # parameters broadcast against the shape of the distribution.
+    shapes = [tuple(int(d) for d in dist_shape)]
+    for p in args + tuple(kwargs.values()):
+        if isinstance(p, _BatchArray):
+            shapes.append(p.shape[1:])
+        elif not isinstance(p, tuple):
+            shapes.append(np.shape(p))
+    shape = np.broadcast(*[np.broadcast_to(0, s) for s in shapes]).shape
+    sample_shape = (repeat_shape + shape) or (1, )
+
+    def align(p):
+        if not isinstance(p, _BatchArray):
+            return p
+        p = np.asarray(p)
+        pad = len(sample_shape) - (p.ndim - 1)
+        return p.reshape((n, ) + (1, ) * pad + p.shape[1:])
+
+    args = [align(p) for p in args]
+    kwargs = {key: align(p) for key, p in kwargs.items()}
+    samples = generator(size=(n, ) + sample_shape, *args, **kwargs)
+    return np.asarray(samples)
+
+
 def broadcast_shapes(*args):
     """Return the shape resulting from broadcasting multiple shapes.
     Represents numpy's broadcasting rules.
@@ -303,6 +440,11 @@ def generate_samples(generator, *args, **kwargs):
     broadcast_shape = kwargs.pop('broadcast_shape', None)
     params = args + tuple(kwargs.values())
 
+    batches = [len(p) for p in params if isinstance(p, _BatchArray)]
+    if batches:
+        return _generate_batch(generator, args, kwargs, dist_shape, size,
+                               batches[0])
+
     if broadcast_shape is None:
         broadcast_shape = broadcast_shapes(*[np.atleast_1d(p).shape for p in params
                                              if not isinstance(p, tuple)])
@@ -16,7 +16,7 @@ try:
 except (NameError, ImportError):
     pass
 
-__all__ = ['progress_bar']
+__all__ = ['progress_bar', 'ChainProgress']
 
 
 class ProgressBar(object):
@@ -26,6 +26,7 @@ class ProgressBar(object):
         self.start = time.time()
         self.last = 0
         self.animation_interval = animation_interval
+        self.info = ''
 
     def percentage(self, i):
         return 100 * i / float(self.iterations)
@@ -56,7 +57,7 @@ class TextProgressBar(ProgressBar):
 
     def progbar(self, i, elapsed):
         bar = self.bar(self.percentage(i))
-        return "[%s] %i of %i complete in %.1f sec" % (bar, i, self.iterations, round(elapsed, 1))
+        return "[%s] %i of %i complete in %.1f sec%s" % (bar, i, self.iterations, round(elapsed, 1), self.info)
 
     def bar(self, percent):
         all_full = self.width - 2
@@ -111,6 +112,68 @@ class IPythonNotebookPB(ProgressBar):
                            (self.sec_id, fraction, round(elapsed, 1))))
 
 
+class ChainProgress(object):
+    """Combined progress of several chains that are sampled in parallel.
+
+    Each chain reports its progress as a dictionary with the keys
+
+    - chain: chain number
+    - draw: number of completed draws
+    - draws: total number of draws of the chain
+    - draws_per_sec: sampling speed of the chain
+    - accept_rate: mean acceptance statistic of the step methods (None
+      if no step method reports one)
+    - step_size: mean step size of the step methods (None if no step
+      method has a step size)
+
+    Parameters
+    ----------
+    chains : list of ints
+        Chain numbers
+    draws : int
+        Number of draws of each chain
+    progressbar : bool
+        Whether to render a progress bar for all chains combined
+    callback : function
+        Called with every report of a chain
+    """
+
+    def __init__(self, chains, draws, progressbar=True, callback=None):
+        self.stats = {chain: {'chain': chain, 'draw': 0, 'draws': draws,
+                              'draws_per_sec': 0., 'accept_rate': None,
+                              'step_size': None}
+                      for chain in chains}
+        self.callback = callback
+        self.bar = None
+        if progressbar:
+            self.bar = progress_bar(draws * len(chains))
+
+    def update(self, stats):
+        """Record the report `stats` of a chain."""
+        self.stats[stats['chain']] = stats
+        if self.bar is not None:
+            self.bar.info = self.summary()
+            self.bar.update(sum(s['draw'] for s in self.stats.values()) - 1)
+        if self.callback is not None:
+            self.callback(stats)
+
+    def summary(self):
+        """Short description of the speed and acceptance of all chains."""
+        stats = list(self.stats.values())
+        speeds = [s['draws_per_sec'] for s in stats]
+        info = '; %.1f draws/sec (slowest chain %.1f)' % (sum(speeds),
+                                                          min(speeds))
+        accept = [s['accept_rate'] for s in stats
+                  if s['accept_rate'] is not None]
+        if accept:
+            info += ', accept %.2f' % (sum(accept) / len(accept))
+        step_size = [s['step_size'] for s in stats
+                     if s['step_size'] is not None]
+        if step_size:
+            info += ', step size %.3g' % (sum(step_size) / len(step_size))
+        return info
+
+
 def run_from_ipython():
     try:
         __IPYTHON__
@@ -1,20 +1,36 @@
 from . import backends
 from .backends.base import merge_traces, BaseTrace, MultiTrace
-from .backends.ndarray import NDArray
+from .backends.ndarray import NDArray, stack_chains
+from .backends.shared import SharedNDArray
 from joblib import Parallel, delayed
-from time import time
+from time import time, sleep
 from .model import modelcontext, Point
+from .distributions.distribution import BatchPoint
 from .step_methods import (NUTS, HamiltonianMC, Metropolis, BinaryMetropolis,
                            BinaryGibbsMetropolis, Slice, ElemwiseCategorical, CompoundStep)
-from .progressbar import progress_bar
+from .progressbar import progress_bar, ChainProgress
+from .blocking import DictToArrayBijection, ArrayOrdering, FlatPoint
+from .step_methods.arraystep import ArrayStepShared
+from .vartypes import string_types
+from .diagnostics import ConvergenceMonitor
 from numpy.random import randint, seed
+from theano.compile import SharedVariable
+from theano.gof.graph import inputs
 from numpy import shape, append, asarray
+import numpy as np
 from collections import defaultdict
+from functools import partial
 
+import multiprocessing
+import os
+import pickle
 import sys
+import threading
+import traceback
 sys.setrecursionlimit(10000)
 
-__all__ = ['sample', 'iter_sample', 'sample_ppc']
+__all__ = ['sample', 'iter_sample', 'sample_ppc', 'iter_sample_ppc',
+           'ChainExecutor', 'sample_vectorized']
 
 
 def assign_step_methods(model, step=None,
@@ -83,7 +99,10 @@ def assign_step_methods(model, step=None,
 
 
 def sample(draws, step=None, start=None, trace=None, chain=0, njobs=1, tune=None,
-           progressbar=True, model=None, random_seed=None):
+           progressbar=True, model=None, random_seed=None, progress_callback=None,
+           target_n_eff=None, max_rhat=None, check_interval=100,
+           checkpoint=None, checkpoint_interval=1000, resume=None,
+           burn=None, thin=None):
     """
     Draw a number of samples using the given step method.
     Multiple step methods supported via compound step method
@@ -109,7 +128,12 @@ def sample(draws, step=None, start=None, trace=None, chain=0, njobs=1, tune=None
         If None or a list of variables, the NDArray backend is used.
         Passing either "text" or "sqlite" is taken as a shortcut to set
         up the corresponding backend (with "mcmc" used as the base
-        name).
+        name). Passing "shared" uses the SharedNDArray backend, which
+        lets parallel chains write their values into shared memory
+        instead of sending their traces back to the parent process.
+        Passing "npy" stores the values in chunked .npy files (with
+        "mcmc" used as the directory name), and "memmap" in
+        memory-mapped files.
     chain : int
         Chain number used to store sample in backend. If `njobs` is
         greater than one, chain numbers will start here.
@@ -119,14 +143,56 @@ def sample(draws, step=None, start=None, trace=None, chain=0, njobs=1, tune=None
     tune : int
         Number of iterations to tune, if applicable (defaults to None)
     progressbar : bool
-        Flag for progress bar
+        Flag for progress bar. If `njobs` is greater than one, a single
+        progress bar shows the combined progress of all chains.
     model : Model (optional if in `with` context)
     random_seed : int or list of ints
         A list is accepted if more if `njobs` is greater than one.
+    progress_callback : function
+        Called periodically with a dictionary describing the progress
+        of a chain (see `pymc3.progressbar.ChainProgress`). If `njobs`
+        is greater than one, the callback is called in this process
+        with the reports of all chains.
+    target_n_eff : float
+        If given, stop sampling once the effective sample size of all
+        variables is at least this large. Requires `njobs` greater than
+        one and the default or "shared" trace.
+    max_rhat : float
+        If given, stop sampling once the Gelman-Rubin statistic of all
+        variables is at most this large (e.g., 1.01). Requires `njobs`
+        greater than one and the default or "shared" trace.
+    check_interval : int
+        Minimum number of draws between convergence checks if
+        `target_n_eff` or `max_rhat` is given. Later checks are at least
+        a tenth of the checked draws apart, and the final draws are
+        always checked. Draws before `tune` are not used by the checks.
+    checkpoint : str
+        Directory to which the state of each chain (its draws, the
+        current point, the state of the step methods and the state of
+        `numpy.random`) is saved every `checkpoint_interval` draws and
+        after the last draw. Requires an NDArray-based trace.
+    checkpoint_interval : int
+        Number of draws between checkpoints
+    resume : str
+        Directory of a checkpoint from which to continue sampling. The
+        chains continue exactly as if they had not been interrupted, up
+        to a total of `draws` draws. The step methods have to be set up
+        as in the checkpointed run; `start` and `random_seed` are
+        ignored.
+    burn : int
+        Number of initial draws of each chain that are not recorded.
+        Defaults to the `burn` of the trace backend (0).
+    thin : int
+        Record only every `thin`-th draw after `burn`. Defaults to the
+        `thin` of the trace backend (1). The backends only store
+        (draws - burn) // thin values, and discarded draws are not
+        evaluated for the trace.
 
     Returns
     -------
-    MultiTrace object with access to sampling values
+    MultiTrace object with access to sampling values. If convergence
+    was monitored, all chains are truncated to the same length and
+    `MultiTrace.stop_reason` tells why sampling stopped.
     """
     model = modelcontext(model)
 
@@ -144,9 +210,28 @@ def sample(draws, step=None, start=None, trace=None, chain=0, njobs=1, tune=None
                    'tune': tune,
                    'progressbar': progressbar,
                    'model': model,
-                   'random_seed': random_seed}
-
-    if njobs > 1:
+                   'random_seed': random_seed,
+                   'progress_callback': progress_callback,
+                   'checkpoint': checkpoint,
+                   'checkpoint_interval': checkpoint_interval,
+                   'resume': resume,
+                   'burn': burn,
+                   'thin': thin}
+
+    if target_n_eff is not None or max_rhat is not None:
+        if njobs < 2:
+            raise ValueError('Convergence monitoring requires njobs > 1.')
+        if trace not in (None, 'shared'):
+            raise ValueError('Convergence monitoring is only supported '
+                             'for the "shared" trace.')
+        if burn or (thin is not None and thin != 1):
+            raise ValueError('Convergence monitoring does not support '
+                             '`burn` or `thin`.')
+        sample_func = _mp_sample_shared
+        sample_args['njobs'] = njobs
+        sample_args['convergence'] = _ConvergenceCheck(
+            target_n_eff, max_rhat, check_interval, burn=tune)
+    elif njobs > 1:
         sample_func = _mp_sample
         sample_args['njobs'] = njobs
     else:
@@ -156,14 +241,25 @@ def sample(draws, step=None, start=None, trace=None, chain=0, njobs=1, tune=None
 
 
 def _sample(draws, step=None, start=None, trace=None, chain=0, tune=None,
-            progressbar=True, model=None, random_seed=None):
+            progressbar=True, model=None, random_seed=None,
+            progress_callback=None, stop=None, checkpoint=None,
+            checkpoint_interval=1000, resume=None, burn=None, thin=None):
     sampling = _iter_sample(draws, step, start, trace, chain,
-                            tune, model, random_seed)
+                            tune, model, random_seed, checkpoint,
+                            checkpoint_interval, resume, burn, thin)
     progress = progress_bar(draws)
+    reporter = None
+    if progress_callback is not None:
+        reporter = _ProgressReporter(chain, draws, step, progress_callback)
     try:
         for i, strace in enumerate(sampling):
             if progressbar:
                 progress.update(i)
+            if reporter is not None:
+                reporter.update(i)
+            if stop is not None and stop.is_set():
+                strace.close()
+                break
     except KeyboardInterrupt:
         strace.close()
     return MultiTrace([strace])
@@ -211,14 +307,17 @@ def iter_sample(draws, step, start=None, trace=None, chain=0, tune=None,
     sampling = _iter_sample(draws, step, start, trace, chain, tune,
                             model, random_seed)
     for i, strace in enumerate(sampling):
-        yield MultiTrace([strace[:i + 1]])
+        yield MultiTrace([strace[:strace.kept_draws(i + 1)]])
 
 
 def _iter_sample(draws, step, start=None, trace=None, chain=0, tune=None,
-                 model=None, random_seed=None):
+                 model=None, random_seed=None, checkpoint=None,
+                 checkpoint_interval=1000, resume=None, burn=None,
+                 thin=None):
     model = modelcontext(model)
     draws = int(draws)
-    seed(random_seed)
+    if resume is None:
+        seed(random_seed)
     if draws < 1:
         raise ValueError('Argument `draws` should be above 0.')
 
@@ -226,6 +325,15 @@ def _iter_sample(draws, step, start=None, trace=None, chain=0, tune=None,
         start = {}
 
     strace = _choose_backend(trace, chain, model=model)
+    if (checkpoint is not None or resume is not None) and \
+            not isinstance(strace, NDArray):
+        raise ValueError('Checkpoints require an NDArray-based trace.')
+    if burn is not None:
+        strace.burn = burn
+    if thin is not None:
+        strace.thin = thin
+    if strace.thin < 1:
+        raise ValueError('Argument `thin` should be above 0.')
 
     if len(strace) > 0:
         _soft_update(start, strace.point(-1))
@@ -239,17 +347,254 @@ def _iter_sample(draws, step, start=None, trace=None, chain=0, tune=None,
 
     point = Point(start, model=model)
 
-    strace.setup(draws, chain)
-    for i in range(draws):
+    strace.setup(strace.kept_draws(draws), chain)
+    stats_methods = _setup_stats(strace, step, draws)
+    if tune is not None:
+        _set_tune_length(step, tune)
+    first = 0
+    if resume is not None:
+        point, first = _load_checkpoint(resume, chain, step, strace)
+    stepper = _ArrayStepper.from_step(step, point, model)
+    for i in range(first, draws):
         if i == tune:
             step = stop_tuning(step)
-        point = step.step(point)
-        strace.record(point)
+        if stepper is not None:
+            point = stepper.step()
+        else:
+            point = step.step(point)
+        if strace.keeps(i):
+            strace.record(point)
+            if stats_methods:
+                strace.record_stats([method.stats
+                                     for method in stats_methods])
+        if checkpoint is not None and \
+                ((i + 1) % checkpoint_interval == 0 or i + 1 == draws):
+            _save_checkpoint(checkpoint, chain, i + 1, point, step, strace)
         yield strace
     else:
         strace.close()
 
 
+class _ArrayStepper(object):
+    """Apply step methods to a position that is kept in one flat array.
+
+    `ArrayStepShared` methods are applied directly to slices of the
+    array, and the shared variables they read are set to views of it.
+    Other step methods are applied to the dict point, and their results
+    are copied back. The same dict point, whose values are views of the
+    array, is returned at every step.
+
+    Parameters
+    ----------
+    methods : list of step methods
+    point : dict
+        Starting point
+    model : Model
+    """
+
+    def __init__(self, methods, point, model):
+        # Place the variables of each array step next to each other.
+        vars = [var for method in methods
+                if isinstance(method, ArrayStepShared)
+                for var in method.vars]
+        names = [str(var) for var in vars]
+        if len(set(names)) < len(names):
+            raise ValueError('Variables are sampled by several step methods.')
+        vars += [var for var in model.vars if str(var) not in names]
+        self.flat = FlatPoint(ArrayOrdering(vars), point)
+
+        slices = {var: slc for var, slc, _, _ in self.flat.ordering.vmap}
+        self.methods = []
+        for method in methods:
+            varnames = [str(var) for var in method.vars]
+            if isinstance(method, ArrayStepShared):
+                slc = slice(slices[varnames[0]].start,
+                            slices[varnames[-1]].stop)
+                shared = [(share.container, var)
+                          for var, share in method.shared.items()]
+            else:
+                slc = shared = None
+            self.methods.append((method, slc, shared, varnames))
+
+    @classmethod
+    def from_step(cls, step, point, model):
+        """Return a stepper for `step`, or None if the step methods would
+        not benefit or do not fit."""
+        methods = _flatten_steps(step)
+        if not any(isinstance(method, ArrayStepShared)
+                   for method in methods):
+            return None
+        try:
+            return cls(methods, point, model)
+        except (ValueError, KeyError, AttributeError):
+            return None
+
+    def step(self):
+        q = self.flat.array
+        point = self.flat.point
+        for method, slc, shared, varnames in self.methods:
+            if slc is None:
+                self.flat.update(method.step(point), varnames)
+                continue
+            for container, var in shared:
+                container.storage[0] = point[var]
+            q[slc] = method.astep(q[slc])
+            self.flat.sync(varnames)
+        return point
+
+
+def _checkpoint_filename(name, chain):
+    return os.path.join(name, 'chain-{}.pkl'.format(chain))
+
+
+def _save_checkpoint(name, chain, draws, point, step, strace):
+    """Save the state of a chain after `draws` draws."""
+    try:
+        os.makedirs(name)
+    except OSError:  # Exists or was created by another chain.
+        if not os.path.isdir(name):
+            raise
+    state = {'draws': draws,
+             'point': point,
+             'step': step.get_state(),
+             'random_state': np.random.get_state(),
+             'values': {varname: strace.samples[varname][:strace.draw_idx]
+                        for varname in strace.varnames},
+             'stats': [{statname: values[:strace._stats_idx]
+                        for statname, values in stats.items()}
+                       for stats in strace._stats]}
+    # Write to a temporary file first, so that an interruption does not
+    # leave a truncated checkpoint behind.
+    filename = _checkpoint_filename(name, chain)
+    with open(filename + '.tmp', 'wb') as fh:
+        pickle.dump(state, fh, pickle.HIGHEST_PROTOCOL)
+    getattr(os, 'replace', os.rename)(filename + '.tmp', filename)
+
+
+def _load_checkpoint(name, chain, step, strace):
+    """Restore the state of a chain from a checkpoint into `step`,
+    `numpy.random` and the draws of `strace`, which has to be set up.
+
+    Returns
+    -------
+    The last point and the number of draws of the chain
+    """
+    with open(_checkpoint_filename(name, chain), 'rb') as fh:
+        state = pickle.load(fh)
+    step.set_state(state['step'])
+    np.random.set_state(state['random_state'])
+
+    recorded = 0
+    for varname, values in state['values'].items():
+        recorded = len(values)
+        if recorded > strace.draws:
+            raise ValueError('The checkpoint has more than {} draws.'
+                             .format(strace.draws))
+        strace.samples[varname][:recorded] = values
+    strace.draw_idx = recorded
+    for stats, values in zip(strace._stats, state.get('stats', [])):
+        for statname, value in values.items():
+            stats[statname][:recorded] = value
+        strace._stats_idx = recorded
+    return state['point'], state.get('draws', recorded)
+
+
+def sample_vectorized(draws, step, nchains=4, start=None, chain=0,
+                      tune=None, progressbar=True, model=None,
+                      random_seed=None, target_n_eff=None, max_rhat=None,
+                      check_interval=100):
+    """
+    Draw samples for several chains that are advanced in lockstep in
+    this process.
+
+    The positions of all chains are updated together by a batch step
+    method (`BatchMetropolis` or `BatchSlice`), which evaluates the
+    log-probability of all chains with a single call of one compiled
+    function. That function still evaluates the chains one after another
+    (see `batch_logp`), but for small models this removes most of the
+    per-chain Python overhead of running `sample` once per chain.
+
+    Parameters
+    ----------
+
+    draws : int
+        The number of samples to draw for each chain
+    step : BatchStep
+        A batch step method sampling all free variables of the model.
+    nchains : int
+        Number of chains
+    start : dict or list of dicts
+        Starting point in parameter space (or partial point). A list
+        is accepted to give each chain its own starting point.
+        Defaults to model.test_point.
+    chain : int
+        Chain number of the first chain. The chain numbers of the other
+        chains follow consecutively.
+    tune : int
+        Number of iterations to tune, if applicable (defaults to None)
+    progressbar : bool
+        Flag for progress bar
+    model : Model (optional if in `with` context)
+    random_seed : int
+    target_n_eff, max_rhat, check_interval
+        Convergence targets for stopping early (see `sample`)
+
+    Returns
+    -------
+    MultiTrace object with access to sampling values
+    """
+    model = modelcontext(model)
+    draws = int(draws)
+    seed(random_seed)
+    if draws < 1:
+        raise ValueError('Argument `draws` should be above 0.')
+
+    bij = DictToArrayBijection(step.ordering, model.test_point)
+    q = []
+    for start_vals in _make_parallel(start, nchains):
+        point = {} if start_vals is None else dict(start_vals)
+        _soft_update(point, model.test_point)
+        q.append(bij.map(Point(point, model=model)))
+    q = asarray(q)
+
+    straces = []
+    for i in range(nchains):
+        strace = NDArray(model=model)
+        strace.setup(draws, chain + i)
+        straces.append(strace)
+
+    convergence = None
+    if target_n_eff is not None or max_rhat is not None:
+        convergence = _ConvergenceCheck(target_n_eff, max_rhat,
+                                        check_interval, burn=tune)
+
+    progress = progress_bar(draws)
+    try:
+        for i in range(draws):
+            if i == tune:
+                step = stop_tuning(step)
+            q = step.step(q)
+            for strace, q_chain in zip(straces, q):
+                strace.record(bij.rmap(q_chain))
+            if progressbar:
+                progress.update(i)
+            if convergence is not None and convergence.due(i + 1) and \
+                    convergence.check(straces, i + 1):
+                break
+    except KeyboardInterrupt:
+        pass
+    if convergence is not None:
+        convergence.finish(straces,
+                           min(strace.draw_idx for strace in straces))
+    for strace in straces:
+        strace.close()
+    stack_chains(straces)
+    mtrace = MultiTrace(straces)
+    if convergence is not None:
+        convergence.annotate(mtrace)
+    return mtrace
+
+
 def _choose_backend(trace, chain, shortcuts=None, **kwds):
     if isinstance(trace, BaseTrace):
         return trace
@@ -278,6 +623,13 @@ def _make_parallel(arg, njobs):
 
 
 def _mp_sample(**kwargs):
+    try:
+        backend = backends._shortcuts[kwargs['trace']]['backend']
+    except (KeyError, TypeError):
+        backend = None
+    if backend is SharedNDArray:
+        return _mp_sample_shared(**kwargs)
+
     njobs = kwargs.pop('njobs')
     chain = kwargs.pop('chain')
     random_seed = kwargs.pop('random_seed')
@@ -287,13 +639,486 @@ def _mp_sample(**kwargs):
     start_vals = _make_parallel(start, njobs)
 
     chains = list(range(chain, chain + njobs))
-    pbars = [kwargs.pop('progressbar')] + [False] * (njobs - 1)
-    traces = Parallel(n_jobs=njobs)(delayed(_sample)(chain=chains[i],
-                                                     progressbar=pbars[i],
-                                                     random_seed=rseed[i],
-                                                     start=start_vals[i],
-                                                     **kwargs) for i in range(njobs))
-    return merge_traces(traces)
+    with _ProgressChannel(chains, kwargs['draws'],
+                          kwargs.pop('progressbar'),
+                          kwargs.pop('progress_callback')) as channel:
+        traces = Parallel(n_jobs=njobs)(delayed(_sample)(chain=chains[i],
+                                                         progressbar=False,
+                                                         random_seed=rseed[i],
+                                                         start=start_vals[i],
+                                                         progress_callback=channel.report,
+                                                         **kwargs) for i in range(njobs))
+    mtrace = merge_traces(traces)
+    straces = [mtrace._straces[chain] for chain in mtrace.chains]
+    if all(type(strace) is NDArray for strace in straces):
+        stack_chains(straces)
+    return mtrace
+
+
+class ChainExecutor(object):
+    """Pool of persistent worker processes for sampling parallel chains.
+
+    Unlike `sample(njobs>1)`, which sends the model and step methods to
+    fresh worker processes on every call, the workers of a
+    ChainExecutor receive the model and step methods once, when the
+    executor is created. Each call to `sample` then only ships the
+    start points, random seeds and number of draws to the workers, and
+    receives the sampled values back.
+
+    The values of the theano shared variables of the model (e.g. data
+    set with `shared_data.set_value`) are sent with each call to
+    `sample`, so the workers always sample the model the parent sees.
+    Shared variables that are only used by the step methods are not
+    sent.
+
+    Step methods are kept by the workers between calls, so adapted
+    tuning parameters (e.g. the Metropolis `scaling` or the NUTS
+    `step_size`) carry over to the next run. Tuning is re-enabled at
+    the start of every run.
+
+    Parameters
+    ----------
+    njobs : int
+        Number of worker processes (and chains per call to `sample`).
+        If None, set to number of cpus in the system - 2.
+    step : function or iterable of functions
+        A step function or collection of functions. If no step methods
+        are specified, or are partially specified, they will be assigned
+        automatically (defaults to None).
+    vars : list of variables
+        Sampling values will be stored for these variables. If None,
+        `model.unobserved_RVs` is used.
+    model : Model (optional if in `with` context)
+
+    Example
+    -------
+
+    with model:
+        with ChainExecutor(njobs=4) as executor:
+            for data in datasets:
+                shared_data.set_value(data)
+                trace = executor.sample(1000)
+    """
+
+    def __init__(self, njobs=None, step=None, vars=None, model=None):
+        model = modelcontext(model)
+        if njobs is None:
+            njobs = max(multiprocessing.cpu_count() - 2, 1)
+
+        self.model = model
+        self.vars = vars
+        self.njobs = njobs
+        self.step = assign_step_methods(model, step)
+        self._shared = _model_shared(model)
+        # Compile the trace function before the workers are started so
+        # that they do not each have to compile it on their first run.
+        NDArray(model=model, vars=vars)
+
+        self._workers = []
+        self._conns = []
+        for _ in range(njobs):
+            parent_conn, child_conn = multiprocessing.Pipe()
+            worker = multiprocessing.Process(
+                target=_chain_worker,
+                args=(child_conn, self.step, self.model, self.vars,
+                      self._shared))
+            worker.daemon = True
+            worker.start()
+            child_conn.close()
+            self._workers.append(worker)
+            self._conns.append(parent_conn)
+
+    def sample(self, draws, start=None, chain=0, tune=None,
+               progressbar=True, random_seed=None, progress_callback=None):
+        """Draw `draws` samples for each of the `njobs` chains.
+
+        Parameters
+        ----------
+        draws : int
+            The number of samples to draw
+        start : dict or list of dicts
+            Starting point in parameter space (or partial point). A list
+            is accepted to give each chain its own starting point.
+            Defaults to model.test_point.
+        chain : int
+            Chain number of the first worker. The chain numbers of the
+            other workers follow consecutively.
+        tune : int
+            Number of iterations to tune, if applicable (defaults to None)
+        progressbar : bool
+            Flag for a progress bar showing the combined progress of
+            all chains
+        random_seed : int or list of ints
+            A list is accepted to give each chain its own seed.
+        progress_callback : function
+            Called in this process with the progress reports of the
+            chains (see `pymc3.progressbar.ChainProgress`).
+
+        Returns
+        -------
+        MultiTrace object with access to sampling values
+        """
+        if self._conns is None:
+            raise ValueError('ChainExecutor has been closed.')
+
+        rseed = _make_parallel(random_seed, self.njobs)
+        start_vals = _make_parallel(start, self.njobs)
+        chains = list(range(chain, chain + self.njobs))
+        shared_values = [var.get_value(borrow=True) for var in self._shared]
+
+        with _ProgressChannel(chains, draws, progressbar,
+                              progress_callback) as channel:
+            for i, conn in enumerate(self._conns):
+                conn.send({'draws': draws,
+                           'start': start_vals[i],
+                           'chain': chains[i],
+                           'tune': tune,
+                           'progressbar': False,
+                           'random_seed': rseed[i],
+                           'progress_callback': channel.report,
+                           'shared_values': shared_values})
+
+            results = [conn.recv() for conn in self._conns]
+        for result in results:
+            if isinstance(result, _WorkerError):
+                raise RuntimeError('Sampling failed in a worker process:\n' +
+                                   result.tb)
+
+        straces = []
+        for worker_chain, samples, stats in results:
+            strace = NDArray(model=self.model, vars=self.vars)
+            strace.chain = worker_chain
+            strace.samples = samples
+            strace.draws = strace.draw_idx = len(strace)
+            strace._stats = stats
+            strace._stats_idx = len(strace) if stats else 0
+            straces.append(strace)
+        stack_chains(straces)
+        return MultiTrace(straces)
+
+    def close(self):
+        """Shut down the worker processes."""
+        if self._conns is None:
+            return
+        for conn in self._conns:
+            try:
+                conn.send(None)
+            except (IOError, OSError):
+                pass
+            conn.close()
+        for worker in self._workers:
+            worker.join()
+        self._conns = None
+        self._workers = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, typ, value, traceback):
+        self.close()
+
+
+class _WorkerError(object):
+    """Traceback of an exception raised in a worker process."""
+
+    def __init__(self, tb):
+        self.tb = tb
+
+
+def _model_shared(model):
+    """Return the shared variables that the model depends on."""
+    outputs = [model.logpt] + list(model.deterministics)
+    return [var for var in inputs(outputs)
+            if isinstance(var, SharedVariable)]
+
+
+def _chain_worker(conn, step, model, vars, shared):
+    """Sampling loop of a ChainExecutor worker process.
+
+    `shared` are the worker's copies of the shared variables of the
+    model, whose values are set from the task before each run.
+    """
+    methods = getattr(step, 'methods', [step])
+    tune_flags = [getattr(method, 'tune', None) for method in methods]
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            break
+        if task is None:
+            break
+        for var, value in zip(shared, task.pop('shared_values')):
+            var.set_value(value)
+        for method, tune in zip(methods, tune_flags):
+            if tune is not None:
+                method.tune = tune
+        try:
+            strace = NDArray(model=model, vars=vars)
+            _sample(step=step, trace=strace, model=model, **task)
+            conn.send((task['chain'], strace.samples,
+                       [{statname: values[:strace._stats_idx]
+                         for statname, values in stats.items()}
+                        for stats in strace._stats]))
+        except Exception:
+            conn.send(_WorkerError(traceback.format_exc()))
+    conn.close()
+
+
+def _mp_sample_shared(convergence=None, **kwargs):
+    """Sample parallel chains into SharedNDArray traces.
+
+    The traces are set up in this process, so the workers only write
+    into the shared buffers and nothing has to be sent back. This also
+    lets this process monitor the chains for convergence while they are
+    sampled, and stop the workers once `convergence` is satisfied.
+    """
+    njobs = kwargs.pop('njobs')
+    chain = kwargs.pop('chain')
+    random_seed = kwargs.pop('random_seed')
+    start = kwargs.pop('start')
+    draws = kwargs['draws']
+    kwargs.pop('trace')
+
+    rseed = _make_parallel(random_seed, njobs)
+    start_vals = _make_parallel(start, njobs)
+
+    chains = list(range(chain, chain + njobs))
+
+    straces = []
+    workers = []
+    stop = multiprocessing.Event() if convergence is not None else None
+    with _ProgressChannel(chains, draws, kwargs.pop('progressbar'),
+                          kwargs.pop('progress_callback')) as channel:
+        for i in range(njobs):
+            strace = SharedNDArray(model=kwargs['model'],
+                                   burn=kwargs['burn'] or 0,
+                                   thin=kwargs['thin'] or 1)
+            strace.setup(strace.kept_draws(draws), chains[i])
+            _setup_stats(strace, kwargs['step'], draws)
+            straces.append(strace)
+            worker = multiprocessing.Process(target=_sample,
+                                             kwargs=dict(chain=chains[i],
+                                                         progressbar=False,
+                                                         random_seed=rseed[i],
+                                                         start=start_vals[i],
+                                                         trace=strace,
+                                                         progress_callback=channel.report,
+                                                         stop=stop,
+                                                         **kwargs))
+            worker.start()
+            workers.append(worker)
+
+        if convergence is not None:
+            while any(worker.is_alive() for worker in workers):
+                n = min(len(strace) for strace in straces)
+                if convergence.due(n) and convergence.check(straces, n):
+                    stop.set()
+                    break
+                sleep(.05)
+
+        for worker in workers:
+            worker.join()
+    if any(worker.exitcode != 0 for worker in workers):
+        raise RuntimeError('Sampling failed in a worker process.')
+
+    if convergence is not None:
+        # The chains are stopped at slightly different draws.
+        n = min(len(strace) for strace in straces)
+        for strace in straces:
+            strace.draw_idx = n
+            strace._stats_idx = min(strace._stats_idx, n)
+        convergence.finish(straces, n)
+    for strace in straces:
+        strace.close()
+    mtrace = MultiTrace(straces)
+    if convergence is not None:
+        convergence.annotate(mtrace)
+    return mtrace
+
+
+class _ConvergenceCheck(object):
+    """Decide whether chains that are being sampled have converged.
+
+    Parameters
+    ----------
+    target_n_eff : float or None
+        Minimum effective sample size of all variables
+    max_rhat : float or None
+        Maximum Gelman-Rubin statistic of all variables
+    check_interval : int
+        Minimum number of draws between checks. Later checks are at
+        least a tenth of the checked draws apart, since each check
+        computes the autocorrelations of all draws (see
+        `ConvergenceMonitor`).
+    burn : int or None
+        Number of initial draws that are ignored
+    """
+
+    def __init__(self, target_n_eff, max_rhat, check_interval, burn=None):
+        if check_interval < 1:
+            raise ValueError('Argument `check_interval` should be above 0.')
+        self.target_n_eff = target_n_eff
+        self.max_rhat = max_rhat
+        self.check_interval = check_interval
+        self.burn = burn or 0
+        self.monitor = ConvergenceMonitor()
+        self.stats = None
+        self.converged = False
+        self._last = self.burn
+
+    def due(self, n):
+        """Whether a check is due after `n` draws."""
+        return n - self._last >= max(self.check_interval,
+                                     (self._last - self.burn) // 10)
+
+    def finish(self, straces, n):
+        """Check the final `n` draws of `straces` unless they were the
+        last ones checked."""
+        if n > self._last and n > self.burn + 1:
+            self.check(straces, n)
+
+    def check(self, straces, n):
+        """Update the diagnostics with the first `n` draws of `straces`
+        and return whether the targets are reached."""
+        self._last = n
+        rhat = {}
+        n_eff = {}
+        for varname in straces[0].varnames:
+            self.monitor.update(varname,
+                                [strace.get_values(varname, burn=self.burn)
+                                 [:n - self.burn] for strace in straces])
+            rhat[varname] = self.monitor.rhat(varname)
+            n_eff[varname] = self.monitor.effective_n(varname)
+        self.stats = {'draws': n, 'rhat': rhat, 'n_eff': n_eff}
+
+        # Comparisons with NaN (e.g., constant chains) count as failed.
+        converged = True
+        if self.max_rhat is not None:
+            converged &= all(np.all(r <= self.max_rhat)
+                             for r in rhat.values())
+        if self.target_n_eff is not None:
+            converged &= all(np.all(v >= self.target_n_eff)
+                             for v in n_eff.values())
+        self.converged = bool(converged)
+        return self.converged
+
+    def annotate(self, mtrace):
+        mtrace.stop_reason = 'converged' if self.converged else 'draws'
+        mtrace.convergence_stats = self.stats
+
+
+class _ProgressReporter(object):
+    """Periodically reports the progress of a chain to `report`."""
+
+    def __init__(self, chain, draws, step, report, interval=.5):
+        self.chain = chain
+        self.draws = draws
+        self.methods = _flatten_steps(step)
+        self.report = report
+        self.interval = interval
+        self.start = self.last = time()
+        self.accept_sum = 0.
+        self.accept_count = 0
+
+    def update(self, i):
+        accept = [method.accept_stat for method in self.methods
+                  if hasattr(method, 'accept_stat')]
+        if accept:
+            self.accept_sum += sum(accept) / len(accept)
+            self.accept_count += 1
+
+        now = time()
+        if now - self.last < self.interval and i + 1 != self.draws:
+            return
+        self.last = now
+
+        step_size = [method.step_size for method in self.methods
+                     if hasattr(method, 'step_size')]
+        self.report({
+            'chain': self.chain,
+            'draw': i + 1,
+            'draws': self.draws,
+            'draws_per_sec': (i + 1) / max(now - self.start, 1e-9),
+            'accept_rate': (self.accept_sum / self.accept_count
+                            if self.accept_count else None),
+            'step_size': (float(sum(step_size) / len(step_size))
+                          if step_size else None)})
+
+
+class _ProgressChannel(object):
+    """Collects the progress reports of worker processes.
+
+    Workers send their reports with `report`, which can be pickled with
+    the tasks of the workers. A thread in this process passes them on
+    to a ChainProgress instance, which renders the combined progress
+    bar and calls the user callback.
+    """
+
+    def __init__(self, chains, draws, progressbar=True, callback=None):
+        self.report = None
+        self._manager = None
+        self._thread = None
+        if progressbar or callback is not None:
+            self.progress = ChainProgress(chains, draws, progressbar,
+                                          callback)
+            self._manager = multiprocessing.Manager()
+            self._queue = self._manager.Queue()
+            # Bound methods of the queue proxy cannot be pickled on
+            # Python 2, so the proxy itself is sent to the workers.
+            self.report = partial(_put_report, self._queue)
+
+    def _consume(self):
+        while True:
+            stats = self._queue.get()
+            if stats is None:
+                break
+            self.progress.update(stats)
+
+    def __enter__(self):
+        if self._manager is not None:
+            self._thread = threading.Thread(target=self._consume)
+            self._thread.daemon = True
+            self._thread.start()
+        return self
+
+    def __exit__(self, typ, value, traceback):
+        if self._manager is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._manager.shutdown()
+
+
+def _put_report(queue, stats):
+    """Send the progress report `stats` of a worker through `queue`."""
+    queue.put(stats)
+
+
+def _flatten_steps(step):
+    """Return a flat list of the step methods in `step`."""
+    if hasattr(step, 'methods'):
+        step = step.methods
+    if isinstance(step, (list, tuple)):
+        return [method for s in step for method in _flatten_steps(s)]
+    return [step]
+
+
+def _setup_stats(strace, step, draws):
+    """Allocate the statistics of the step methods in `step` that
+    generate them in `strace`, and return these step methods."""
+    stats_methods = [method for method in _flatten_steps(step)
+                     if getattr(method, 'generates_stats', False)]
+    if stats_methods:
+        strace.setup_stats(strace.kept_draws(draws),
+                           [method.stats_dtypes for method in stats_methods])
+    return stats_methods
+
+
+def _set_tune_length(step, tune):
+    """Tell the step methods in `step` that the next `tune` draws are
+    tuned."""
+    for method in _flatten_steps(step):
+        if hasattr(method, 'set_tune_length'):
+            method.set_tune_length(tune)
 
 
 def stop_tuning(step):
@@ -314,9 +1139,15 @@ def _soft_update(a, b):
     a.update({k: v for k, v in b.items() if k not in a})
 
 
-def sample_ppc(trace, samples=None, model=None, vars=None, size=None):
+def sample_ppc(trace, samples=None, model=None, vars=None, size=None,
+               chunk_size=None, out=None):
     """Generate posterior predictive samples from a model given a trace.
 
+    For variables whose distribution supports it (`batch_random`), the
+    selected rows of `trace` are passed to the distribution at once: its
+    parameters are evaluated for all rows by one compiled function and
+    all samples are drawn by one call of the random number generator.
+
     Parameters
     ----------
     trace : backend, list, or MultiTrace
@@ -332,11 +1163,71 @@ def sample_ppc(trace, samples=None, model=None, vars=None, size=None):
     size : int
         The number of random draws from the distribution specified by the
         parameters in each sample of the trace.
+    chunk_size : int
+        Number of samples that are generated at once. Defaults to
+        `samples`, or 100 if `out` is given.
+    out : str or dict
+        Write the samples into arrays instead of keeping them in memory.
+        This can be a dictionary mapping the names of `vars` to arrays
+        with `samples` rows (e.g., `numpy.memmap` instances), or the name
+        of a directory in which a memory-mapped `<name>.npy` file is
+        created for each variable.
 
     Returns
     -------
     Dictionary keyed by `vars`, where the values are the corresponding
-    posterior predictive samples.
+    posterior predictive samples (the arrays of `out` if given).
+    """
+    if samples is None:
+        samples = len(trace)
+    if chunk_size is None:
+        chunk_size = samples if out is None else 100
+
+    chunks = iter_sample_ppc(trace, samples, model, vars, size, chunk_size)
+    if out is None:
+        ppc = defaultdict(list)
+        for chunk in chunks:
+            for varname, values in chunk.items():
+                ppc[varname].append(values)
+        return {k: v[0] if len(v) == 1 else np.concatenate(v)
+                for k, v in ppc.items()}
+
+    if isinstance(out, string_types) and not os.path.exists(out):
+        os.mkdir(out)
+    ppc = {}
+    start = 0
+    for chunk in chunks:
+        for varname, values in chunk.items():
+            if varname not in ppc:
+                ppc[varname] = _ppc_output(out, varname, samples, values)
+            ppc[varname][start:start + len(values)] = values
+        start += len(values)
+    for values in ppc.values():
+        if hasattr(values, 'flush'):
+            values.flush()
+    return ppc
+
+
+def iter_sample_ppc(trace, samples=None, model=None, vars=None, size=None,
+                    chunk_size=100):
+    """Generator that returns posterior predictive samples in chunks.
+
+    Only one chunk is held in memory at a time, so the samples can be
+    processed (or stored, see `sample_ppc`) for models with many
+    observations.
+
+    Parameters
+    ----------
+    trace, samples, model, vars, size
+        See `sample_ppc`
+    chunk_size : int
+        Number of samples in each chunk, except possibly the last
+
+    Example
+    -------
+
+    for ppc in iter_sample_ppc(trace, 10000, chunk_size=500):
+        ...
     """
     if samples is None:
         samples = len(trace)
@@ -347,11 +1238,52 @@ def sample_ppc(trace, samples=None, model=None, vars=None, size=None):
     if vars is None:
         vars = model.observed_RVs
 
-    ppc = defaultdict(list)
-    for idx in randint(0, len(trace), samples):
-        param = trace[idx]
-        for var in vars:
-            ppc[var.name].append(var.distribution.random(point=param,
-                                                         size=size))
-
-    return {k: asarray(v) for k, v in ppc.items()}
+    if chunk_size < 1:
+        raise ValueError('Argument `chunk_size` should be above 0.')
+
+    idx = randint(0, len(trace), samples)
+    batch_vars = [var for var in vars if var.distribution.batch_random]
+    loop_vars = [var for var in vars if not var.distribution.batch_random]
+
+    trace_values = _trace_values(trace) if batch_vars else None
+    for i in range(0, samples, chunk_size):
+        chunk_idx = idx[i:i + chunk_size]
+        ppc = {}
+        if batch_vars:
+            point = BatchPoint({k: v[chunk_idx]
+                                for k, v in trace_values.items()},
+                               len(chunk_idx))
+            for var in batch_vars:
+                ppc[var.name] = var.distribution.random(point=point,
+                                                        size=size)
+
+        if loop_vars:
+            values = defaultdict(list)
+            for j in chunk_idx:
+                param = trace[j]
+                for var in loop_vars:
+                    values[var.name].append(
+                        var.distribution.random(point=param, size=size))
+            ppc.update((k, asarray(v)) for k, v in values.items())
+        yield ppc
+
+
+def _ppc_output(out, varname, samples, values):
+    """Return the array to which the samples of `varname` are written."""
+    if not isinstance(out, string_types):
+        return out[varname]
+    filename = os.path.join(out, '{}.npy'.format(varname))
+    return np.lib.format.open_memmap(filename, mode='w+', dtype=values.dtype,
+                                     shape=(samples, ) + values.shape[1:])
+
+
+def _trace_values(trace):
+    """Return the values of all variables in the chain that `trace[i]`
+    selects."""
+    if isinstance(trace, MultiTrace):
+        trace = trace._straces[trace.chains[-1]]
+    if not isinstance(trace, BaseTrace):  # A list of points
+        return {varname: asarray([point[varname] for point in trace])
+                for varname in trace[0]}
+    return {varname: trace.get_values(varname)
+            for varname in trace.varnames}
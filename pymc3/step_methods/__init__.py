@@ -17,6 +17,9 @@ from .slicer import Slice
 
 from .nuts import NUTS
 
+from .batch import BatchMetropolis
+from .batch import BatchSlice
+
 from .ATMCMC import ATMCMC
 from .ATMCMC import ATMIP_sample
 
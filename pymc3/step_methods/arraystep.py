@@ -5,6 +5,7 @@ from ..blocking import ArrayOrdering, DictToArrayBijection
 import numpy as np
 from numpy.random import uniform
 from numpy import log, isfinite
+from copy import deepcopy
 from enum import IntEnum, unique
 
 __all__ = ['ArrayStep', 'ArrayStepShared', 'metrop_select', 'SamplerHist',
@@ -28,6 +29,10 @@ class Competence(IntEnum):
 
 class BlockedStep(object):
 
+    # Attributes that change while sampling (e.g., adaptation state). They
+    # are saved by `get_state`, for example when checkpointing.
+    _state_attrs = ('tune', )
+
     def __new__(cls, *args, **kwargs):
         blocked = kwargs.get('blocked')
         if blocked is None:
@@ -73,6 +78,16 @@ class BlockedStep(object):
     def __getnewargs_ex__(self):
         return self.__newargs
 
+    def get_state(self):
+        """Return a copy of the sampling state of the step method."""
+        return {name: deepcopy(getattr(self, name))
+                for name in self._state_attrs if hasattr(self, name)}
+
+    def set_state(self, state):
+        """Restore a state returned by `get_state`."""
+        for name, value in state.items():
+            setattr(self, name, deepcopy(value))
+
     @staticmethod
     def competence(var):
         return Competence.INCOMPATIBLE
@@ -0,0 +1,251 @@
+"""
+Step methods that advance several chains in lockstep.
+
+Instead of one call of the compiled log-probability per chain and
+iteration, the positions of all chains are stacked into a (chains, n)
+array and evaluated with a single call of one compiled Theano function.
+Use them with `pymc3.sample_vectorized`.
+
+The log-probability graph of the model is not vectorised over chains:
+the compiled function loops over the rows with a scan. This removes the
+Python overhead of one call per chain, but the per-row cost of the scan
+remains.
+"""
+import numpy as np
+from numpy.random import normal, uniform, standard_exponential
+import theano
+import theano.tensor as tt
+
+from ..model import modelcontext
+from ..theanof import inputvars, join_nonshared_inputs, CallableTensor
+from ..vartypes import discrete_types, continuous_types
+from ..blocking import ArrayOrdering
+from .metropolis import tune
+
+__all__ = ['BatchMetropolis', 'BatchSlice']
+
+
+class BatchStep(object):
+    """Base class of step methods that update a (chains, n) array of
+    positions at once.
+
+    All free variables of the model are sampled as a single block.
+
+    Parameters
+    ----------
+    model : PyMC Model
+        Optional model for sampling step. Defaults to None (taken from context).
+    """
+
+    def __init__(self, model=None):
+        model = modelcontext(model)
+        self.model = model
+        self.vars = inputvars(model.vars)
+        self.ordering = ArrayOrdering(self.vars)
+        self.logp = batch_logp(model.logpt, self.vars)
+        self.dtype = self.logp.maker.fgraph.inputs[0].dtype
+
+    def step(self, q0):
+        """Advance all chains by one iteration.
+
+        Parameters
+        ----------
+        q0 : array, shape (chains, n)
+            Current positions of the chains
+
+        Returns
+        -------
+        New positions of the chains
+        """
+        return self.astep(np.asarray(q0, dtype=self.dtype))
+
+
+class BatchMetropolis(BatchStep):
+    """
+    Metropolis-Hastings sampling step for several chains in lockstep
+
+    Parameters
+    ----------
+    S : standard deviation
+        Standard deviation of the normal proposal distribution (scalar
+        or one value per element of the joined free variables).
+        Defaults to 1.
+    scaling : scalar or array
+        Initial scale factor for proposal. Defaults to 1.
+    tune : bool
+        Flag for tuning. Defaults to True.
+    tune_interval : int
+        The frequency of tuning. Defaults to 100 iterations.
+    model : PyMC Model
+        Optional model for sampling step. Defaults to None (taken from context).
+    """
+
+    def __init__(self, S=None, scaling=1., tune=True, tune_interval=100,
+                 model=None):
+        super(BatchMetropolis, self).__init__(model)
+
+        n = self.ordering.dimensions
+        if S is None:
+            S = np.ones(n)
+        self.S = np.asarray(S)
+        self.scaling = np.atleast_1d(scaling)
+        self.tune = tune
+        self.tune_interval = tune_interval
+        self.steps_until_tune = tune_interval
+        self.accepted = None
+        self._logp0 = None
+        self._q0 = None
+
+        self.discrete = np.concatenate(
+            [[v.dtype in discrete_types] * (v.dsize or 1) for v in self.vars])
+        self.any_discrete = self.discrete.any()
+
+    def astep(self, q0):
+        nchains = q0.shape[0]
+        if self.accepted is None or self.accepted.shape[0] != nchains:
+            self.scaling = np.resize(self.scaling, nchains)
+            self.accepted = np.zeros(nchains)
+
+        if not self.steps_until_tune and self.tune:
+            # Tune scaling parameter of each chain
+            self.scaling = np.array([
+                tune(s, a / float(self.tune_interval))
+                for s, a in zip(self.scaling, self.accepted)])
+            self.steps_until_tune = self.tune_interval
+            self.accepted[:] = 0
+
+        delta = normal(size=q0.shape) * self.S * self.scaling[:, None]
+        if self.any_discrete:
+            delta[:, self.discrete] = np.round(delta[:, self.discrete], 0)
+        q = (q0 + delta).astype(self.dtype)
+
+        # The log-probability of the current positions is kept from the
+        # previous iteration unless the positions were changed outside.
+        if self._q0 is None or not np.array_equal(self._q0, q0):
+            self._logp0 = self.logp(q0)
+        logp = self.logp(q)
+
+        mr = logp - self._logp0
+        accept = np.isfinite(mr) & (np.log(uniform(size=nchains)) < mr)
+
+        q_new = np.where(accept[:, None], q, q0)
+        self._logp0 = np.where(accept, logp, self._logp0)
+        self._q0 = q_new
+        self.accepted += accept
+        self.accept_stat = accept.mean()
+        self.steps_until_tune -= 1
+
+        return q_new
+
+
+class BatchSlice(BatchStep):
+    """
+    Slice sampler step method for several chains in lockstep
+
+    Chains that have found their next sample wait for the others, so
+    each round of stepping out and shrinking uses one evaluation of the
+    log-probability for all chains.
+
+    Parameters
+    ----------
+    w : float
+        Initial width of slice (Defaults to 1).
+    tune : bool
+        Flag for tuning (Defaults to True).
+    model : PyMC Model
+        Optional model for sampling step. Defaults to None (taken from context).
+    """
+
+    def __init__(self, w=1., tune=True, model=None):
+        super(BatchSlice, self).__init__(model)
+        if any(v.dtype not in continuous_types for v in self.vars):
+            raise ValueError('BatchSlice requires continuous variables.')
+
+        self.w = w
+        self.tune = tune
+        self._w_sum = 0.
+        self._n_tune = 0
+
+    def astep(self, q0):
+        nchains, n = q0.shape
+        w = np.resize(self.w, (nchains, n)) if np.ndim(self.w) < 2 \
+            else self.w
+
+        y = self.logp(q0) - standard_exponential(size=nchains)
+
+        # Stepping out procedure
+        ql = q0 - uniform(0, w)
+        qr = ql + w
+
+        yl = self.logp(ql)
+        active = y < yl
+        while active.any():
+            ql[active] -= w[active]
+            yl[active] = self.logp(ql)[active]
+            active &= y < yl
+
+        yr = self.logp(qr)
+        active = y < yr
+        while active.any():
+            qr[active] += w[active]
+            yr[active] = self.logp(qr)[active]
+            active &= y < yr
+
+        # Sample uniformly from slice, shrinking it on rejections
+        q = q0.copy()
+        active = np.ones(nchains, dtype=bool)
+        while active.any():
+            qi = uniform(ql, qr)
+            yi = self.logp(qi)
+
+            found = active & (yi > y)
+            q[found] = qi[found]
+            active &= ~found
+
+            upper = active & (qi > q0).all(axis=1)
+            lower = active & ~upper & (qi < q0).all(axis=1)
+            qr[upper] = qi[upper]
+            ql[lower] = qi[lower]
+
+        if self.tune:
+            # Tune sampler parameters
+            self._w_sum = self._w_sum + np.abs(q0 - q)
+            self._n_tune += 1
+            self.w = 2 * self._w_sum / self._n_tune
+
+        return q
+
+
+def batch_logp(logp, vars, shared=None):
+    """Compile a Theano function that evaluates `logp` for each row of a
+    (chains, n) array of joined variable values.
+
+    Parameters
+    ----------
+    logp : TensorVariable
+    vars : list of variables that are joined into the rows
+    shared : dict of theano variable -> shared variable for the other
+        variables of the model
+
+    Returns
+    -------
+    theano function mapping an array of shape (chains, n) to a vector of
+    the log-probabilities of the rows
+
+    Notes
+    -----
+    The rows are evaluated one after another by `theano.map`, as the
+    log-probability graphs of the distributions are written for a single
+    point and reduce over all axes.
+    """
+    if shared is None:
+        shared = {}
+    [logp0], inarray0 = join_nonshared_inputs([logp], vars, shared)
+
+    inmatrix = tt.matrix(name='inmatrix', dtype=inarray0.dtype)
+    inmatrix.tag.test_value = inarray0.tag.test_value[None, :]
+    logps, _ = theano.map(CallableTensor(logp0), sequences=[inmatrix])
+
+    f = theano.function([inmatrix], logps)
+    f.trust_input = True
+    return f
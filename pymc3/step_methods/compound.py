@@ -15,3 +15,10 @@ class CompoundStep(object):
         for method in self.methods:
             point = method.step(point)
         return point
+
+    def get_state(self):
+        return [method.get_state() for method in self.methods]
+
+    def set_state(self, state):
+        for method, method_state in zip(self.methods, state):
+            method.set_state(method_state)
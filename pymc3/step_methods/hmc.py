@@ -4,15 +4,19 @@ Created on Mar 7, 2011
 @author: johnsalvatier
 '''
 from numpy import floor
-from .quadpotential import quad_potential
-from .arraystep import ArrayStep, SamplerHist, metrop_select, Competence
+from .quadpotential import quad_potential, isquadpotential
+from .arraystep import ArrayStepShared, SamplerHist, metrop_select, Competence
 from ..tuning import guess_scaling
 from ..model import modelcontext, Point
-from ..theanof import inputvars
+from ..theanof import (make_shared_replacements, join_nonshared_inputs,
+                       CallableTensor, gradient, inputvars)
 from ..vartypes import discrete_types
 
 import numpy as np
 from scipy.sparse import issparse
+import theano
+from theano.scan_module import until
+import theano.tensor as tt
 
 from collections import namedtuple
 
@@ -27,15 +31,31 @@ def unif(step_size, elow=.85, ehigh=1.15):
     return np.random.uniform(elow, ehigh) * step_size
 
 
-class HamiltonianMC(ArrayStep):
+class HamiltonianMC(ArrayStepShared):
+    """
+    Hamiltonian Monte Carlo with a fixed path length
+
+    The leapfrog steps of a path are taken by a single call of a compiled
+    function (see `leapfrog_dE`).
+
+    The statistics in `stats_dtypes` are recorded in the trace at each
+    draw (see `MultiTrace.get_sampler_stats`): the step size, the number
+    of leapfrog steps, the energy of the new point and the acceptance
+    probability.
+    """
     default_blocked = True
+    generates_stats = True
+    stats_dtypes = {'step_size': np.float64,
+                    'n_leapfrog': np.int64,
+                    'energy': np.float64,
+                    'accept': np.float64}
 
-    def __init__(self, vars=None, scaling=None, step_scale=.25, path_length=2., is_cov=False, step_rand=unif, state=None, model=None, **kwargs):
+    def __init__(self, vars=None, scaling=None, step_scale=.25, path_length=2., is_cov=False, step_rand=unif, state=None, model=None, profile=False, **kwargs):
         """
         Parameters
         ----------
             vars : list of theano variables
-            scaling : array_like, ndim = {1,2}
+            scaling : array_like, ndim = {1,2} or quadpotential
                 Scaling for momentum distribution. 1d arrays interpreted matrix diagonal.
             step_scale : float, default=.25
                 Size of steps to take, automatically scaled down by 1/n**(1/4) (defaults to .25)
@@ -48,6 +68,8 @@ class HamiltonianMC(ArrayStep):
             state
                 State object
             model : Model
+            profile : bool or ProfileStats
+                sets the functions to be profiled
         """
         model = modelcontext(model)
 
@@ -61,7 +83,10 @@ class HamiltonianMC(ArrayStep):
         if isinstance(scaling, dict):
             scaling = guess_scaling(Point(scaling, model=model), model=model)
 
-        n = scaling.shape[0]
+        if isquadpotential(scaling):
+            n = sum(model.test_point[var.name].size for var in vars)
+        else:
+            n = scaling.shape[0]
 
         self.step_size = step_scale / n ** (1 / 4.)
 
@@ -74,25 +99,37 @@ class HamiltonianMC(ArrayStep):
             state = SamplerHist()
         self.state = state
 
-        super(HamiltonianMC, self).__init__(
-            vars, [model.fastlogp, model.fastdlogp(vars)], **kwargs)
+        # Functions of dict points, e.g., for calling `leapfrog` directly
+        self.fs = [model.fastlogp, model.fastdlogp(vars)]
 
-    def astep(self, q0, logp, dlogp):
-        H = Hamiltonian(logp, dlogp, self.potential)
+        shared = make_shared_replacements(vars, model)
+        self.leapfrog_dE = leapfrog_dE(
+            model.logpt, vars, shared, self.potential, profile=profile,
+            all_steps=False)
 
-        e = self.step_rand(self.step_size)
-        nstep = int(self.path_length / e)
+        super(HamiltonianMC, self).__init__(vars, shared, **kwargs)
 
-        p0 = H.pot.random()
+    def astep(self, q0):
+        e = self.step_rand(self.step_size)
+        nstep = max(int(self.path_length / e), 1)
 
-        q, p = leapfrog(H, q0, p0, nstep, e)
-        p = -p
+        p0 = self.potential.random()
 
-        mr = energy(H, q0, p0) - energy(H, q, p)
+        qs, _, dEs, E0 = self.leapfrog_dE(q0, p0, np.array(e),
+                                          np.array(nstep, dtype='int64'),
+                                          np.array(np.inf), q0, p0)
+        q = qs[-1]
 
-        self.state.metrops.append(mr)
+        mr = -dEs[-1]
 
-        return metrop_select(mr, q, q0)
+        q_new = metrop_select(mr, q, q0)
+        # Acceptance indicator of the last step, used for progress reports
+        self.accept_stat = float(q_new is q)
+        self.stats = {'step_size': e,
+                      'n_leapfrog': len(qs),
+                      'energy': E0 - mr if q_new is q else E0,
+                      'accept': 0. if np.isnan(mr) else min(1., np.exp(mr))}
+        return q_new
 
     @staticmethod
     def competence(var):
@@ -125,3 +162,140 @@ def leapfrog(H, q, p, n, e):
 
     p = p - (e / 2) * -dlogp(q)  # do a half step momentum update to finish off
     return q, p
+
+
+def leapfrog_dE(logp, vars, shared, pot, profile, all_steps=True):
+    """Computes a theano function that takes several leapfrog steps and
+    returns the positions, momenta and energy differences to the beginning
+    of the trajectory after each step.
+
+    The steps are taken in a theano scan, and the gradient at the end of
+    a step is reused at the start of the next one. The scan stops after
+    the first step whose energy difference exceeds `Emax` or is NaN.
+
+    If `all_steps` is False, the energy difference is only computed after
+    the last step, which saves an evaluation of `logp` per step, and all
+    `n_steps` steps are taken.
+
+    Potentials whose `velocity` does not accept theano variables (e.g.,
+    `QuadPotential_SparseInv`) cannot be used in the scan. For them, the
+    steps are taken in a Python loop with a compiled function of `logp`
+    and its gradient instead.
+
+    Parameters
+    ----------
+    logp : TensorVariable
+    vars : list of tensor variables
+    shared : list of shared variables not to compute leapfrog over
+    pot : quadpotential
+    profile : Boolean
+    all_steps : bool
+        Whether the energy difference is computed after every step
+
+    Returns
+    -------
+    function of q, p, e, n_steps, Emax, q0, p0 which returns q_new,
+    p_new with a row per step, delta_E with a row per step (or one row
+    after the last step), and the energy at q0, p0
+    """
+    dlogp = gradient(logp, vars)
+    (logp, dlogp), q = join_nonshared_inputs([logp, dlogp], vars, shared)
+
+    p = tt.dvector('p')
+    p.tag.test_value = q.tag.test_value
+    if not _symbolic_velocity(pot, p):
+        f = theano.function([q], [logp, dlogp], profile=profile)
+        f.trust_input = True
+        return _LeapfrogLoop(f, pot, all_steps)
+
+    logp = CallableTensor(logp)
+    dlogp = CallableTensor(dlogp)
+
+    H = Hamiltonian(logp, dlogp, pot)
+
+    q0 = tt.dvector('q0')
+    q0.tag.test_value = q.tag.test_value
+    p0 = tt.dvector('p0')
+    p0.tag.test_value = p.tag.test_value
+
+    e = tt.dscalar('e')
+    e.tag.test_value = 1
+    n_steps = tt.lscalar('n_steps')
+    n_steps.tag.test_value = 1
+    Emax = tt.dscalar('Emax')
+    Emax.tag.test_value = 1000
+
+    E0 = energy(H, q0, p0)
+
+    def step(q, p, grad, e, E0, Emax):
+        p = p + (e / 2) * grad
+        q = q + e * pot.velocity(p)
+        grad = dlogp(q)
+        p = p + (e / 2) * grad
+        if not all_steps:
+            return [q, p, grad]
+        dE = energy(H, q, p) - E0
+        return [q, p, grad, dE], until(tt.or_(dE > Emax, tt.isnan(dE)))
+
+    if all_steps:
+        (qs, ps, _, dEs), _ = theano.scan(
+            step, outputs_info=[q, p, dlogp(q), None],
+            non_sequences=[e, E0, Emax], n_steps=n_steps)
+    else:
+        (qs, ps, _), _ = theano.scan(
+            step, outputs_info=[q, p, dlogp(q)],
+            non_sequences=[e, E0, Emax], n_steps=n_steps)
+        dEs = tt.shape_padleft(energy(H, qs[-1], ps[-1]) - E0)
+
+    # `Emax` is not used if `all_steps` is False.
+    f = theano.function([q, p, e, n_steps, Emax, q0, p0],
+                        [qs, ps, dEs, E0], profile=profile,
+                        on_unused_input='ignore')
+    f.trust_input = True
+    return f
+
+
+def _symbolic_velocity(pot, p):
+    """Whether the velocity of potential `pot` can be computed for the
+    theano variable `p`."""
+    try:
+        return isinstance(pot.velocity(p), tt.Variable)
+    except Exception:
+        return False
+
+
+class _LeapfrogLoop(object):
+    """Leapfrog steps in a Python loop, with the inputs and outputs of
+    the function compiled by `leapfrog_dE`
+
+    Parameters
+    ----------
+    logp_dlogp : function of q returning logp and its gradient
+    pot : quadpotential
+    all_steps : bool
+        Whether the energy difference is computed after every step
+    """
+
+    def __init__(self, logp_dlogp, pot, all_steps):
+        self.logp_dlogp = logp_dlogp
+        self.pot = pot
+        self.all_steps = all_steps
+
+    def __call__(self, q, p, e, n_steps, Emax, q0, p0):
+        pot = self.pot
+        E0 = -self.logp_dlogp(q0)[0] + pot.energy(p0)
+        _, grad = self.logp_dlogp(q)
+        qs, ps, dEs = [], [], []
+        for i in range(int(n_steps)):
+            p = p + (e / 2) * grad
+            q = q + e * pot.velocity(p)
+            logp, grad = self.logp_dlogp(q)
+            p = p + (e / 2) * grad
+            qs.append(q)
+            ps.append(p)
+            if self.all_steps or i == n_steps - 1:
+                dE = -logp + pot.energy(p) - E0
+                dEs.append(dE)
+                if dE > Emax or np.isnan(dE):
+                    break
+        return np.array(qs), np.array(ps), np.array(dEs), np.array(E0)
@@ -81,6 +81,7 @@ class Metropolis(ArrayStepShared):
 
     """
     default_blocked = False
+    _state_attrs = ('tune', 'scaling', 'steps_until_tune', 'accepted')
 
     def __init__(self, vars=None, S=None, proposal_dist=NormalProposal, scaling=1.,
                  tune=True, tune_interval=100, model=None, **kwargs):
@@ -136,6 +137,8 @@ class Metropolis(ArrayStepShared):
 
         q_new = metrop_select(self.delta_logp(q, q0), q, q0)
 
+        # Acceptance indicator of the last step, used for progress reports
+        self.accept_stat = float(q_new is q)
         if q_new is q:
             self.accepted += 1
 
@@ -206,6 +209,7 @@ class BinaryMetropolis(ArrayStep):
         Optional model for sampling step. Defaults to None (taken from context).
 
     """
+    _state_attrs = ('tune', 'scaling', 'steps_until_tune', 'accepted')
 
     def __init__(self, vars, scaling=1., tune=True, tune_interval=100, model=None):
 
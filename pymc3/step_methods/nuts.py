@@ -1,15 +1,13 @@
-from .quadpotential import quad_potential
+from .quadpotential import quad_potential, isquadpotential, QuadPotential_Shared
 from .arraystep import ArrayStepShared, ArrayStep, SamplerHist, Competence
 from ..model import modelcontext, Point
 from ..vartypes import continuous_types
+import numpy as np
 from numpy import exp, log, array
 from numpy.random import uniform
-from .hmc import leapfrog, Hamiltonian, bern, energy
+from .hmc import leapfrog_dE, bern
 from ..tuning import guess_scaling
-import theano
-from ..theanof import (make_shared_replacements, join_nonshared_inputs, CallableTensor,
-                       gradient, inputvars)
-import theano.tensor as tt
+from ..theanof import make_shared_replacements, inputvars
 
 __all__ = ['NUTS']
 
@@ -22,8 +20,44 @@ class NUTS(ArrayStepShared):
 
     Hoffman, Matthew D., & Gelman, Andrew. (2011).
     The No-U-Turn Sampler: Adaptively Setting Path Lengths in Hamiltonian Monte Carlo.
+
+    with the multinomial sampling of trajectory points in:
+
+    Betancourt, Michael. (2017).
+    A Conceptual Introduction to Hamiltonian Monte Carlo.
+
+    The trajectory is built without recursion (see `_Tree`). After each
+    step, `tree_depth` is the number of times the trajectory was doubled,
+    and `n_leapfrog` the number of leapfrog steps taken.
+
+    While tuning, the step size is adapted by dual averaging and, if
+    `adapt_mass` is given, the mass matrix is set to the covariance of
+    the draws of expanding windows: after `adapt_init_buffer` draws, the
+    covariance is estimated from the next `adapt_window` draws, then
+    from twice as many, and so on. Dual averaging is restarted after
+    each window. If the number of tuning draws is known (`sample` passes
+    it to `set_tune_length`), the last window is stretched to end
+    `adapt_term_buffer` draws before tuning stops, and only the step
+    size is adapted in these last draws. When tuning stops, the step
+    size is fixed at the average of the adapted step sizes.
+
+    The statistics in `stats_dtypes` are recorded in the trace at each
+    draw (see `MultiTrace.get_sampler_stats`): the step size used, the
+    tree depth, the number of leapfrog steps, whether the trajectory
+    diverged, the energy of the draw and the mean acceptance probability
+    over the trajectory.
     """
     default_blocked = True
+    generates_stats = True
+    stats_dtypes = {'step_size': np.float64,
+                    'tree_depth': np.int64,
+                    'n_leapfrog': np.int64,
+                    'diverging': bool,
+                    'energy': np.float64,
+                    'accept': np.float64}
+    _state_attrs = ('tune', 'step_size', 'Hbar', 'u', 'm', 'log_step_bar',
+                    '_tune_draws', '_init_buffer', '_window', '_window_end',
+                    '_window_ends', '_welford', '_cov')
 
     def __init__(self, vars=None, scaling=None, step_scale=0.25, is_cov=False, state=None,
                  Emax=1000,
@@ -31,13 +65,18 @@ class NUTS(ArrayStepShared):
                  gamma=0.05,
                  k=0.75,
                  t0=10,
+                 max_treedepth=10,
+                 adapt_mass=None,
+                 adapt_init_buffer=75,
+                 adapt_window=25,
+                 adapt_term_buffer=50,
                  model=None,
                  profile=False, **kwargs):
         """
         Parameters
         ----------
             vars : list of Theano variables, default continuous vars
-            scaling : array_like, ndim = {1,2} or point
+            scaling : array_like, ndim = {1,2} or quadpotential or point
                 Scaling for momentum distribution. 1d arrays interpreted matrix diagonal.
             step_scale : float, default=.25
                 Size of steps to take, automatically scaled down by 1/n**(1/4)
@@ -51,9 +90,21 @@ class NUTS(ArrayStepShared):
                 target for avg accept probability between final branch and initial position
             gamma : float, default .05
             k : float (.5,1) default .75
-                scaling of speed of adaptation
+                weight of the latest step size in the step size used
+                after tuning
             t0 : int, default 10
                 slows inital adapatation
+            max_treedepth : int, default 10
+                maximum number of times the trajectory is doubled, so at
+                most 2**max_treedepth - 1 leapfrog steps are taken per draw
+            adapt_mass : {None, 'diag', 'dense'}, default None
+                adapt the diagonal or the full mass matrix while tuning
+            adapt_init_buffer : int, default 75
+                number of tuning draws before the first window
+            adapt_window : int, default 25
+                number of draws of the first window
+            adapt_term_buffer : int, default 50
+                number of tuning draws after the last window
             model : Model
             profile : bool or ProfileStats
                 sets the functions to be profiled
@@ -71,11 +122,26 @@ class NUTS(ArrayStepShared):
             scaling = guess_scaling(
                 Point(scaling, model=model), model=model, vars=vars)
 
-        n = scaling.shape[0]
+        if isquadpotential(scaling):
+            n = sum(model.test_point[var.name].size for var in vars)
+        else:
+            n = scaling.shape[0]
 
         self.step_size = step_scale / n**(1 / 4.)
 
-        self.potential = quad_potential(scaling, is_cov, as_cov=False)
+        if adapt_mass not in (None, 'diag', 'dense'):
+            raise ValueError('Unknown mass matrix adaptation: {}'.format(
+                adapt_mass))
+        if adapt_mass is not None and isquadpotential(scaling):
+            raise ValueError('The mass matrix of a quadpotential scaling '
+                             'cannot be adapted.')
+        self.adapt_mass = adapt_mass
+        if adapt_mass is None:
+            self.potential = quad_potential(scaling, is_cov, as_cov=False)
+            self._cov = None
+        else:
+            self._cov = _initial_cov(scaling, is_cov, adapt_mass == 'dense')
+            self.potential = QuadPotential_Shared(self._cov)
 
         if state is None:
             state = SamplerHist()
@@ -90,55 +156,136 @@ class NUTS(ArrayStepShared):
         self.Hbar = 0
         self.u = log(self.step_size * 10)
         self.m = 1
+        self.log_step_bar = log(self.step_size)
+
+        self.tune = True
+        self.adapt_init_buffer = adapt_init_buffer
+        self.adapt_window = adapt_window
+        self.adapt_term_buffer = adapt_term_buffer
+        self._tune_draws = 0
+        self._init_buffer = adapt_init_buffer
+        self._window = adapt_window
+        self._window_end = adapt_init_buffer + adapt_window
+        # Ends of the remaining windows, or None if the number of tuning
+        # draws is not known and the windows keep doubling.
+        self._window_ends = None
+        self._welford = None
+        if adapt_mass is not None:
+            self._welford = _WelfordCovariance(n, adapt_mass == 'dense')
+
+        self.max_treedepth = max_treedepth
+        self.tree_depth = 0
+        self.n_leapfrog = 0
+        # Momenta and momentum sums at the checkpoints of `_Tree`
+        self._p_ckpts = self._p_sum_ckpts = None
 
         shared = make_shared_replacements(vars, model)
-        self.leapfrog1_dE = leapfrog1_dE(
+        self.leapfrog_dE = leapfrog_dE(
             model.logpt, vars, shared, self.potential, profile=profile)
 
         super(NUTS, self).__init__(vars, shared, **kwargs)
 
     def astep(self, q0):
-        # Hamiltonian(self.logp, self.dlogp, self.potential)
-        H = self.leapfrog1_dE
-        Emax = self.Emax
-        e = self.step_size
-
         p0 = self.potential.random()
-        u = uniform()
-        q = qn = qp = q0
-        p = pn = pp = p0
-
-        n, s, j = 1, 1, 0
-
-        while s == 1:
-            v = bern(.5) * 2 - 1
-
-            if v == -1:
-                qn, pn, _, _, q1, n1, s1, a, na = buildtree(
-                    H, qn, pn, u, v, j, e, Emax, q0, p0)
-            else:
-                _, _, qp, pp, q1, n1, s1, a, na = buildtree(
-                    H, qp, pp, u, v, j, e, Emax, q0, p0)
-
-            if s1 == 1 and bern(min(1, n1 * 1. / n)):
-                q = q1
-
-            n = n + n1
-
-            span = qp - qn
-            s = s1 * (span.dot(pn) >= 0) * (span.dot(pp) >= 0)
-            j = j + 1
-
-        p = -p
-
+        if self._p_ckpts is None or self._p_ckpts.shape[1] != len(q0):
+            self._p_ckpts = np.empty((self.max_treedepth, len(q0)))
+            self._p_sum_ckpts = np.empty((self.max_treedepth, len(q0)))
+        tree = _Tree(self.leapfrog_dE, self.potential, self.step_size,
+                     self.Emax, q0, p0, self._p_ckpts, self._p_sum_ckpts)
+
+        for _ in range(self.max_treedepth):
+            tree.extend(bern(.5) * 2 - 1)
+            if tree.diverging or tree.turning:
+                break
+
+        self.tree_depth = tree.doublings
+        self.n_leapfrog = tree.n_leapfrog
+        # Mean acceptance probability over the trajectory
+        self.accept_stat = tree.accept_sum / tree.n_leaves
+        self.stats = {'step_size': self.step_size,
+                      'tree_depth': tree.doublings,
+                      'n_leapfrog': tree.n_leapfrog,
+                      'diverging': tree.diverging,
+                      'energy': tree.E0 + tree.proposal_dE,
+                      'accept': self.accept_stat}
+
+        if self.tune:
+            self._adapt_step_size()
+            if self.adapt_mass is not None:
+                self._adapt_mass(tree.proposal)
+
+        return tree.proposal
+
+    @property
+    def tune(self):
+        return self._tune
+
+    @tune.setter
+    def tune(self, tune):
+        if not tune and getattr(self, '_tune', False):
+            # The first draw after tuning uses the averaged step size.
+            self.step_size = exp(self.log_step_bar)
+        self._tune = tune
+
+    def set_tune_length(self, tune):
+        """Fit the mass matrix adaptation windows into the next `tune`
+        draws, which are tuned.
+
+        If `tune` is too small for the buffers and the first window,
+        15% of the draws are used as initial buffer, 10% as terminal
+        buffer and the rest as window.
+        """
+        self._tune_draws = 0
+        self._init_buffer, ends = _window_ends(
+            tune, self.adapt_init_buffer, self.adapt_window,
+            self.adapt_term_buffer)
+        self._window_end = ends.pop(0) if ends else None
+        self._window_ends = ends
+        if self._welford is not None:
+            self._welford.reset()
+
+    def _adapt_step_size(self):
         w = 1. / (self.m + self.t0)
         self.Hbar = (1 - w) * self.Hbar + w * \
-            (self.target_accept - a * 1. / na)
+            (self.target_accept - self.accept_stat)
 
         self.step_size = exp(self.u - (self.m**.5 / self.gamma) * self.Hbar)
+        mk = self.m ** -self.k
+        self.log_step_bar = mk * log(self.step_size) + \
+            (1 - mk) * self.log_step_bar
         self.m += 1
 
-        return q
+    def _adapt_mass(self, q):
+        self._tune_draws += 1
+        if self._tune_draws <= self._init_buffer or self._window_end is None:
+            return
+        self._welford.update(q)
+        if self._tune_draws < self._window_end:
+            return
+
+        self._cov = self._welford.estimate()
+        self.potential.set_cov(self._cov)
+        self._welford.reset()
+        if self._window_ends is None:
+            self._window *= 2
+            self._window_end += self._window
+        else:
+            self._window_end = (self._window_ends.pop(0)
+                                if self._window_ends else None)
+
+        # Restart dual averaging for the new mass matrix.
+        self.Hbar = 0
+        self.u = log(self.step_size * 10)
+        self.m = 1
+        self.log_step_bar = log(self.step_size)
+
+    def set_state(self, state):
+        state = dict(state)
+        # Restore the flag without fixing the step size.
+        self._tune = state.pop('tune', self._tune)
+        super(NUTS, self).set_state(state)
+        if self.adapt_mass is not None:
+            self.potential.set_cov(self._cov)
 
     @staticmethod
     def competence(var):
@@ -147,76 +294,204 @@ class NUTS(ArrayStepShared):
         return Competence.INCOMPATIBLE
 
 
-def buildtree(H, q, p, u, v, j, e, Emax, q0, p0):
-    if j == 0:
-        leapfrog1_dE = H
-        q1, p1, dE = leapfrog1_dE(q, p, array(v * e), q0, p0)
-
-        n1 = int(log(u) + dE <= 0)
-        s1 = int(log(u) + dE < Emax)
-        return q1, p1, q1, p1, q1, n1, s1, min(1, exp(-dE)), 1
-    else:
-        qn, pn, qp, pp, q1, n1, s1, a1, na1 = buildtree(
-            H, q, p, u, v, j - 1, e, Emax, q0, p0)
-        if s1 == 1:
-            if v == -1:
-                qn, pn, _, _, q11, n11, s11, a11, na11 = buildtree(
-                    H, qn, pn, u, v, j - 1, e, Emax, q0, p0)
-            else:
-                _, _, qp, pp, q11, n11, s11, a11, na11 = buildtree(
-                    H, qp, pp, u, v, j - 1, e, Emax, q0, p0)
-
-            if bern(n11 * 1. / (max(n1 + n11, 1))):
-                q1 = q11
-
-            a1 = a1 + a11
-            na1 = na1 + na11
-
-            span = qp - qn
-            s1 = s11 * (span.dot(pn) >= 0) * (span.dot(pp) >= 0)
-            n1 = n1 + n11
-        return qn, pn, qp, pp, q1, n1, s1, a1, na1
-    return
-
-
-def leapfrog1_dE(logp, vars, shared, pot, profile):
-    """Computes a theano function that computes one leapfrog step and the energy difference between the beginning and end of the trajectory.
-    Parameters
-    ----------
-    logp : TensorVariable
-    vars : list of tensor variables
-    shared : list of shared variables not to compute leapfrog over
-    pot : quadpotential
-    porifle : Boolean
-
-    Returns
-    -------
-    theano function which returns
-    q_new, p_new, delta_E
-    """
-    dlogp = gradient(logp, vars)
-    (logp, dlogp), q = join_nonshared_inputs([logp, dlogp], vars, shared)
-    logp = CallableTensor(logp)
-    dlogp = CallableTensor(dlogp)
+class _Tree(object):
+    """NUTS trajectory that is doubled iteratively
 
-    H = Hamiltonian(logp, dlogp, pot)
+    Each doubling adds a subtree of 2**depth leapfrog steps in the given
+    direction. The U-turn criterion of the subtrees of the new subtree
+    is checked while it is built, using the momenta and momentum sums at
+    checkpoints: the checkpoint of a leaf with an even index is kept
+    until all subtrees that start at it are complete. At most one
+    checkpoint per level of the subtree is needed, so the checkpoint
+    arrays have `max_treedepth` rows.
 
-    p = tt.dvector('p')
-    p.tag.test_value = q.tag.test_value
+    The proposal is sampled among the points of the trajectory with
+    weights exp(-dE), uniformly within a subtree and biased towards the
+    new subtree when it is merged.
 
-    q0 = tt.dvector('q0')
-    q0.tag.test_value = q.tag.test_value
-    p0 = tt.dvector('p0')
-    p0.tag.test_value = p.tag.test_value
+    All leapfrog steps of a subtree are taken by one call of `leapfrog`
+    (see `leapfrog_dE`), which only stops early if the subtree diverges.
+    `n_leapfrog` counts the steps taken, and `n_leaves` the steps that
+    are part of the trajectory, which are fewer if a subtree of the new
+    subtree makes a U-turn. `E0` is the energy at the start of the
+    trajectory and `proposal_dE` the energy difference of the proposal.
+    """
 
-    e = tt.dscalar('e')
-    e.tag.test_value = 1
+    def __init__(self, leapfrog, potential, step_size, Emax, q0, p0,
+                 p_ckpts, p_sum_ckpts):
+        self.leapfrog = leapfrog
+        self.potential = potential
+        self.step_size = step_size
+        self.Emax = Emax
+        self.q0 = q0
+        self.p0 = p0
+        self.p_ckpts = p_ckpts
+        self.p_sum_ckpts = p_sum_ckpts
+
+        self.left = self.right = q0, p0
+        self.proposal = q0
+        self.proposal_dE = 0.
+        self.E0 = None
+        self.log_weight = 0.
+        self.p_sum = p0.copy()
+        self.depth = 0
+        self.doublings = 0
+        self.n_leapfrog = 0
+        self.n_leaves = 0
+        self.accept_sum = 0.
+        self.diverging = False
+        self.turning = False
+
+    def extend(self, direction):
+        """Double the trajectory in `direction` (1 or -1).
+
+        If the new subtree diverges or makes a U-turn, it is discarded
+        and `diverging` or `turning` is set.
+        """
+        self.doublings += 1
+        q, p = self.right if direction == 1 else self.left
+        epsilon = array(direction * self.step_size)
+        qs, ps, dEs, E0 = self.leapfrog(q, p, epsilon,
+                                        array(2 ** self.depth, dtype='int64'),
+                                        array(float(self.Emax)),
+                                        self.q0, self.p0)
+        self.n_leapfrog += len(dEs)
+        self.E0 = float(E0)
+
+        proposal = None
+        proposal_dE = None
+        log_weight = -np.inf
+        p_sum = np.zeros_like(p)
+        for leaf in range(len(dEs)):
+            q, p, dE = qs[leaf], ps[leaf], float(dEs[leaf])
+            self.n_leaves += 1
+            if np.isnan(dE):
+                dE = np.inf
+            self.accept_sum += min(1., exp(-dE))
+            if dE > self.Emax:
+                self.diverging = True
+                return
+
+            log_weight = np.logaddexp(log_weight, -dE)
+            if log(uniform()) < -dE - log_weight:
+                proposal = q
+                proposal_dE = dE
+
+            p_sum += p
+            if leaf % 2 == 0:
+                idx = _bit_count(leaf >> 1)
+                self.p_ckpts[idx] = p
+                self.p_sum_ckpts[idx] = p_sum
+            elif self._subtree_turning(leaf, p, p_sum):
+                self.turning = True
+                return
+
+        if direction == 1:
+            self.right = q, p
+        else:
+            self.left = q, p
+        if log(uniform()) < log_weight - self.log_weight:
+            self.proposal = proposal
+            self.proposal_dE = proposal_dE
+        self.log_weight = np.logaddexp(self.log_weight, log_weight)
+        self.p_sum += p_sum
+        self.depth += 1
+        self.turning = _is_turning(self.potential, self.left[1],
+                                   self.right[1], self.p_sum)
+
+    def _subtree_turning(self, leaf, p, p_sum):
+        """Check the U-turn criterion of the subtrees that end at the
+        odd `leaf`."""
+        idx_max = _bit_count(leaf >> 1)
+        # Number of subtrees ending at the leaf: its trailing 1 bits
+        n_subtrees = _bit_count((~leaf & (leaf + 1)) - 1)
+        for idx in range(idx_max, idx_max - n_subtrees, -1):
+            subtree_p_sum = p_sum - self.p_sum_ckpts[idx] + self.p_ckpts[idx]
+            if _is_turning(self.potential, self.p_ckpts[idx], p,
+                           subtree_p_sum):
+                return True
+        return False
+
+
+def _window_ends(tune, init_buffer, window, term_buffer):
+    """Return the initial buffer and the draws at which the mass matrix
+    adaptation windows end, if `tune` draws are tuned.
+
+    The windows double in length, and the last one is stretched to end
+    `term_buffer` draws before the end of tuning, as in Stan.
+    """
+    if init_buffer + window + term_buffer > tune:
+        init_buffer = int(.15 * tune)
+        term_buffer = int(.1 * tune)
+        window = tune - init_buffer - term_buffer
+    if window < 1:
+        return init_buffer, []
+    last = tune - term_buffer
+    ends = []
+    end = init_buffer + window
+    # Stop once the next, twice as long window would not fit.
+    while end + 2 * window < last:
+        ends.append(end)
+        window *= 2
+        end += window
+    ends.append(last)
+    return init_buffer, ends
+
+
+def _initial_cov(scaling, is_cov, dense):
+    """Return the covariance for the mass matrix of `scaling`."""
+    if scaling.ndim == 1:
+        cov = scaling if is_cov else 1. / scaling
+        return np.diag(cov) if dense else cov
+    cov = scaling if is_cov else np.linalg.inv(scaling)
+    return cov if dense else np.diag(cov).copy()
+
+
+class _WelfordCovariance(object):
+    """Running estimate of the (diagonal of the) covariance of samples
+
+    The estimate is regularized towards a small multiple of the identity
+    when there are few samples.
+    """
 
-    q1, p1 = leapfrog(H, q, p, 1, e)
-    E = energy(H, q1, p1)
-    E0 = energy(H, q0, p0)
-    dE = E - E0
+    def __init__(self, n, dense):
+        self.dense = dense
+        self.n_dim = n
+        self.reset()
+
+    def reset(self):
+        self.n = 0
+        self.mean = np.zeros(self.n_dim)
+        if self.dense:
+            self.m2 = np.zeros((self.n_dim, self.n_dim))
+        else:
+            self.m2 = np.zeros(self.n_dim)
+
+    def update(self, x):
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        if self.dense:
+            self.m2 += np.outer(x - self.mean, delta)
+        else:
+            self.m2 += (x - self.mean) * delta
+
+    def estimate(self):
+        cov = self.m2 / max(self.n - 1, 1)
+        w = self.n / (self.n + 5.)
+        if self.dense:
+            return w * cov + 1e-3 * (1 - w) * np.eye(self.n_dim)
+        return w * cov + 1e-3 * (1 - w)
+
+
+def _is_turning(potential, p_left, p_right, p_sum):
+    """Whether a trajectory with end momenta `p_left` and `p_right` and
+    momentum sum `p_sum` makes a U-turn."""
+    p_sum = p_sum - (p_left + p_right) / 2
+    return (potential.velocity(p_left).dot(p_sum) <= 0 or
+            potential.velocity(p_right).dot(p_sum) <= 0)
+
+
+def _bit_count(n):
+    return bin(n).count('1')
 
-    f = theano.function([q, p, e, q0, p0], [q1, p1, dE], profile=profile)
-    f.trust_input = True
-    return f
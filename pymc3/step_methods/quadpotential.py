@@ -1,22 +1,25 @@
 from numpy import dot
 from numpy.random import normal
-from numpy.linalg import solve
-from scipy.linalg import cholesky, cho_solve
+from scipy.linalg import cholesky, cho_solve, solve_triangular
 from scipy.sparse import issparse
 
 import numpy as np
+import theano
+import theano.tensor as tt
 
 __all__ = ['quad_potential', 'ElemWiseQuadPotential', 'QuadPotential',
-           'QuadPotential_Inv', 'isquadpotential']
+           'QuadPotential_Inv', 'QuadPotential_Shared',
+           'QuadPotential_LowRank', 'isquadpotential']
 
 
 def quad_potential(C, is_cov, as_cov):
     """
     Parameters
     ----------
-        C : arraylike, 0 <= ndim <= 2
+        C : arraylike, 0 <= ndim <= 2, or quadpotential
             scaling matrix for the potential
             vector treated as diagonal matrix
+            a quadpotential is returned unchanged
         is_cov : Boolean
             whether C is provided as a covariance matrix or hessian
         as_cov : Boolean
@@ -28,6 +31,9 @@ def quad_potential(C, is_cov, as_cov):
         q : Quadpotential
     """
 
+    if isquadpotential(C):
+        return C
+
     if issparse(C) and is_cov != as_cov:
         if not chol_available:
             raise ImportError("Requires scikits.sparse")
@@ -96,8 +102,16 @@ class QuadPotential_Inv(object):
 
     def __init__(self, A):
         self.L = cholesky(A, lower=True)
+        self._inv = None
 
     def velocity(self, x):
+        if isinstance(x, tt.Variable):
+            # Compiled leapfrog steps (see `hmc.leapfrog_dE`) multiply
+            # by the inverse, which is computed once.
+            if self._inv is None:
+                self._inv = cho_solve((self.L, True),
+                                      np.eye(self.L.shape[0]))
+            return tt.dot(self._inv, x)
         return cho_solve((self.L, True), x)
 
     def random(self):
@@ -105,7 +119,9 @@ class QuadPotential_Inv(object):
         return dot(self.L, n)
 
     def energy(self, x):
-        L1x = solve(self.L, x)
+        if isinstance(x, tt.Variable):
+            return .5 * x.dot(self.velocity(x))
+        L1x = solve_triangular(self.L, x, lower=True)
         return .5 * dot(L1x.T, L1x)
 
 
@@ -120,13 +136,97 @@ class QuadPotential(object):
 
     def random(self):
         n = normal(size=self.L.shape[0])
-        return solve(self.L.T, n)
+        return solve_triangular(self.L, n, lower=True, trans='T')
 
     def energy(self, x):
         return .5 * x.dot(self.A).dot(x)
 
     __call__ = random
 
+class QuadPotential_Shared(object):
+    """Potential with a covariance that can be changed after functions
+    using it have been compiled
+
+    In theano graphs the covariance is a shared variable; numerical
+    methods are delegated to the potential of the current covariance.
+
+    Parameters
+    ----------
+    cov : array_like, ndim = {1,2}
+        Covariance matrix, or its diagonal
+    """
+
+    def __init__(self, cov):
+        self.cov = theano.shared(np.asarray(cov, dtype='float64'), 'cov')
+        self.set_cov(cov)
+
+    def set_cov(self, cov):
+        cov = np.asarray(cov, dtype='float64')
+        if cov.shape != self.cov.get_value(borrow=True).shape:
+            raise ValueError('The shape of the covariance cannot change.')
+        self.potential = quad_potential(cov, is_cov=True, as_cov=False)
+        self.cov.set_value(cov)
+
+    def velocity(self, x):
+        if isinstance(x, tt.Variable):
+            if self.cov.ndim == 1:
+                return self.cov * x
+            return tt.dot(self.cov, x)
+        return self.potential.velocity(x)
+
+    def random(self):
+        return self.potential.random()
+
+    def energy(self, x):
+        if isinstance(x, tt.Variable):
+            return .5 * x.dot(self.velocity(x))
+        return self.potential.energy(x)
+
+
+class QuadPotential_LowRank(object):
+    """Potential with a covariance that is diagonal plus low rank
+
+    The covariance diag(d) + U U^T is never formed, so the cost of each
+    method is O(n k) for n variables and rank k. Momenta are drawn with
+    the Woodbury identity, using the Cholesky factor of a k x k matrix
+    that is computed once.
+
+    Parameters
+    ----------
+    d : array_like, ndim = 1
+        Diagonal part of the covariance
+    U : array_like, ndim = 2
+        Low rank part of the covariance, of shape (n, k)
+    """
+
+    def __init__(self, d, U):
+        d = np.asarray(d, dtype='float64')
+        U = np.asarray(U, dtype='float64')
+        if U.ndim != 2 or U.shape[0] != d.shape[0]:
+            raise ValueError('U must have a row per element of d.')
+        partial_check_positive_definite(d)
+        self.d = d
+        self.U = U
+        self.s = d ** .5
+        self.Ud = U / d[:, np.newaxis]
+        k = U.shape[1]
+        self.L = cholesky(np.eye(k) + U.T.dot(self.Ud), lower=True)
+
+    def velocity(self, x):
+        if isinstance(x, tt.Variable):
+            return self.d * x + tt.dot(self.U, tt.dot(self.U.T, x))
+        return self.d * x + self.U.dot(self.U.T.dot(x))
+
+    def random(self):
+        n, k = self.U.shape
+        z = self.s * normal(size=n) + self.U.dot(normal(size=k))
+        # Solve with the covariance by the Woodbury identity
+        return z / self.d - self.Ud.dot(cho_solve((self.L, True),
+                                                  self.Ud.T.dot(z)))
+
+    def energy(self, x):
+        return .5 * x.dot(self.velocity(x))
+
 try:
     import scikits.sparse.cholmod as cholmod
     chol_available = True
@@ -27,6 +27,7 @@ class Slice(ArrayStep):
 
     """
     default_blocked = False
+    _state_attrs = ('tune', 'w', 'w_tune')
 
     def __init__(self, vars=None, w=1, tune=True, model=None, **kwargs):
 
@@ -0,0 +1,65 @@
+import os
+import tempfile
+
+from pymc3.tests import backend_fixtures as bf
+from pymc3.backends import background, base, ndarray, sqlite, text
+from nose.tools import assert_raises
+
+DBNAME = os.path.join(tempfile.gettempdir(), 'test-background.db')
+
+
+class BackgroundText(background.BackgroundTrace):
+
+    def __init__(self, name, model=None, vars=None):
+        super(BackgroundText, self).__init__(
+            text.Text(name, model, vars), maxsize=2)
+
+
+class BackgroundSQLite(background.BackgroundTrace):
+
+    def __init__(self, name, model=None, vars=None):
+        super(BackgroundSQLite, self).__init__(
+            sqlite.SQLite(name, model, vars), maxsize=2)
+
+
+class TestBackgroundText1dSampling(bf.SamplingTestCase):
+    backend = BackgroundText
+    name = 'text-db'
+    shape = 2
+
+
+class TestBackgroundText2dSelection(bf.SelectionTestCase):
+    backend = BackgroundText
+    name = 'text-db'
+    shape = (2, 3)
+
+
+class TestBackgroundSQLite1dSampling(bf.SamplingTestCase):
+    backend = BackgroundSQLite
+    name = DBNAME
+    shape = 2
+
+
+class TestNDArrayBackgroundSQLiteEquality(bf.BackendEqualityTestCase):
+    backend0 = ndarray.NDArray
+    name0 = None
+    backend1 = BackgroundSQLite
+    name1 = DBNAME
+    shape = (2, 3)
+
+
+class FailingNDArray(ndarray.NDArray):
+
+    def record(self, point):
+        raise IOError('disk full')
+
+
+def test_write_error():
+    _, model, _ = bf.models.simple_model()
+    with model:
+        strace = background.BackgroundTrace(FailingNDArray())
+    strace.setup(2, 0)
+    strace.record(model.test_point)
+    with assert_raises(base.BackendError):
+        strace.flush()
+    strace.close()
@@ -0,0 +1,19 @@
+from pymc3 import benchmarks
+
+
+def test_run_benchmark():
+    cases = [b for b in benchmarks.benchmarks()
+             if b.name in ('sample[simple_model()][step=metropolis]',
+                           'sample[simple_model()][backend=text,'
+                           'step=metropolis]',
+                           'find_MAP[regression(1000, 10)]')]
+    assert len(cases) == 3
+    results = benchmarks.run(cases, draws=50, isolate=False, verbose=False)
+    for result in results['results']:
+        assert 'error' not in result, result.get('error')
+        assert result['seconds'] > 0
+    for sampled in results['results'][:2]:
+        assert sampled['draws_per_sec'] > 0
+        assert sampled['ess_per_sec'] > 0
+    assert benchmarks.compare(results, results) == {
+        b.name: 1. for b in cases}
@@ -7,7 +7,8 @@ from ..step_methods import Slice, Metropolis, NUTS
 from ..distributions import Normal
 from ..tuning import find_MAP
 from ..sampling import sample
-from ..diagnostics import effective_n, geweke, gelman_rubin
+from ..diagnostics import (effective_n, geweke, gelman_rubin,
+                           ConvergenceMonitor)
 from pymc3.examples import disaster_model as dm
 
 
@@ -113,3 +114,21 @@ class TestDiagnostics(unittest.TestCase):
 
         n_effective = effective_n(ptrace)['x']
         assert_allclose(n_effective, n_jobs * n_samples, 2)
+
+
+class TestConvergenceMonitor(unittest.TestCase):
+
+    def test_matches_diagnostics(self):
+        """Check incremental estimates against gelman_rubin and effective_n"""
+        with Model():
+            Normal('x', 0, 1., shape=2)
+            ptrace = sample(300, Metropolis(), njobs=3, trace='shared',
+                            random_seed=[1, 2, 3], progressbar=False)
+
+        monitor = ConvergenceMonitor()
+        for n in [50, 50, 120, 300]:
+            monitor.update('x', [ptrace.get_values('x', chains=chain)[:n]
+                                 for chain in ptrace.chains])
+        assert_allclose(monitor.rhat('x'), gelman_rubin(ptrace)['x'])
+        assert_allclose(monitor.effective_n('x').astype(int),
+                        effective_n(ptrace)['x'])
@@ -13,7 +13,8 @@ from ..distributions import (Categorical, Multinomial, VonMises, Dirichlet,
                              BetaBinomial, StudentT, Weibull, Pareto, InverseGamma, Gamma, Cauchy,
                              HalfCauchy, Lognormal, Laplace, NegativeBinomial, Geometric,
                              Exponential, ExGaussian, Normal, Flat, Wald, ChiSquared,
-                             HalfNormal, DiscreteUniform, Bound, Uniform, Binomial, draw_values)
+                             HalfNormal, DiscreteUniform, Bound, Uniform, Binomial, draw_values,
+                             BatchPoint)
 from ..model import Model, Point
 
 import numpy as np
@@ -122,6 +123,72 @@ class TestDrawValues(SeededTest):
         self.assertIsInstance(tau, np.ndarray)
 
 
+class TestBatchRandom(SeededTest):
+    batch_dists = [(Normal, {'mu': 0., 'tau': 1.}),
+                   (Uniform, {'lower': 0., 'upper': 1.}),
+                   (HalfNormal, {'tau': 1.}),
+                   (Wald, {'mu': 1., 'lam': 1., 'alpha': 0.}),
+                   (Beta, {'alpha': 1., 'beta': 1.}),
+                   (Exponential, {'lam': 1.}),
+                   (Laplace, {'mu': 1., 'b': 1}),
+                   (Lognormal, {'mu': 1., 'tau': 1.}),
+                   (StudentT, {'nu': 5, 'mu': 0., 'lam': 1.}),
+                   (Pareto, {'alpha': 0.5, 'm': 1.}),
+                   (Cauchy, {'alpha': 1., 'beta': 1.}),
+                   (HalfCauchy, {'beta': 1.}),
+                   (Gamma, {'alpha': 1., 'beta': 1.}),
+                   (InverseGamma, {'alpha': 0.5, 'beta': 0.5}),
+                   (ChiSquared, {'nu': 2}),
+                   (Weibull, {'alpha': 1., 'beta': 1.}),
+                   (ExGaussian, {'mu': 0., 'sigma': 1., 'nu': 1.}),
+                   (VonMises, {'mu': 0., 'kappa': 1.}),
+                   (Binomial, {'n': 5, 'p': 0.5}),
+                   (Bernoulli, {'p': 0.5}),
+                   (Poisson, {'mu': 1.}),
+                   (NegativeBinomial, {'mu': 1., 'alpha': 1.}),
+                   (Geometric, {'p': 0.5})]
+
+    def test_draw_values(self):
+        with Model():
+            mu = Normal('mu', mu=0., tau=1e-3)
+            sigma = Gamma('sigma', alpha=1., beta=1., transform=None)
+            y = Normal('y', mu=mu, sd=sigma)
+            point = BatchPoint({'mu': np.array([1., 2., 3.]),
+                                'sigma': np.array([1., 2., 4.])}, 3)
+            mu2, tau2 = draw_values([y.distribution.mu, y.distribution.tau],
+                                    point=point)
+        np.testing.assert_allclose(mu2, [1., 2., 3.])
+        np.testing.assert_allclose(tau2, [1., 1 / 2.**2, 1 / 4.**2])
+
+    def test_shapes(self):
+        n = 3
+        for dist, kwargs in self.batch_dists:
+            self.assertTrue(dist.batch_random)
+            for shape in [None, 10]:
+                with Model():
+                    if shape is None:
+                        rv = dist('x', transform=None, **kwargs)
+                    else:
+                        rv = dist('x', shape=shape, transform=None, **kwargs)
+                for size in [None, 5, (4, 5)]:
+                    expected = np.atleast_1d(
+                        rv.distribution.random(size=size)).shape
+                    actual = rv.distribution.random(
+                        point=BatchPoint({}, n), size=size).shape
+                    self.assertEqual(actual, (n, ) + expected, dist.__name__)
+
+    def test_batch_samples(self):
+        with Model():
+            mu = Normal('mu', mu=0., tau=1e-3)
+            y = Normal('y', mu=mu, sd=1., shape=2)
+            point = BatchPoint({'mu': np.array([-10., 0., 10.])}, 3)
+            samples = y.distribution.random(point=point, size=10000)
+        self.assertEqual(samples.shape, (3, 10000, 2))
+        np.testing.assert_allclose(samples.mean(axis=(1, 2)),
+                                   [-10., 0., 10.], atol=.05)
+        np.testing.assert_allclose(samples.std(axis=(1, 2)), 1., atol=.05)
+
+
 # TODO: factor out a base class to avoid copy/paste.
 @attr('scalar_parameter_shape')
 class ScalarParameterShape(SeededTest):
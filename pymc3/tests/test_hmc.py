@@ -1,7 +1,9 @@
 import pymc3 as pm
 import numpy as np
 from . import models
-from pymc3.step_methods.hmc import leapfrog, Hamiltonian
+from pymc3.step_methods.hmc import leapfrog, Hamiltonian, energy
+from pymc3.step_methods.quadpotential import quad_potential
+import theano.tensor as tt
 from .checks import close_to
 from ..blocking import DictToArrayBijection
 
@@ -30,3 +32,70 @@ def test_leapfrog_reversible():
 
             close_to(q, q0, 1e-8, str((L, e)))
             close_to(-p, p0, 1e-8, str((L, e)))
+
+
+def check_leapfrog_dE(potential):
+    n = 3
+    start, model, _ = models.non_normal(n)
+
+    with model:
+        h = pm.find_hessian(start, model=model)
+        if potential is not None:
+            h = potential(h)
+        step = pm.HamiltonianMC(model.vars, h, model=model)
+        nuts = pm.NUTS(model.vars, h, model=model)
+
+    bij = DictToArrayBijection(step.ordering, start)
+
+    logp, dlogp = list(map(bij.mapf, step.fs))
+    H = Hamiltonian(logp, dlogp, step.potential)
+
+    q0 = bij.map(start)
+    p0 = np.ones(n) * .05
+    e = .1
+    args = (q0, p0, np.array(e), np.array(4, dtype='int64'),
+            np.array(np.inf), q0, p0)
+
+    # Energy differences after each step
+    qs, ps, dEs, E0 = nuts.leapfrog_dE(*args)
+    assert len(dEs) == 4
+    close_to(E0, energy(H, q0, p0), 1e-8)
+    for L in [1, 2, 3, 4]:
+        q, p = leapfrog(H, q0, p0, L, e)
+        close_to(qs[L - 1], q, 1e-8, str(L))
+        close_to(ps[L - 1], p, 1e-8, str(L))
+        close_to(dEs[L - 1], energy(H, q, p) - energy(H, q0, p0), 1e-8,
+                 str(L))
+
+    # Energy difference after the last step only
+    qs, ps, dEs, E0 = step.leapfrog_dE(*args)
+    assert len(qs) == 4
+    assert len(dEs) == 1
+    q, p = leapfrog(H, q0, p0, 4, e)
+    close_to(qs[-1], q, 1e-8)
+    close_to(dEs[0], energy(H, q, p) - energy(H, q0, p0), 1e-8)
+
+
+class _NumericPotential(object):
+    """Potential that cannot be used in theano graphs."""
+
+    def __init__(self, h):
+        self.potential = quad_potential(h, is_cov=False, as_cov=False)
+
+    def velocity(self, x):
+        if isinstance(x, tt.Variable):
+            raise TypeError('Numeric potential')
+        return self.potential.velocity(x)
+
+    def random(self):
+        return self.potential.random()
+
+    def energy(self, x):
+        if isinstance(x, tt.Variable):
+            raise TypeError('Numeric potential')
+        return self.potential.energy(x)
+
+
+def test_leapfrog_dE():
+    yield check_leapfrog_dE, None
+    yield check_leapfrog_dE, _NumericPotential
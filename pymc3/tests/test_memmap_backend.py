@@ -0,0 +1,89 @@
+import numpy as np
+import numpy.testing as npt
+import pickle
+from pymc3.tests import backend_fixtures as bf
+from pymc3.backends import ndarray, memmap
+
+
+class TestMemmap0dSampling(bf.SamplingTestCase):
+    backend = memmap.MemmapNDArray
+    name = 'memmap-db'
+    shape = ()
+
+
+class TestMemmap1dSampling(bf.SamplingTestCase):
+    backend = memmap.MemmapNDArray
+    name = 'memmap-db'
+    shape = 2
+
+
+class TestMemmap2dSampling(bf.SamplingTestCase):
+    backend = memmap.MemmapNDArray
+    name = 'memmap-db'
+    shape = (2, 3)
+
+
+class TestMemmap0dSelection(bf.SelectionTestCase):
+    backend = memmap.MemmapNDArray
+    name = 'memmap-db'
+    shape = ()
+
+
+class TestMemmap1dSelection(bf.SelectionTestCase):
+    backend = memmap.MemmapNDArray
+    name = 'memmap-db'
+    shape = 2
+
+
+class TestMemmap2dSelection(bf.SelectionTestCase):
+    backend = memmap.MemmapNDArray
+    name = 'memmap-db'
+    shape = (2, 3)
+
+
+class TestMemmapDumpLoad(bf.DumpLoadTestCase):
+    backend = memmap.MemmapNDArray
+    load_func = staticmethod(memmap.load)
+    name = 'memmap-db'
+    shape = (2, 3)
+
+
+class TestNDArrayMemmapEquality(bf.BackendEqualityTestCase):
+    backend0 = ndarray.NDArray
+    name0 = None
+    backend1 = memmap.MemmapNDArray
+    name1 = 'memmap-db'
+    shape = (2, 3)
+
+
+class TestMemmapExtend(bf.ModelBackendSetupTestCase):
+    backend = memmap.MemmapNDArray
+    name = 'memmap-db'
+    shape = 2
+
+    def test_extend_chain(self):
+        for _ in range(self.draws):
+            self.strace.record(point=self.test_point)
+        self.strace.close()
+        first = self.strace.samples['x']
+        capacity = self.strace._capacity
+
+        self.strace.setup(1, self.chain)
+        assert self.strace._capacity == 2 * capacity
+        self.strace.record(point=self.test_point)
+        self.strace.setup(1, self.chain)
+        assert self.strace._capacity == 2 * capacity
+        self.strace.record(point=self.test_point)
+        self.strace.close()
+
+        assert len(self.strace) == self.draws + 2
+        assert isinstance(self.strace.samples['x'], np.memmap)
+        npt.assert_equal(self.strace.samples['x'][:self.draws], first)
+
+    def test_pickle(self):
+        self.strace.record(point=self.test_point)
+        self.strace.close()
+        strace = pickle.loads(pickle.dumps(self.strace))
+        for varname, value in self.test_point.items():
+            assert isinstance(strace.samples[varname], np.memmap)
+            npt.assert_equal(strace.get_values(varname), [value])
@@ -1,3 +1,4 @@
+import pickle
 import unittest
 import numpy as np
 import numpy.testing as npt
@@ -65,6 +66,56 @@ class TestMultiTrace(bf.ModelBackendSetupTestCase):
                           base.merge_traces, [mtrace0, mtrace1])
 
 
+class TestMultiTraceCombine(bf.ModelBackendSampledTestCase):
+    name = None
+    backend = ndarray.NDArray
+    shape = (2, 3)
+
+    def test_combined_copy(self):
+        samples = {chain: self.mtrace._straces[chain].samples['x']
+                   for chain in self.mtrace.chains}
+        values = self.mtrace.get_values('x')
+        values[:] = 0
+        npt.assert_equal(self.mtrace.get_values('x'),
+                         np.concatenate([self.expected[chain]['x']
+                                         for chain in [0, 1]]))
+        for chain in self.mtrace.chains:
+            self.assertIs(self.mtrace._straces[chain].samples['x'],
+                          samples[chain])
+
+    def test_combined_view(self):
+        straces = [self.mtrace._straces[chain]
+                   for chain in self.mtrace.chains]
+        ndarray.stack_chains(straces)
+        values = self.mtrace.get_values('x')
+        self.assertTrue(np.may_share_memory(values,
+                                            straces[0].samples['x']))
+        self.assertEqual(len(self.mtrace._cache), 0)
+        for chain in self.mtrace.chains:
+            npt.assert_equal(self.mtrace.get_values('x', chains=chain,
+                                                    combine=False),
+                             self.expected[chain]['x'])
+        npt.assert_equal(self.mtrace.get_values('x', burn=2, thin=2),
+                         np.concatenate([self.expected[chain]['x'][2::2]
+                                         for chain in [0, 1]]))
+
+    def test_pickle_without_cache(self):
+        self.mtrace.get_values('x')
+        mtrace = pickle.loads(pickle.dumps(self.mtrace))
+        self.assertEqual(len(mtrace._cache), 0)
+
+    def test_combined_burn_thin(self):
+        expected = np.concatenate([self.expected[chain]['x'][2::2]
+                                   for chain in [0, 1]])
+        npt.assert_equal(self.mtrace.get_values('x', burn=2, thin=2),
+                         expected)
+
+    def test_cache_size(self):
+        for burn in range(self.mtrace.cache_size + 1):
+            self.mtrace.get_values('x', burn=burn)
+        self.assertEqual(len(self.mtrace._cache), self.mtrace.cache_size)
+
+
 class TestSqueezeCat(unittest.TestCase):
 
     def setUp(self):
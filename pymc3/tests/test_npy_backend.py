@@ -0,0 +1,128 @@
+import numpy as np
+import numpy.testing as npt
+from pymc3.tests import backend_fixtures as bf
+from pymc3.backends import ndarray, npy
+
+
+class SmallChunkNPY(npy.NPY):
+    """Spread the draws of the fixtures over several chunk files"""
+
+    def __init__(self, name, model=None, vars=None, chunk_size=2):
+        super(SmallChunkNPY, self).__init__(name, model, vars, chunk_size)
+
+
+class TestNPY0dSampling(bf.SamplingTestCase):
+    backend = npy.NPY
+    name = 'npy-db'
+    shape = ()
+
+
+class TestNPY1dSampling(bf.SamplingTestCase):
+    backend = npy.NPY
+    name = 'npy-db'
+    shape = 2
+
+
+class TestNPY2dSampling(bf.SamplingTestCase):
+    backend = SmallChunkNPY
+    name = 'npy-db'
+    shape = (2, 3)
+
+
+class TestNPY0dSelection(bf.SelectionTestCase):
+    backend = SmallChunkNPY
+    name = 'npy-db'
+    shape = ()
+
+
+class TestNPY1dSelection(bf.SelectionTestCase):
+    backend = npy.NPY
+    name = 'npy-db'
+    shape = 2
+
+
+class TestNPY2dSelection(bf.SelectionTestCase):
+    backend = SmallChunkNPY
+    name = 'npy-db'
+    shape = (2, 3)
+
+
+class TestNPYDumpLoad(bf.DumpLoadTestCase):
+    backend = SmallChunkNPY
+    load_func = staticmethod(npy.load)
+    name = 'npy-db'
+    shape = (2, 3)
+
+
+class TestNDArrayNPYEquality(bf.BackendEqualityTestCase):
+    backend0 = ndarray.NDArray
+    name0 = None
+    backend1 = SmallChunkNPY
+    name1 = 'npy-db'
+    shape = (2, 3)
+
+
+class TestNPYResume(bf.ModelBackendSetupTestCase):
+    backend = SmallChunkNPY
+    name = 'npy-db'
+    shape = 2
+
+    def test_resume_partial_chunk(self):
+        self.strace.record(point=self.test_point)
+        self.strace.close()
+        with self.model:
+            strace = self.backend(self.name)
+        strace.setup(self.draws, self.chain)
+        for _ in range(self.draws):
+            strace.record(point=self.test_point)
+        assert len(strace) == self.draws + 1
+        strace.close()
+        assert len(strace) == self.draws + 1
+        for varname, value in self.test_point.items():
+            npt.assert_equal(strace.point(-1)[varname], value)
+            npt.assert_equal(strace.get_values(varname, burn=1, thin=2),
+                             [value] * 2)
+
+
+class CompressedNPY(npy.NPY):
+    """Compress the values with a few codecs"""
+
+    def __init__(self, name, model=None, vars=None):
+        codecs = {'x': npy.Codec('zlib', shuffle=True),
+                  'y': npy.Codec('bz2', level=1)}
+        super(CompressedNPY, self).__init__(name, model, vars, chunk_size=2,
+                                            codecs=codecs)
+
+
+class TestCompressedNPY2dSampling(bf.SamplingTestCase):
+    backend = CompressedNPY
+    name = 'npy-db'
+    shape = (2, 3)
+
+
+class TestCompressedNPY2dSelection(bf.SelectionTestCase):
+    backend = CompressedNPY
+    name = 'npy-db'
+    shape = (2, 3)
+
+
+class TestCompressedNPYDumpLoad(bf.DumpLoadTestCase):
+    backend = CompressedNPY
+    load_func = staticmethod(npy.load)
+    name = 'npy-db'
+    shape = (2, 3)
+
+
+def test_codec_roundtrip():
+    values = np.random.randn(5, 3)
+    for codec in [npy.Codec(None), npy.Codec('zlib', level=9),
+                  npy.Codec('bz2', shuffle=True)]:
+        decoded = codec.decode(codec.encode(values), values.dtype,
+                               values.shape)
+        npt.assert_array_equal(decoded, values)
+
+    codec = npy.Codec('zlib', dtype='float32', shuffle=True)
+    decoded = codec.decode(codec.encode(values), values.dtype, values.shape)
+    assert decoded.dtype == values.dtype
+    npt.assert_allclose(decoded, values, rtol=1e-6)
+    assert len(codec.encode(values)) < values.nbytes
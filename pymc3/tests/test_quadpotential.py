@@ -0,0 +1,72 @@
+import numpy as np
+import numpy.testing as npt
+import theano
+import theano.tensor as tt
+
+import pymc3 as pm
+from pymc3.step_methods.quadpotential import (QuadPotential,
+                                              QuadPotential_Inv,
+                                              QuadPotential_LowRank,
+                                              quad_potential)
+from .models import mv_simple
+
+
+def _low_rank(n=5, k=2):
+    rng = np.random.RandomState(1)
+    d = rng.uniform(.5, 2., size=n)
+    U = rng.normal(size=(n, k))
+    return d, U, np.diag(d) + U.dot(U.T)
+
+
+def check_potential(pot, cov):
+    """Check a potential against its dense covariance `cov`."""
+    x = np.linspace(-1., 1., len(cov))
+    npt.assert_allclose(pot.velocity(x), cov.dot(x))
+    npt.assert_allclose(pot.energy(x), .5 * x.dot(cov).dot(x))
+
+    x_sym = tt.dvector('x')
+    x_sym.tag.test_value = x
+    f = theano.function([x_sym], [pot.velocity(x_sym), pot.energy(x_sym)])
+    v, E = f(x)
+    npt.assert_allclose(v, cov.dot(x))
+    npt.assert_allclose(E, .5 * x.dot(cov).dot(x))
+
+    np.random.seed(1)
+    ps = np.array([pot.random() for _ in range(20000)])
+    npt.assert_allclose(np.cov(ps.T), np.linalg.inv(cov), atol=.1)
+
+
+def test_dense_potentials():
+    _, _, cov = _low_rank()
+    yield check_potential, QuadPotential(cov), cov
+    yield check_potential, QuadPotential_Inv(np.linalg.inv(cov)), cov
+
+
+def test_low_rank_potential():
+    d, U, cov = _low_rank()
+    yield check_potential, QuadPotential_LowRank(d, U), cov
+
+
+def test_low_rank_potential_invalid():
+    d, U, _ = _low_rank()
+    npt.assert_raises(ValueError, QuadPotential_LowRank, d, U[1:])
+
+
+def test_quad_potential_passthrough():
+    d, U, _ = _low_rank()
+    pot = QuadPotential_LowRank(d, U)
+    assert quad_potential(pot, is_cov=True, as_cov=False) is pot
+
+
+def test_nuts_low_rank():
+    start, model, (mu, C) = mv_simple()
+    C = np.asarray(C)
+    w, V = np.linalg.eigh(C)
+    d = np.full(len(C), w[0] * .9)
+    U = V * (w - d) ** .5
+    with model:
+        step = pm.NUTS(scaling=QuadPotential_LowRank(d, U))
+        trace = pm.sample(2000, step, start, progressbar=False,
+                          random_seed=1)
+    unc = np.diag(C) ** .5
+    npt.assert_allclose(trace['x', 500:].mean(axis=0), mu, atol=unc / 5.)
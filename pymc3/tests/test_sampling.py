@@ -4,12 +4,16 @@ try:
     import unittest.mock as mock  # py3
 except ImportError:
     import mock
+import os
+import pickle
+import shutil
+import tempfile
 import unittest
 
 import pymc3
 from pymc3 import sampling
 from pymc3.sampling import sample
-from .models import simple_init
+from .models import simple_init, simple_model
 
 # Test if multiprocessing is available
 import multiprocessing
@@ -37,6 +41,18 @@ def test_sample():
                 yield sample, n, step, {}, None, njobs
 
 
+def test_sample_records_stats():
+    _, model, _ = simple_model()
+    with model:
+        step = pymc3.NUTS()
+        trace = sample(20, step, tune=10, progressbar=False,
+                       random_seed=RSEED)
+    assert len(trace) == 20
+    assert trace.get_sampler_stats('tree_depth').shape == (20,)
+    assert trace.get_sampler_stats('step_size', burn=10)[0] == \
+        step.step_size
+
+
 def test_iter_sample():
     model, start, step, _ = simple_init()
     samps = sampling.iter_sample(5, step, start, model=model)
@@ -53,6 +69,288 @@ def test_parallel_start():
     assert tr.get_values('x', chains=1)[0][0] < 0
 
 
+def test_chain_executor():
+    _, model, _ = simple_model()
+    with model:
+        step = pymc3.Metropolis()
+        with sampling.ChainExecutor(njobs=2, step=step) as executor:
+            for _ in range(2):
+                tr = executor.sample(5, start=[{'x': [10, 10]},
+                                               {'x': [-10, -10]}],
+                                     chain=1, progressbar=False,
+                                     random_seed=RSEED)
+                assert tr.chains == [1, 2]
+                assert len(tr) == 5
+                assert tr.get_values('x', chains=1)[0][0] > 0
+                assert tr.get_values('x', chains=2)[0][0] < 0
+    assert executor._conns is None
+
+
+def test_chain_executor_shared_data():
+    import theano
+    data = theano.shared(np.zeros(10))
+    with pymc3.Model():
+        mu = pymc3.Normal('mu', 0., 10.)
+        pymc3.Normal('y', mu=mu, sd=.1, observed=data)
+        with sampling.ChainExecutor(njobs=2,
+                                    step=pymc3.Metropolis()) as executor:
+            for value in [-5., 5.]:
+                data.set_value(np.full(10, value))
+                tr = executor.sample(500, progressbar=False,
+                                     random_seed=RSEED)
+                npt.assert_allclose(tr['mu', 250:].mean(), value, atol=.5)
+
+
+def test_progress_callback():
+    _, model, _ = simple_model()
+    reports = []
+    with model:
+        sample(10, step=pymc3.Metropolis(), progressbar=False,
+               progress_callback=reports.append)
+    last = reports[-1]
+    assert last['chain'] == 0
+    assert last['draw'] == last['draws'] == 10
+    assert 0 <= last['accept_rate'] <= 1
+    assert last['step_size'] is None
+
+
+def test_chain_executor_progress_callback():
+    _, model, _ = simple_model()
+    reports = []
+    with model:
+        with sampling.ChainExecutor(njobs=2) as executor:
+            executor.sample(10, progressbar=False,
+                            progress_callback=reports.append)
+    finished = {r['chain'] for r in reports if r['draw'] == 10}
+    assert finished == {0, 1}
+    assert all(r['step_size'] > 0 for r in reports)
+
+
+def test_progress_channel_report_pickles():
+    reports = []
+    with sampling._ProgressChannel([0], 10, progressbar=False,
+                                   callback=reports.append) as channel:
+        report = pickle.loads(pickle.dumps(channel.report))
+        report({'chain': 0, 'draw': 10, 'draws': 10, 'accept_rate': None,
+                'step_size': None, 'draws_per_sec': 1.})
+    assert reports
+
+
+def test_parallel_progressbar():
+    _, model, _ = simple_model()
+    with model:
+        for trace in [None, 'shared']:
+            tr = sample(10, step=pymc3.Metropolis(), njobs=2, trace=trace,
+                        progressbar=True)
+            assert tr.nchains == 2
+        with sampling.ChainExecutor(njobs=2) as executor:
+            tr = executor.sample(10, progressbar=True)
+        assert tr.nchains == 2
+
+
+def test_sample_until_converged():
+    _, model, _ = simple_model()
+    with model:
+        trace = sample(20000, step=pymc3.Metropolis(), njobs=2,
+                       target_n_eff=200, max_rhat=1.1, check_interval=100,
+                       progressbar=False, random_seed=[1, 2])
+    assert trace.stop_reason == 'converged'
+    assert len(trace) < 20000
+    assert len(set(len(trace._straces[c]) for c in trace.chains)) == 1
+    assert all(trace.convergence_stats['n_eff']['x'] >= 200)
+
+    with model:
+        trace = sample(200, step=pymc3.Metropolis(), njobs=2,
+                       target_n_eff=1e6, check_interval=100,
+                       progressbar=False)
+    assert trace.stop_reason == 'draws'
+    assert len(trace) == 200
+
+
+def test_sample_until_converged_stats():
+    _, model, _ = simple_model()
+    with model:
+        trace = sample(20000, step=pymc3.NUTS(), njobs=2,
+                       target_n_eff=200, check_interval=50,
+                       progressbar=False, random_seed=[1, 2])
+    assert trace.stop_reason == 'converged'
+    for depth in trace.get_sampler_stats('tree_depth', combine=False):
+        assert len(depth) == len(trace)
+
+
+def test_checkpoint_resume():
+    _, model, _ = simple_model()
+    name = os.path.join(tempfile.mkdtemp(), 'checkpoint')
+    try:
+        with model:
+            full = sample(200, step=pymc3.Metropolis(), tune=50,
+                          progressbar=False, random_seed=RSEED)
+            part = sample(120, step=pymc3.Metropolis(), tune=50,
+                          progressbar=False, random_seed=RSEED,
+                          checkpoint=name, checkpoint_interval=40)
+            resumed = sample(200, step=pymc3.Metropolis(), tune=50,
+                             progressbar=False, resume=name)
+    finally:
+        shutil.rmtree(os.path.dirname(name))
+    assert len(part) == 120
+    npt.assert_array_equal(resumed['x'], full['x'])
+
+
+def test_checkpoint_resume_mid_run():
+    _, model, _ = simple_model()
+    name = os.path.join(tempfile.mkdtemp(), 'checkpoint')
+    save = sampling._save_checkpoint
+
+    def save_until_120(name, chain, draws, *args):
+        # Leave the checkpoint of draw 120, as if the run was preempted.
+        if draws <= 120:
+            save(name, chain, draws, *args)
+
+    try:
+        with model:
+            full = sample(200, step=pymc3.Metropolis(), tune=50,
+                          progressbar=False, random_seed=RSEED)
+            with mock.patch('pymc3.sampling._save_checkpoint',
+                            save_until_120):
+                sample(200, step=pymc3.Metropolis(), tune=50,
+                       progressbar=False, random_seed=RSEED,
+                       checkpoint=name, checkpoint_interval=40)
+            resumed = sample(200, step=pymc3.Metropolis(), tune=50,
+                             progressbar=False, resume=name)
+    finally:
+        shutil.rmtree(os.path.dirname(name))
+    assert len(resumed) == 200
+    npt.assert_array_equal(resumed['x'], full['x'])
+
+
+def test_sample_burn_thin():
+    _, model, _ = simple_model()
+    with model:
+        full = sample(20, step=pymc3.Metropolis(), progressbar=False,
+                      random_seed=RSEED)
+        thinned = sample(20, step=pymc3.Metropolis(), progressbar=False,
+                         random_seed=RSEED, burn=5, thin=3)
+    assert len(thinned) == 5
+    assert thinned._straces[0].samples['x'].shape == (5, 2)
+    npt.assert_array_equal(thinned['x'], full['x', 5::3])
+
+
+def test_sample_without_deterministics():
+    with pymc3.Model():
+        sd = pymc3.HalfNormal('sd', sd=1.)
+        pymc3.Deterministic('var', sd ** 2)
+        full = sample(20, step=pymc3.Metropolis(), progressbar=False,
+                      random_seed=RSEED)
+        free = sample(20, step=pymc3.Metropolis(), progressbar=False,
+                      random_seed=RSEED,
+                      trace=pymc3.backends.NDArray(deterministics=False))
+    assert free.varnames == ['sd_log_']
+    assert set(free.computed_varnames) == {'sd', 'var'}
+    npt.assert_allclose(free['var'], full['var'])
+    npt.assert_allclose(free.sd, full['sd'])
+    npt.assert_allclose(free.get_values('sd', burn=5, combine=False),
+                        full['sd', 5:])
+
+
+def check_load_without_deterministics(backend, load):
+    name = os.path.join(tempfile.mkdtemp(), 'trace')
+    try:
+        with pymc3.Model() as model:
+            sd = pymc3.HalfNormal('sd', sd=1.)
+            pymc3.Deterministic('var', sd ** 2)
+            sample(20, step=pymc3.Metropolis(), progressbar=False,
+                   random_seed=RSEED,
+                   trace=backend(name, deterministics=False))
+            trace = load(name, model=model)
+        assert trace.varnames == ['sd_log_']
+        assert set(trace.computed_varnames) == {'sd', 'var'}
+        npt.assert_allclose(trace['var'], trace['sd'] ** 2)
+    finally:
+        shutil.rmtree(os.path.dirname(name))
+
+
+def test_load_without_deterministics():
+    from pymc3.backends import text, npy, memmap
+    for module, backend in [(text, text.Text), (npy, npy.NPY),
+                            (memmap, memmap.MemmapNDArray)]:
+        yield check_load_without_deterministics, backend, module.load
+
+
+def test_array_stepper():
+    start, model, _ = simple_model()
+    with model:
+        step = pymc3.Metropolis()
+    stepper = sampling._ArrayStepper.from_step(step, start, model)
+    assert stepper is not None
+
+    point = start
+    np.random.seed(RSEED)
+    expected = []
+    for _ in range(10):
+        point = step.step(point)
+        expected.append(point['x'].copy())
+    np.random.seed(RSEED)
+    for x in expected:
+        npt.assert_array_equal(stepper.step()['x'], x)
+
+
+def test_sample_ppc():
+    with pymc3.Model() as model:
+        mu = pymc3.Normal('mu', 0., 1.)
+        pymc3.Normal('a', mu=mu, sd=1., shape=3, observed=np.zeros(3))
+        pymc3.DiscreteUniform('b', lower=mu, upper=mu + 2, observed=[1, 2])
+        trace = sample(100, step=pymc3.Metropolis(), progressbar=False,
+                       random_seed=RSEED)
+        ppc = pymc3.sample_ppc(trace, samples=50)
+        assert ppc['a'].shape == (50, 3)
+        assert ppc['b'].shape == (50, 1)
+
+        ppc = pymc3.sample_ppc(trace, samples=10, size=4)
+        assert ppc['a'].shape == (10, 4, 3)
+
+        point = {'mu': np.array(5.)}
+        ppc = pymc3.sample_ppc([point] * 2000, samples=2000,
+                               vars=[model.named_vars['a']])
+        npt.assert_allclose(ppc['a'].mean(), 5., atol=.1)
+
+
+def test_sample_ppc_chunks():
+    with pymc3.Model() as model:
+        mu = pymc3.Normal('mu', 0., 1.)
+        pymc3.Normal('a', mu=mu, sd=1., shape=3, observed=np.zeros(3))
+        pymc3.DiscreteUniform('b', lower=mu, upper=mu + 2, observed=[1, 2])
+        trace = sample(100, step=pymc3.Metropolis(), progressbar=False,
+                       random_seed=RSEED)
+
+        chunks = list(pymc3.iter_sample_ppc(trace, samples=25, chunk_size=10))
+        assert [len(chunk['a']) for chunk in chunks] == [10, 10, 5]
+        assert [len(chunk['b']) for chunk in chunks] == [10, 10, 5]
+
+        np.random.seed(RSEED)
+        ppc = pymc3.sample_ppc(trace, samples=25)
+        np.random.seed(RSEED)
+        chunked = pymc3.sample_ppc(trace, samples=25, chunk_size=10)
+        assert chunked['a'].shape == ppc['a'].shape
+        assert chunked['b'].shape == ppc['b'].shape
+
+        name = tempfile.mkdtemp()
+        try:
+            ppc = pymc3.sample_ppc(trace, samples=25, chunk_size=10,
+                                   out=name)
+            assert isinstance(ppc['a'], np.memmap)
+            stored = np.load(os.path.join(name, 'a.npy'))
+            npt.assert_array_equal(stored, ppc['a'])
+            assert stored.shape == (25, 3)
+            del ppc, stored
+        finally:
+            shutil.rmtree(name)
+
+        out = {'a': np.zeros((25, 3)), 'b': np.zeros((25, 1))}
+        ppc = pymc3.sample_ppc(trace, samples=25, chunk_size=10, out=out)
+        assert ppc['a'] is out['a']
+        assert np.all(out['a'] != 0)
+
+
 def test_soft_update_all_present():
     start = {'a': 1, 'b': 2}
     test_point = {'a': 3, 'b': 4}
@@ -0,0 +1,89 @@
+import pickle
+import numpy.testing as npt
+from pymc3.tests import backend_fixtures as bf
+from pymc3.backends import ndarray, shared
+from pymc3.sampling import sample
+from pymc3.step_methods import Metropolis, NUTS
+from .models import simple_model
+
+
+class TestShared0dSampling(bf.SamplingTestCase):
+    backend = shared.SharedNDArray
+    name = None
+    shape = ()
+
+
+class TestShared1dSampling(bf.SamplingTestCase):
+    backend = shared.SharedNDArray
+    name = None
+    shape = 2
+
+
+class TestShared2dSampling(bf.SamplingTestCase):
+    backend = shared.SharedNDArray
+    name = None
+    shape = (2, 3)
+
+
+class TestShared0dSelection(bf.SelectionTestCase):
+    backend = shared.SharedNDArray
+    name = None
+    shape = ()
+
+
+class TestShared1dSelection(bf.SelectionTestCase):
+    backend = shared.SharedNDArray
+    name = None
+    shape = 2
+
+
+class TestShared2dSelection(bf.SelectionTestCase):
+    backend = shared.SharedNDArray
+    name = None
+    shape = (2, 3)
+
+
+class TestNDArraySharedEquality(bf.BackendEqualityTestCase):
+    backend0 = ndarray.NDArray
+    name0 = None
+    backend1 = shared.SharedNDArray
+    name1 = None
+    shape = (2, 3)
+
+
+def test_parallel_shared():
+    _, model, _ = simple_model()
+    with model:
+        tr = sample(5, step=Metropolis(), njobs=2, trace='shared',
+                    start=[{'x': [10, 10]}, {'x': [-10, -10]}],
+                    progressbar=False)
+    assert tr.nchains == 2
+    assert len(tr) == 5
+    for chain in tr.chains:
+        assert isinstance(tr._straces[chain], shared.SharedNDArray)
+    assert tr.get_values('x', chains=0)[0][0] > 0
+    assert tr.get_values('x', chains=1)[0][0] < 0
+
+
+def test_pickle_shared():
+    _, model, _ = simple_model()
+    with model:
+        tr = sample(5, step=Metropolis(), njobs=2, trace='shared',
+                    progressbar=False)
+    tr_copy = pickle.loads(pickle.dumps(tr))
+    assert tr_copy.chains == tr.chains
+    npt.assert_array_equal(tr_copy['x'], tr['x'])
+
+
+def test_parallel_shared_stats():
+    _, model, _ = simple_model()
+    with model:
+        tr = sample(10, step=NUTS(), njobs=2, trace='shared',
+                    progressbar=False)
+    depth = tr.get_sampler_stats('tree_depth', combine=False)
+    assert [len(d) for d in depth] == [10, 10]
+    assert all((d >= 1).all() for d in depth)
+    tr_copy = pickle.loads(pickle.dumps(tr))
+    npt.assert_array_equal(tr_copy.get_sampler_stats('tree_depth'),
+                           tr.get_sampler_stats('tree_depth'))
+
@@ -1,7 +1,9 @@
+import numpy as np
 import numpy.testing as npt
 import os
 from pymc3.tests import backend_fixtures as bf
-from pymc3.backends import ndarray, sqlite
+from pymc3.backends import base, ndarray, sqlite
+import sqlite3
 import tempfile
 
 DBNAME = os.path.join(tempfile.gettempdir(), 'test.db')
@@ -56,3 +58,93 @@ class TestNDArraySqliteEquality(bf.BackendEqualityTestCase):
     backend1 = sqlite.SQLite
     name1 = DBNAME
     shape = (2, 3)
+
+
+class TestSQLiteLegacyFormat(bf.ModelBackendSetupTestCase):
+    backend = sqlite.SQLite
+    name = DBNAME
+    shape = 2
+
+    def test_read_columns(self):
+        self.strace.close()
+        bf.remove_file_or_directory(self.name)
+        con = sqlite3.connect(self.name)
+        with con:
+            con.execute('CREATE TABLE x (recid INTEGER PRIMARY KEY, '
+                        'draw INTEGER, chain INT(5), v0 FLOAT, v1 FLOAT)')
+            con.executemany('INSERT INTO x VALUES (NULL, ?, 0, ?, ?)',
+                            [(0, .1, .2), (1, .3, .4)])
+        con.close()
+
+        x = [self.model.named_vars['x']]
+        strace = sqlite.SQLite(self.name, model=self.model, vars=x)
+        strace.chain = 0
+        strace._is_setup = True
+        npt.assert_equal(strace.get_values('x'), [[.1, .2], [.3, .4]])
+        npt.assert_equal(strace.point(-1)['x'], [.3, .4])
+        strace.db.close()
+
+        strace = sqlite.SQLite(self.name, model=self.model, vars=x)
+        with self.assertRaises(base.BackendError):
+            strace.setup(1, 0)
+        strace.db.close()
+
+
+class TestSQLiteTail(bf.ModelBackendSetupTestCase):
+    backend = sqlite.SQLite
+    name = DBNAME
+    shape = 2
+
+    def test_read_new_draws(self):
+        tail = sqlite.Tail(self.name, model=self.model)
+        points = [{varname: value + i
+                   for varname, value in self.test_point.items()}
+                  for i in range(3)]
+        self.strace.record(points[0])
+        self.strace._execute_queue()
+        new = tail.read()
+        self.assertEqual(list(new.keys()), [0])
+        for varname in self.test_point:
+            npt.assert_equal(new[0][varname], [points[0][varname]])
+
+        for point in points[1:]:
+            self.strace.record(point)
+        self.strace.close()
+        new = tail.read()
+        for varname in self.test_point:
+            npt.assert_equal(new[0][varname],
+                             [point[varname] for point in points[1:]])
+        self.assertEqual(tail.read(), {})
+
+
+class TestSQLiteLength(bf.ModelBackendSetupTestCase):
+    backend = sqlite.SQLite
+    name = DBNAME
+    shape = 2
+
+    def test_len_after_record(self):
+        self.assertEqual(len(self.strace), 0)
+        self.strace.record(self.test_point)
+        self.strace._execute_queue()
+        self.assertEqual(len(self.strace), 1)
+        self.strace.record(self.test_point)
+        self.strace.close()
+        self.assertEqual(len(self.strace), 2)
+
+    def test_journal_mode_restored(self):
+        self.strace.record(self.test_point)
+        self.strace.close()
+        con = sqlite3.connect(self.name)
+        mode = con.execute('PRAGMA journal_mode').fetchone()[0]
+        con.close()
+        self.assertNotEqual(mode.lower(), 'wal')
+
+    def test_rows_from_buffers(self):
+        # sqlite3 returns blobs as `buffer` objects on Python 2.
+        varname = self.strace.varnames[0]
+        dtype = self.strace.var_dtypes[varname]
+        rows = [(i, 0, 0, memoryview(np.array(value, dtype=dtype).tobytes()))
+                for i, value in enumerate([[1, 2], [3, 4]])]
+        values = self.strace._rows_to_ndarray(varname, rows)
+        npt.assert_array_equal(values, [1, 2, 3, 4])
+        values[0] = 0
@@ -3,9 +3,9 @@ from .models import simple_model, mv_simple, mv_simple_discrete, simple_2model
 from ..step_methods import MultivariateNormalProposal
 from theano.tensor import constant
 from scipy.stats.mstats import moment
-from pymc3.sampling import assign_step_methods, sample
+from pymc3.sampling import assign_step_methods, sample, sample_vectorized
 from pymc3.model import Model
-from pymc3.step_methods import NUTS, BinaryMetropolis, BinaryGibbsMetropolis, Metropolis, Constant, ElemwiseCategorical, Slice, CompoundStep, MultivariateNormalProposal, HamiltonianMC
+from pymc3.step_methods import NUTS, BinaryMetropolis, BinaryGibbsMetropolis, Metropolis, Constant, ElemwiseCategorical, Slice, CompoundStep, MultivariateNormalProposal, HamiltonianMC, BatchMetropolis, BatchSlice
 from pymc3.distributions import Binomial, Normal, Bernoulli, Categorical
 from numpy.testing import assert_almost_equal
 import numpy as np
@@ -97,6 +97,85 @@ def test_step_discrete():
             yield check_stat, repr(st), h, var, stat, val, bound
 
 
+def test_step_vectorized():
+    start, model, (mu, tau_inv) = simple_model()
+
+    with model:
+        steps = [BatchMetropolis(), BatchSlice()]
+
+    unc = tau_inv ** .5
+    check = [('x', np.mean, mu, unc / 10.),
+             ('x', np.std, unc, unc / 10.)]
+
+    for st in steps:
+        h = sample_vectorized(3000, st, nchains=4, model=model,
+                              random_seed=1, progressbar=False)
+        assert h.nchains == 4
+        for (var, stat, val, bound) in check:
+            yield check_stat, repr(st), h, var, stat, val, bound
+
+
+def test_nuts_max_treedepth():
+    start, model, (mu, C) = mv_simple()
+
+    with model:
+        step = NUTS(scaling=C, is_cov=True, max_treedepth=3)
+        sample(20, step, start, progressbar=False, random_seed=1)
+    assert 1 <= step.tree_depth <= 3
+    assert 1 <= step.n_leapfrog <= 2 ** 3 - 1
+
+
+def test_sampler_stats():
+    start, model, (mu, C) = mv_simple()
+
+    with model:
+        step = NUTS(scaling=C, is_cov=True, max_treedepth=3)
+        trace = sample(20, step, start, tune=10, progressbar=False,
+                       random_seed=1)
+    assert set(trace.stat_names) == set(NUTS.stats_dtypes)
+    depth = trace.get_sampler_stats('tree_depth')
+    assert depth.shape == (len(trace),)
+    assert np.all((1 <= depth) & (depth <= 3))
+    assert np.all(trace.get_sampler_stats('n_leapfrog') <= 2 ** 3 - 1)
+    step_size = trace.get_sampler_stats('step_size', burn=10)
+    assert np.all(step_size == step.step_size)
+    accept, = trace.get_sampler_stats('accept', combine=False)
+    assert np.all((0 <= accept) & (accept <= 1))
+    assert trace[5:].get_sampler_stats('energy').shape == (15,)
+
+
+def test_nuts_adapt_mass():
+    start, model, (mu, C) = mv_simple()
+
+    with model:
+        step = NUTS(adapt_mass='diag')
+        sample(600, step, start, tune=500, progressbar=False,
+               random_seed=1)
+    var = np.diag(C)
+    close_to(step.potential.cov.get_value(), var, var / 2.)
+    assert not step.tune
+    assert step._window_end is None
+    assert step.step_size == np.exp(step.log_step_bar)
+
+
+def test_nuts_window_ends():
+    from pymc3.step_methods.nuts import _window_ends
+    assert _window_ends(500, 75, 25, 50) == (75, [100, 150, 450])
+    assert _window_ends(1000, 75, 25, 50) == (75, [100, 150, 250, 450, 950])
+    assert _window_ends(100, 75, 25, 50) == (15, [90])
+
+
+def test_welford_covariance():
+    from pymc3.step_methods.nuts import _WelfordCovariance
+    x = np.random.RandomState(1).normal(size=(1000, 3))
+    welford = _WelfordCovariance(3, dense=True)
+    for row in x:
+        welford.update(row)
+    w = 1000 / 1005.
+    expected = w * np.cov(x.T) + 1e-3 * (1 - w) * np.eye(3)
+    assert_almost_equal(welford.estimate(), expected)
+
+
 def test_constant_step():
 
     with Model() as model:
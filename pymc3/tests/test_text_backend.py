@@ -1,4 +1,9 @@
+import numpy as np
 import numpy.testing as npt
+import os
+import shutil
+import tempfile
+import pymc3 as pm
 from pymc3.tests import backend_fixtures as bf
 from pymc3.backends import ndarray, text
 
@@ -60,9 +65,82 @@ class TestTextDumpFunction(bf.BackendEqualityTestCase):
             cls.mtrace1 = text.load(cls.name1)
 
 
+class TestTextDumpNPZ(bf.ModelBackendSampledTestCase):
+    backend = ndarray.NDArray
+    name = None
+    shape = (2, 3)
+
+    def test_dump_npz(self):
+        name = 'text-db'
+        text.dump(name, self.mtrace, format='npz')
+        try:
+            for chain in self.mtrace.chains:
+                filename = os.path.join(name, 'chain-{}.npz'.format(chain))
+                with np.load(filename) as values:
+                    for varname in self.mtrace.varnames:
+                        npt.assert_equal(values[varname],
+                                         self.expected[chain][varname])
+        finally:
+            bf.remove_file_or_directory(name)
+
+
 class TestNDArrayTextEquality(bf.BackendEqualityTestCase):
     backend0 = ndarray.NDArray
     name0 = None
     backend1 = text.Text
     name1 = 'text-db'
     shape = (2, 3)
+
+
+class TestTextTail(bf.ModelBackendSetupTestCase):
+    backend = text.Text
+    name = 'text-db'
+    shape = 2
+
+    def test_read_new_draws(self):
+        tail = text.Tail(self.name)
+        points = [{varname: value + i
+                   for varname, value in self.test_point.items()}
+                  for i in range(3)]
+        self.strace.record(points[0])
+        self.strace._fh.flush()
+        new = tail.read()
+        self.assertEqual(list(new.keys()), [0])
+        for varname in self.test_point:
+            npt.assert_equal(new[0][varname], [points[0][varname]])
+
+        for point in points[1:]:
+            self.strace.record(point)
+        self.strace.close()
+        new = tail.read()
+        for varname in self.test_point:
+            npt.assert_equal(new[0][varname],
+                             [point[varname] for point in points[1:]])
+        self.assertEqual(tail.read(), {})
+
+
+def test_tail_transformed_scalar():
+    with pm.Model() as model:
+        pm.HalfNormal('sigma', 1.)
+        pm.Normal('x', 0., 1., shape=2)
+    name = tempfile.mkdtemp()
+    try:
+        with model:
+            trace = pm.sample(5, step=pm.Metropolis(), progressbar=False,
+                              trace=text.Text(name))
+        new = text.Tail(name).read()
+    finally:
+        shutil.rmtree(name)
+    assert set(new[0]) == set(trace.varnames)
+    for varname in trace.varnames:
+        npt.assert_equal(new[0][varname], trace[varname])
+
+
+def test_tail_parse_scalar_names():
+    data = b'1.,2.,3.,4.\n5.,6.,7.,8.\n'
+    columns = ['sigma_log__', 'x__0', 'x__1', 'a__b']
+    values = text.Tail._parse(data, columns)
+    assert set(values) == {'sigma_log__', 'x', 'a__b'}
+    npt.assert_equal(values['sigma_log__'], [1., 5.])
+    npt.assert_equal(values['x'], [[2., 3.], [6., 7.]])
+    npt.assert_equal(values['a__b'], [4., 8.])
@@ -46,6 +46,12 @@ class TestTraceToDf(bf.ModelBackendSampledTestCase):
             checked = True
         self.assertTrue(checked)
 
+    def test_trace_to_array(self):
+        block, columns = ttab.trace_to_array(self.mtrace)
+        df = ttab.trace_to_dataframe(self.mtrace)
+        self.assertEqual(columns, list(df.columns))
+        npt.assert_equal(block, df.values)
+
 
 def test_create_flat_names_0d():
     shape = ()
@@ -72,6 +78,21 @@ def test_create_flat_names_2d():
     assert ttab._create_shape(result) == shape
 
 
+def test_create_flat_names_underscores():
+    for varname in ['sigma_log__', 'a__b']:
+        result = ttab.create_flat_names(varname, ())
+        assert ttab._create_shape(result) == ()
+        assert ttab._split_flat_name(result[0]) == (varname, ())
+    result = ttab.create_flat_names('p_log__', (2, ))
+    assert ttab._split_flat_name(result[1]) == ('p_log__', (1, ))
+
+
 def test_create_flat_names_3d():
     shape = 2, 3, 4
     assert ttab._create_shape(ttab.create_flat_names('x', shape)) == shape
+
+
+def test_create_flat_names_cached():
+    result = ttab.create_flat_names('x', (2, 3))
+    result.append('y')
+    assert ttab.create_flat_names('x', (2, 3))[-1] == 'x__1_2'